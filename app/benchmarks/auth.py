@@ -0,0 +1,69 @@
+"""
+Measures per-request overhead of `auth_middleware` when one session sends the same token over and over, with
+and without the verified token cache. Users are served from memory, so only the token handling is measured.
+
+    python -m benchmarks.auth --repeat 20000
+"""
+import time
+import asyncio
+from optparse import OptionParser
+import jwt
+from settings import settings
+from constants import UserTypes
+from middlewares import auth_middleware
+from extensions.tokens import TokenCache
+
+
+class Request:
+
+    def __init__(self, token: str):
+        self.headers = {settings.JWT_HEADER: token}
+
+
+class Principals:
+
+    async def get(self, user_type: str, user_id: int):
+        return user_id
+
+
+class App:
+
+    def __init__(self, token_cache):
+        self.db = None
+        self.token_cache = token_cache
+        self.principal_cache = Principals()
+
+
+async def handler(request):
+    return request.user
+
+
+def measure(loop, app, request, repeat: int) -> float:
+    middleware = loop.run_until_complete(auth_middleware(app, handler))
+
+    async def run():
+        for _ in range(repeat):
+            await middleware(request)
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    return (time.perf_counter() - start) / repeat * 10 ** 6
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=20000, help='Requests per measurement')
+    (options, args) = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    token = jwt.encode({'user_id': 1, 'type': UserTypes.AD_PROVIDER}, settings.JWT_SECRET,
+                       algorithm=settings.JWT_ALGORITHM).decode('utf8')
+    request = Request(token)
+
+    print('{:<24}{:>14}'.format('token cache', 'overhead, us'))
+    for name, token_cache in (('off', None), ('on', TokenCache(ttl=3600, max_entries=1000))):
+        print('{:<24}{:>14.1f}'.format(name, measure(loop, App(token_cache), request, options.repeat)))
+
+
+if __name__ == '__main__':
+    main()
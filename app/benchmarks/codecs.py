@@ -0,0 +1,48 @@
+"""
+Measures per-request encode and decode cost of the installed JSON codecs on analytics payloads.
+
+    python -m benchmarks.codecs --repeat 2000
+"""
+import time
+import random
+from optparse import OptionParser
+from extensions.codecs import get_available_codecs
+from serialization.analytics import serialize_year_data, serialize_month_data, serialize_day_data
+from benchmarks.serializers import generate_order_rows
+
+
+def get_payloads() -> list:
+    orders = generate_order_rows(1000)
+    return [
+        ('year analytics', serialize_year_data({m: random.randint(0, 10 ** 6) for m in range(1, 13)})),
+        ('month analytics', serialize_month_data({d: random.randint(0, 10 ** 5) for d in range(1, 32)}, 2016, 12)),
+        ('day analytics', serialize_day_data({h: random.randint(0, 10 ** 4) for h in range(24)})),
+        ('1000 advert orders', orders),
+        ('batch of 1000 events', [{'type': 'click', 'placement_id': i, 'ts': '2016-12-01T10:00:00'}
+                                  for i in range(1000)])
+    ]
+
+
+def measure(func, data, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (time.perf_counter() - start) / repeat * 10 ** 6
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=2000, help='Runs per measurement')
+    (options, args) = parser.parse_args()
+
+    print('{:<24}{:<12}{:>14}{:>14}'.format('payload', 'codec', 'encode, us', 'decode, us'))
+    for name, payload in get_payloads():
+        for codec in get_available_codecs():
+            encoded = codec.dumps(payload)
+            print('{:<24}{:<12}{:>14.1f}{:>14.1f}'.format(
+                name, codec.name, measure(codec.dumps, payload, options.repeat),
+                measure(codec.loads, encoded, options.repeat)))
+
+
+if __name__ == '__main__':
+    main()
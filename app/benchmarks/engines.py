@@ -0,0 +1,91 @@
+"""
+Compares the aiopg and asyncpg engines on the queries behind the list and analytics endpoints, run against
+the dev database for its busiest advert provider and placement.
+
+    python -m benchmarks.engines --repeat 500
+
+Run `populate_db.py` first to have data to query.
+"""
+import time
+import asyncio
+from datetime import datetime
+from optparse import OptionParser
+import sqlalchemy as sa
+from settings import settings
+from constants import TimeBuckets
+from extensions.engines import create_engine, AIOPG, ASYNCPG, asyncpg
+from extensions.serializers import SchemaPlan
+from serialization.advert_orders import list_advert_orders_schema
+from serialization.placements import list_placements_schema
+from data_access.advert_orders import advert_orders, AdvertOrdersQueryFactory as AdvertOrdersQF
+from data_access.placements import placements, PlacementsQueryFactory as PlacementsQF
+
+
+async def get_busiest_ids(db) -> tuple:
+    async with db.acquire() as conn:
+        owner_id = await conn.scalar(sa.select([advert_orders.c.owner_id])
+                                     .group_by(advert_orders.c.owner_id)
+                                     .order_by(sa.func.count().desc()).limit(1))
+        placer_id = await conn.scalar(sa.select([placements.c.placer_id])
+                                      .group_by(placements.c.placer_id)
+                                      .order_by(sa.func.count().desc()).limit(1))
+        placement_id = await conn.scalar(sa.select([placements.c.id])
+                                         .order_by(placements.c.clicks_count.desc()).limit(1))
+    return owner_id, placer_id, placement_id
+
+
+def get_cases(owner_id: int, placer_id: int, placement_id: int) -> list:
+    year = datetime.now().year
+    orders_plan = SchemaPlan(list_advert_orders_schema)
+    placements_plan = SchemaPlan(list_placements_schema)
+    return [
+        ('advert orders list', lambda: AdvertOrdersQF.get_advert_orders(owner_id), orders_plan.serialize),
+        ('placements list', lambda: PlacementsQF.get_placements(placer_id), placements_plan.serialize),
+        ('placement year clicks', lambda: PlacementsQF.get_owned_grouped_clicks(
+            placement_id, datetime(year, 1, 1), datetime(year + 1, 1, 1), TimeBuckets.MONTH), list),
+        ('placement day views', lambda: PlacementsQF.get_owned_grouped_views(
+            placement_id, datetime(year, 1, 1), datetime(year, 1, 2), TimeBuckets.HOUR), list)
+    ]
+
+
+async def measure(db, get_query, serialize, repeat: int) -> float:
+    async with db.acquire() as conn:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            rp = await conn.execute(get_query())
+            serialize(await rp.fetchall())
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+async def run(loop, repeat: int):
+    backends = [AIOPG] + ([ASYNCPG] if asyncpg is not None else [])
+    engines = {}
+    for backend in backends:
+        engines[backend] = await create_engine(user=settings.DB_USER, database=settings.DB_NAME,
+                                               host=settings.DB_HOST, password=settings.DB_PASS,
+                                               loop=loop, backend=backend, minsize=1, maxsize=1)
+
+    cases = get_cases(*(await get_busiest_ids(engines[AIOPG])))
+    print('{:<24}'.format('query') + ''.join('{:>14}'.format(b + ', ms') for b in backends))
+    for name, get_query, serialize in cases:
+        results = [await measure(engines[backend], get_query, serialize, repeat) for backend in backends]
+        print('{:<24}'.format(name) + ''.join('{:>14.3f}'.format(r) for r in results))
+
+    for db in engines.values():
+        db.close()
+        await db.wait_closed()
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=500, help='Runs per measurement')
+    (options, args) = parser.parse_args()
+
+    if asyncpg is None:
+        print('asyncpg is not installed, only aiopg is measured')
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run(loop, options.repeat))
+
+
+if __name__ == '__main__':
+    main()
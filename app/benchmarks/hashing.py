@@ -0,0 +1,63 @@
+"""
+Measures login throughput of the password hashing executor for different bcrypt `SALT_ROUNDS`: a burst of
+concurrent logins is checked against one stored hash, logins over the executor limit are rejected.
+
+    python -m benchmarks.hashing --rounds 4,8,10,12 --logins 100
+"""
+import time
+import asyncio
+from optparse import OptionParser
+import bcrypt
+from extensions.hashing import HashingExecutor
+from exceptions.auth import PasswordHashingIsOverloaded
+
+
+async def login(executor: HashingExecutor, password: bytes, hashed: bytes) -> bool:
+    try:
+        return await executor.run(bcrypt.hashpw, password, hashed) == hashed
+    except PasswordHashingIsOverloaded:
+        return False
+
+
+def measure(loop, rounds: int, logins: int, workers: int, max_pending: int, use_processes: bool) -> dict:
+    password = b'homm1994'
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+    executor = HashingExecutor(loop=loop, workers=workers, max_pending=max_pending, use_processes=use_processes)
+    try:
+        start = time.perf_counter()
+        results = loop.run_until_complete(asyncio.gather(*[login(executor, password, hashed) for _ in range(logins)]))
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.close()
+
+    stats = executor.stats()
+    return {
+        'accepted': sum(results),
+        'rejected': stats['rejected'],
+        'throughput': sum(results) / elapsed,
+        'mean_latency': stats['mean_latency'] * 1000
+    }
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-r', '--rounds', dest='rounds', default='4,8,10,12', help='Comma separated salt rounds')
+    parser.add_option('-l', '--logins', dest='logins', type='int', default=100, help='Concurrent logins per run')
+    parser.add_option('-w', '--workers', dest='workers', type='int', default=None,
+                      help='Workers, one per core by default')
+    parser.add_option('-p', '--max-pending', dest='max_pending', type='int', default=None,
+                      help='Admitted logins, 4 per worker by default')
+    parser.add_option('--processes', dest='use_processes', action='store_true', default=False,
+                      help='Hash in processes instead of threads')
+    (options, args) = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    print('{:<8}{:>10}{:>10}{:>16}{:>18}'.format('rounds', 'accepted', 'rejected', 'logins per s', 'mean hash, ms'))
+    for rounds in [int(r) for r in options.rounds.split(',')]:
+        result = measure(loop, rounds, options.logins, options.workers, options.max_pending, options.use_processes)
+        print('{:<8}{:>10}{:>10}{:>16.1f}{:>18.1f}'.format(rounds, result['accepted'], result['rejected'],
+                                                           result['throughput'], result['mean_latency']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Compares the schema-compiled serializer against the previous implementation.
+
+    python -m benchmarks.serializers --sizes 10000,100000,1000000 --legacy-limit 10000
+
+The previous implementation is quadratic, so it is only run for inputs of up to `--legacy-limit` rows.
+"""
+import time
+import random
+from datetime import datetime
+from optparse import OptionParser
+from extensions.serializers import SchemaPlan
+from serialization.advert_orders import list_advert_orders_schema
+
+
+class LegacySerializer:
+    """
+    The row-hash serializer which `SchemaPlan` has replaced, kept verbatim as the baseline.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+
+    def serialize(self, rows):
+        serialized_data = []
+        self._serialize_level(container=serialized_data, rows=rows, schema=self.schema)
+        return serialized_data
+
+    def _get_row_hash(self, row, fields):
+        return '___'.join(map(str, [v for k, v in row.items() if k in fields]))
+
+    def _serialize_level(self, container, rows, schema):
+        fields = []
+        db_fields = []
+        agr_fields = []
+
+        for db_name, field_config in schema.items():
+            if type(field_config) is tuple:
+                fields.append((db_name, field_config))
+                db_fields.append(db_name)
+            else:
+                agr_fields.append(db_name)
+
+        for row in rows:
+            _row_hash = self._get_row_hash(row, db_fields)
+
+            exists = False
+            for i in container:
+                if i['_row_hash'] == _row_hash and _row_hash != '':
+                    exists = True
+
+            if exists:
+                continue
+
+            item = {}
+
+            for db_name, field_config in fields:
+                item[field_config[0]] = field_config[1](row[db_name])
+            item['_row_hash'] = _row_hash
+
+            for agr_f in agr_fields:
+                item[agr_f] = []
+
+            container.append(item)
+
+        for item in container:
+            for agr_f in agr_fields:
+                agr_rows = []
+                for row in rows:
+                    if item['_row_hash'] == self._get_row_hash(row, db_fields):
+                        agr_rows.append(row)
+                self._serialize_level(item[agr_f], agr_rows, schema[agr_f])
+            del item['_row_hash']
+
+
+nested_orders_schema = {
+    'id': ('id', int),
+    'description': ('description', str),
+    'placements': {
+        'placement_id': ('id', int),
+        'placed_at': ('placed_at', str)
+    }
+}
+
+
+def generate_order_rows(size: int) -> list:
+    return [{
+        'id': i,
+        'heading_picture': 'https://s3.amazon.com/aioads/{}.jpg'.format(i),
+        'follow_url_link': 'https://link{}.com'.format(i),
+        'description': 'description #{}'.format(i),
+        'clicks': random.randint(0, 100000),
+        'views': random.randint(0, 1000000)
+    } for i in range(size)]
+
+
+def generate_nested_rows(size: int, placements_per_order: int = 10) -> list:
+    return [{
+        'id': i // placements_per_order,
+        'description': 'description #{}'.format(i // placements_per_order),
+        'placement_id': i,
+        'placed_at': datetime(2016, 1, 1)
+    } for i in range(size)]
+
+
+def measure(serializer, rows) -> float:
+    start = time.perf_counter()
+    serializer.serialize(rows)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-s', '--sizes', dest='sizes', default='10000,100000,1000000',
+                      help='Comma separated numbers of rows')
+    parser.add_option('-l', '--legacy-limit', dest='legacy_limit', type='int', default=10000,
+                      help='Largest input the previous implementation is run on')
+    (options, args) = parser.parse_args()
+
+    cases = [
+        ('list_advert_orders_schema', list_advert_orders_schema, generate_order_rows),
+        ('nested_orders_schema', nested_orders_schema, generate_nested_rows)
+    ]
+    print('{:<28}{:>10}{:>14}{:>14}'.format('schema', 'rows', 'legacy, s', 'compiled, s'))
+    for name, schema, generate_rows in cases:
+        plan = SchemaPlan(schema)
+        legacy = LegacySerializer(schema)
+        for size in map(int, options.sizes.split(',')):
+            rows = generate_rows(size)
+            legacy_time = '{:.3f}'.format(measure(legacy, rows)) if size <= options.legacy_limit else '-'
+            print('{:<28}{:>10}{:>14}{:>14.3f}'.format(name, size, legacy_time, measure(plan, rows)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures the cost of building and compiling the hot query factory statements on every call against binding
+the values to a statement compiled once per shape. No database is needed, only the compilation is timed.
+
+    python -m benchmarks.statements --repeat 10000
+"""
+import time
+from datetime import datetime
+from optparse import OptionParser
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from constants import TimeBuckets, UserTypes
+from extensions.engines import AsyncpgDialect
+from data_access import placements, advert_orders, auth
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
+from data_access.advert_orders import AdvertOrdersQueryFactory as AdvertOrdersQF
+from data_access.auth import AuthQueryFactory as AuthQF
+
+
+def get_cases() -> list:
+    year = datetime.now().year
+    return [
+        ('placements list', placements.get_placements_statement, lambda: PlacementsQF.get_placements(1)),
+        ('advert order', advert_orders.get_advert_order_by_id_statement,
+         lambda: AdvertOrdersQF.get_advert_order_by_id(1)),
+        ('user data', auth.get_user_data_statement, lambda: AuthQF.get_user_data(UserTypes.AD_PLACER, 1)),
+        ('order year clicks', advert_orders.get_owned_grouped_for_order,
+         lambda: AdvertOrdersQF.get_owned_grouped_clicks(1, datetime(year, 1, 1), datetime(year + 1, 1, 1),
+                                                         TimeBuckets.MONTH)),
+        ('placement day views', placements.get_owned_grouped_for_placement,
+         lambda: PlacementsQF.get_owned_grouped_views(1, datetime(year, 1, 1), datetime(year, 1, 2),
+                                                      TimeBuckets.HOUR))
+    ]
+
+
+def measure(dialect, statement, get_query, repeat: int, cached: bool) -> float:
+    """
+    Microseconds per call. Without `cached` the statements of the shape are dropped before each call, so the
+    construct is built and compiled every time, as the query factories did before.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if not cached:
+            statement.cache_clear()
+        compiled = get_query().compile(dialect=dialect)
+        compiled.construct_params()
+    return (time.perf_counter() - start) / repeat * 1000000
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=10000, help='Runs per measurement')
+    (options, args) = parser.parse_args()
+
+    dialects = [('psycopg2', PGDialect_psycopg2()), ('asyncpg', AsyncpgDialect())]
+    header = ''.join('{:>16}{:>16}'.format(name + ' before', name + ' after') for name, _ in dialects)
+    print('{:<22}'.format('query, us') + header)
+    for name, statement, get_query in get_cases():
+        results = []
+        for _, dialect in dialects:
+            results.append(measure(dialect, statement, get_query, options.repeat, cached=False))
+            results.append(measure(dialect, statement, get_query, options.repeat, cached=True))
+        print('{:<22}'.format(name) + ''.join('{:>16.1f}'.format(r) for r in results))
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,9 @@ class ApiErrorCodes:
     ATTEMPT_TO_GET_FOREIGN_CLICKS_DATA = 19
     ATTEMPT_TO_GET_FOREIGN_VIEWS_DATA = 20
     ATTEMPT_TO_GET_FOREIGN_PLACEMENT = 21
+    INGEST_IS_UNAVAILABLE = 22
+    BATCH_IS_TOO_LARGE = 23
+    AUTH_IS_OVERLOADED = 24
 
 
 _config = ConfigParser()
@@ -54,3 +57,22 @@ class AdvertOrderRanks:
     @classmethod
     def as_choices(cls):
         return [cls.LOW, cls.MIDDLE, cls.HIGH]
+
+
+class EventTypes:
+    CLICK = 'click'
+    VIEW = 'view'
+
+    @classmethod
+    def as_choices(cls):
+        return [cls.CLICK, cls.VIEW]
+
+
+class TimeBuckets:
+    MONTH = 'month'
+    DAY = 'day'
+    HOUR = 'hour'
+
+    @classmethod
+    def as_choices(cls):
+        return [cls.MONTH, cls.DAY, cls.HOUR]
@@ -1,7 +1,8 @@
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from extensions.controllers import BaseController
-from extensions.serializers import serialize
+from extensions.serializers import serialize, serialize_stream
+from constants import EventTypes
 from extensions.user_model import User
 from data_access.advert_orders import AdvertOrdersQueryFactory as AdvertOrdersQF
 from serialization.advert_orders import list_advert_orders_schema
@@ -14,45 +15,52 @@ from controllers.mixins import GrabAnalyticsMixin
 
 
 class AdvertOrdersController(GrabAnalyticsMixin, BaseController):
+    analytics_entity = 'advert_order'
 
-    async def _get_views_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime):
-        check_ownership_query = AdvertOrdersQF.get_advert_order_by_id(uid)
-        query = AdvertOrdersQF.get_views(uid, start_date, end_date)
-        async with self.db.acquire() as conn:
-            rp = await conn.execute(check_ownership_query)
-            data = await rp.first()
-
-            if data is None:
-                raise AdvertOrderDoesNotExist()
+    def _check_owner(self, owner_id, user: User, event_type: str):
+        if owner_id is None:
+            raise AdvertOrderDoesNotExist()
 
-            if data.owner_id != user.specific_data['specific_id']:
-                raise AttemptToGetForeignViews()
+        if owner_id != user.specific_data['specific_id']:
+            raise AttemptToGetForeignClicks() if event_type == EventTypes.CLICK else AttemptToGetForeignViews()
 
-            rp = await conn.execute(query)
-        return rp
+    async def _check_analytics_access(self, conn, user: User, uid: int, event_type: str):
+        self._check_owner(await conn.scalar(AdvertOrdersQF.get_owner_id(uid)), user, event_type)
 
-    async def _get_clicks_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime):
-        check_ownership_query = AdvertOrdersQF.get_advert_order_by_id(uid)
-        query = AdvertOrdersQF.get_clicks(uid, start_date, end_date)
-        async with self.db.acquire() as conn:
-            rp = await conn.execute(check_ownership_query)
-            data = await rp.first()
+    async def _get_views_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime,
+                                       bucket: str) -> list:
+        query = AdvertOrdersQF.get_owned_grouped_views(uid, start_date, end_date, bucket)
+        return await self._get_owned_bucket_rows(user, EventTypes.VIEW, query)
 
-            if data is None:
-                raise AdvertOrderDoesNotExist()
-
-            if data.owner_id != user.specific_data['specific_id']:
-                raise AttemptToGetForeignClicks()
-
-            rp = await conn.execute(query)
-        return rp
+    async def _get_clicks_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime,
+                                        bucket: str) -> list:
+        query = AdvertOrdersQF.get_owned_grouped_clicks(uid, start_date, end_date, bucket)
+        return await self._get_owned_bucket_rows(user, EventTypes.CLICK, query)
 
     @serialize(schema=list_advert_orders_schema)
     async def get_orders(self, user: User) -> list:
-        async with self.db.acquire() as conn:
+        async with self.read_db.acquire() as conn:
             rp = await conn.execute(AdvertOrdersQF.get_advert_orders(user.specific_data['specific_id']))
         return rp
 
+    @serialize_stream(schema=list_advert_orders_schema)
+    async def stream_orders(self, user: User):
+        return AdvertOrdersQF.get_advert_orders(user.specific_data['specific_id'])
+
+    async def get_order_version(self, order_id: int, user: User = None):
+        """
+        Version of the order data and of its analytics, `None` if the order does not exist. With `user` it's
+        also `None` if the user doesn't own the order, so the handler checks the ownership.
+        """
+        if user is None:
+            query = AdvertOrdersQF.get_version(order_id)
+        else:
+            query = AdvertOrdersQF.get_owned_version(order_id, user.specific_data['specific_id'])
+        async with self.db.acquire() as conn:
+            rp = await conn.execute(query)
+            data = await rp.first()
+        return None if data is None else tuple(data)
+
     async def get_order(self, order_id: int) -> dict:
         async with self.db.acquire() as conn:
             rp = await conn.execute(AdvertOrdersQF.get_advert_order_by_id(order_id))
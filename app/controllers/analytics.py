@@ -1,28 +1,130 @@
+from datetime import datetime
 from psycopg2 import IntegrityError
+from constants import EventTypes
+from extensions.db import DB_UNAVAILABLE_ERRORS, is_pool_saturated
 from extensions.controllers import BaseController
-from data_access.analytics import ClicksQueryFactory as ClicksQF, ViewsQueryFactory as ViewsQF
+from extensions.ingest import write_events
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
 from exceptions.analytics import PlacementDoesNotExist
 
 
 class AnalyticsController(BaseController):
 
-    async def register_click(self, placement_id: int):
-        query = ClicksQF.create_click(placement_id)
+    def _check_placement_existence(self, placement_id: int):
+        placement_index = self.app.placement_index
+        if placement_index is not None and placement_id not in placement_index:
+            raise PlacementDoesNotExist()
+
+    def _filter_indexed_placement_ids(self, placement_ids: set) -> set:
+        """
+        Without the placement index every id is considered to be existing, unknown ones are dropped later on write.
+        """
+        placement_index = self.app.placement_index
+        if placement_index is None:
+            return placement_ids
+        return {p_id for p_id in placement_ids if p_id in placement_index}
+
+    @property
+    def _defer_counts(self) -> bool:
+        return self.app.counter_folder is not None
+
+    def _should_spool(self) -> bool:
+        return self.app.spool is not None and is_pool_saturated(self.db)
+
+    async def _spool_events(self, grouped: dict):
+        for event_type, rows in grouped.items():
+            await self.app.spool.append_many(event_type, rows)
+
+    async def _register_event(self, event_type: str, placement_id: int):
+        self._check_placement_existence(placement_id)
+
+        if self.app.ingest_buffer is not None:
+            await self.app.ingest_buffer.add(event_type, placement_id)
+            return
+
+        if self._should_spool():
+            await self.app.spool.append_many(event_type, [{'placement_id': placement_id}])
+            return
+
+        try:
+            async with self.db.acquire() as conn:
+                try:
+                    await write_events(conn, event_type, [{
+                        'placement_id': placement_id,
+                        'registered_at': datetime.now()
+                    }], drop_unknown=False, defer_counts=self._defer_counts)
+                except IntegrityError:
+                    raise PlacementDoesNotExist()
+        except DB_UNAVAILABLE_ERRORS:
+            if self.app.spool is None:
+                raise
+            await self.app.spool.append_many(event_type, [{'placement_id': placement_id}])
 
-        async with self.db.acquire() as conn:
-            try:
-                await conn.execute(query)
-            except IntegrityError:
-                raise PlacementDoesNotExist()
+    async def register_click(self, placement_id: int):
+        await self._register_event(EventTypes.CLICK, placement_id)
 
     async def register_view(self, placement_id: int):
-        query = ViewsQF.create_view(placement_id)
+        await self._register_event(EventTypes.VIEW, placement_id)
+
+    @staticmethod
+    def _group_events(events: list, existing_ids: set) -> tuple:
+        now = datetime.now()
+        grouped = {event_type: [] for event_type in EventTypes.as_choices()}
+        rejected = []
+        for position, event in enumerate(events):
+            if event['placement_id'] not in existing_ids:
+                rejected.append(position)
+                continue
+            grouped[event['type']].append({
+                'placement_id': event['placement_id'],
+                'registered_at': event.get('ts') or now
+            })
+        return grouped, rejected
+
+    async def register_events(self, events: list) -> list:
+        """
+        Registers a batch of events (dicts with `type`, `placement_id` and `ts` keys) with one insert per
+        event type. Returns positions of the events which were rejected because their placement does not exist.
+        """
+        if not events:
+            return []
+
+        placement_ids = {e['placement_id'] for e in events}
+
+        if self.app.placement_index is not None and self.app.ingest_buffer is not None:
+            grouped, rejected = self._group_events(events, self._filter_indexed_placement_ids(placement_ids))
+            await self.app.ingest_buffer.add_grouped(grouped)
+            return rejected
+
+        if self.app.ingest_buffer is None and self._should_spool():
+            grouped, rejected = self._group_events(events, self._filter_indexed_placement_ids(placement_ids))
+            await self._spool_events(grouped)
+            return rejected
+
+        try:
+            async with self.db.acquire() as conn:
+                if self.app.placement_index is not None:
+                    existing_ids = self._filter_indexed_placement_ids(placement_ids)
+                else:
+                    rp = await conn.execute(PlacementsQF.get_existing_ids(list(placement_ids)))
+                    existing_ids = {row.id for row in await rp.fetchall()}
+
+                grouped, rejected = self._group_events(events, existing_ids)
+                if self.app.ingest_buffer is None:
+                    for event_type, rows in grouped.items():
+                        if rows:
+                            await write_events(conn, event_type, rows, defer_counts=self._defer_counts)
+        except DB_UNAVAILABLE_ERRORS:
+            if self.app.spool is None:
+                raise
+            grouped, rejected = self._group_events(events, self._filter_indexed_placement_ids(placement_ids))
+            if self.app.ingest_buffer is None:
+                await self._spool_events(grouped)
+
+        if self.app.ingest_buffer is not None:
+            await self.app.ingest_buffer.add_grouped(grouped)
 
-        async with self.db.acquire() as conn:
-            try:
-                await conn.execute(query)
-            except IntegrityError:
-                raise PlacementDoesNotExist()
+        return rejected
 
     async def get_script(self, placement_id: int):
         """
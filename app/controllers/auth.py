@@ -15,9 +15,14 @@ class AuthController(BaseController):
                           settings.JWT_SECRET,
                           algorithm=settings.JWT_ALGORITHM).decode('utf8')
 
+    async def __hashpw(self, password: bytes, salt: bytes) -> bytes:
+        if self.app.hashing_executor is None:
+            return await self.to_thread(bcrypt.hashpw, password, salt)
+        return await self.app.hashing_executor.run(bcrypt.hashpw, password, salt)
+
     async def __get_signup_base_user_query(self, email: str, password: str, first_name: str = None, last_name: str = None):
-        salt = await self.to_thread(bcrypt.gensalt, rounds=settings.SALT_ROUNDS)
-        hashed_password = (await self.to_thread(bcrypt.hashpw, password.encode('utf8'), salt)).decode('utf8')
+        salt = bcrypt.gensalt(rounds=settings.SALT_ROUNDS)
+        hashed_password = (await self.__hashpw(password.encode('utf8'), salt)).decode('utf8')
 
         return AuthQF.insert_base_user(email=email, hashed_password=hashed_password,
                                        first_name=first_name, last_name=last_name)
@@ -81,9 +86,7 @@ class AuthController(BaseController):
             right_hashed_pw = result.hashed_password
 
         try:
-            hashed_pw = (await self.to_thread(bcrypt.hashpw,
-                                              password.encode('utf8'),
-                                              right_hashed_pw.encode('utf8'))).decode('utf8')
+            hashed_pw = (await self.__hashpw(password.encode('utf8'), right_hashed_pw.encode('utf8'))).decode('utf8')
         except ValueError:
             raise InvalidPassword()
 
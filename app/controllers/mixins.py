@@ -1,10 +1,66 @@
+import sys
 from datetime import datetime, timedelta
-from collections import Counter
+from settings import settings
+from constants import TimeBuckets, EventTypes
 from extensions.user_model import User
 from serialization.analytics import serialize_year_data, serialize_month_data, serialize_day_data
 
 
+def get_bucket_counts(rows) -> dict:
+    return {int(row.bucket): int(row.count) for row in rows}
+
+
+def get_bucket_counts_size(counts: dict) -> int:
+    return sys.getsizeof(counts) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in counts.items())
+
+
+def get_period_ttl(period_end: datetime) -> float:
+    """
+    A period is closed once late events for it can't be ingested anymore, its counts are cached for long.
+    Not forever: replayed or rebuilt events and replica reads can still change the counts of a closed period.
+    """
+    if period_end + timedelta(seconds=settings.ANALYTICS_CACHE_CLOSE_DELAY) <= datetime.now():
+        return settings.ANALYTICS_CACHE_CLOSED_PERIOD_TTL
+    return settings.ANALYTICS_CACHE_OPEN_PERIOD_TTL
+
+
 class GrabAnalyticsMixin:
+    """
+    Bucket counts are cached in the app analytics cache, if there is one, by entity, metric, bucket and period.
+    The ownership is checked on every call, cached counts or not. Both run on a replica if the app has them.
+    """
+    analytics_entity = None
+
+    async def _get_owned_bucket_rows(self, user: User, event_type: str, query) -> list:
+        """
+        Runs an owned grouped query, which returns the owner id on every row, and checks the ownership with
+        `_check_owner` before the rows are returned.
+        """
+        async with self.read_db.acquire() as conn:
+            rp = await conn.execute(query)
+            rows = await rp.fetchall()
+        self._check_owner(rows[0][0] if rows else None, user, event_type)
+        return [row for row in rows if row.bucket is not None]
+
+    async def _get_bucket_counts(self, user: User, uid: int, event_type: str, start_date: datetime,
+                                 end_date: datetime, bucket: str, period_end: datetime) -> dict:
+        cache = self.app.analytics_cache
+        key = (self.analytics_entity, uid, event_type, bucket, start_date)
+        counts = cache.get(key) if cache is not None else None
+        if counts is not None:
+            async with self.read_db.acquire() as conn:
+                await self._check_analytics_access(conn, user, uid, event_type)
+            return counts
+
+        if event_type == EventTypes.CLICK:
+            rows = await self._get_clicks_in_date_range(user, uid, start_date, end_date, bucket)
+        else:
+            rows = await self._get_views_in_date_range(user, uid, start_date, end_date, bucket)
+        counts = get_bucket_counts(rows)
+
+        if cache is not None:
+            cache.set(key, counts, ttl=get_period_ttl(period_end))
+        return counts
 
     async def get_year_views(self, user: User, uid: int, year: int = None) -> list:
         if year is None:
@@ -13,8 +69,9 @@ class GrabAnalyticsMixin:
         start_date = datetime(year, 1, 1)
         end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
 
-        rp = await self._get_views_in_date_range(user, uid, start_date, end_date)
-        return serialize_year_data(dict(Counter([row[0].month for row in rp])))
+        counts = await self._get_bucket_counts(user, uid, EventTypes.VIEW, start_date, end_date, TimeBuckets.MONTH,
+                                               datetime(year + 1, 1, 1))
+        return serialize_year_data(counts)
 
     async def get_month_views(self, user: User, uid: int, year: int = None, month: int = None) -> list:
         now = datetime.now()
@@ -28,8 +85,9 @@ class GrabAnalyticsMixin:
         end_date_raw = datetime(year, month + 1, 1) if month < 12 else datetime(year + 1, 1, 1)
         end_date = min(end_date_raw, now)
 
-        rp = await self._get_views_in_date_range(user, uid, start_date, end_date)
-        return serialize_month_data(dict(Counter(row[0].day for row in rp)), year, month)
+        counts = await self._get_bucket_counts(user, uid, EventTypes.VIEW, start_date, end_date, TimeBuckets.DAY,
+                                               end_date_raw)
+        return serialize_month_data(counts, year, month)
 
     async def get_day_views(self, user: User, uid: int, year: int = None, month: int = None, day: int = None) -> list:
         now = datetime.now()
@@ -44,8 +102,9 @@ class GrabAnalyticsMixin:
         start_date = datetime(year, month, day, 0)
         end_date = datetime(year, month, day + 1, 0) - timedelta(seconds=1)
 
-        rp = await self._get_views_in_date_range(user, uid, start_date, end_date)
-        return serialize_day_data(dict(Counter(row[0].hour for row in rp)))
+        counts = await self._get_bucket_counts(user, uid, EventTypes.VIEW, start_date, end_date, TimeBuckets.HOUR,
+                                               start_date + timedelta(days=1))
+        return serialize_day_data(counts)
 
     async def get_year_clicks(self, user: User, uid: int, year: int = None) -> list:
         if year is None:
@@ -54,8 +113,9 @@ class GrabAnalyticsMixin:
         start_date = datetime(year, 1, 1)
         end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
 
-        rp = await self._get_clicks_in_date_range(user, uid, start_date, end_date)
-        return serialize_year_data(dict(Counter([row[0].month for row in rp])))
+        counts = await self._get_bucket_counts(user, uid, EventTypes.CLICK, start_date, end_date, TimeBuckets.MONTH,
+                                               datetime(year + 1, 1, 1))
+        return serialize_year_data(counts)
 
     async def get_month_clicks(self, user: User, uid: int, year: int = None, month: int = None) -> list:
         now = datetime.now()
@@ -69,8 +129,9 @@ class GrabAnalyticsMixin:
         end_date_raw = datetime(year, month + 1, 1) if month < 12 else datetime(year + 1, 1, 1)
         end_date = min(end_date_raw, now)
 
-        rp = await self._get_clicks_in_date_range(user, uid, start_date, end_date)
-        return serialize_month_data(dict(Counter(row[0].day for row in rp)), year, month)
+        counts = await self._get_bucket_counts(user, uid, EventTypes.CLICK, start_date, end_date, TimeBuckets.DAY,
+                                               end_date_raw)
+        return serialize_month_data(counts, year, month)
 
     async def get_day_clicks(self, user: User, uid: int, year: int = None, month: int = None, day: int = None) -> list:
         now = datetime.now()
@@ -85,5 +146,6 @@ class GrabAnalyticsMixin:
         start_date = datetime(year, month, day, 0)
         end_date = datetime(year, month, day + 1, 0) - timedelta(seconds=1)
 
-        rp = await self._get_clicks_in_date_range(user, uid, start_date, end_date)
-        return serialize_day_data(dict(Counter(row[0].hour for row in rp)))
+        counts = await self._get_bucket_counts(user, uid, EventTypes.CLICK, start_date, end_date, TimeBuckets.HOUR,
+                                               start_date + timedelta(days=1))
+        return serialize_day_data(counts)
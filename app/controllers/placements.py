@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta
 from collections import Counter
 from psycopg2 import IntegrityError
+from constants import EventTypes
 from extensions.db import DatabaseErrors
 from extensions.user_model import User
 from extensions.controllers import BaseController
-from extensions.serializers import serialize
+from extensions.serializers import serialize, serialize_stream
 from data_access.placements import PlacementsQueryFactory as PlacementsQF
 from serialization.placements import list_placements_schema
 from exceptions.analytics import AttemptToGetForeignClicks, AttemptToGetForeignViews
@@ -15,46 +16,49 @@ from controllers.mixins import GrabAnalyticsMixin
 
 
 class PlacementsController(GrabAnalyticsMixin, BaseController):
+    analytics_entity = 'placement'
 
-    async def _get_views_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime):
-        check_ownership_query = PlacementsQF.get_placement(uid)
-        query = PlacementsQF.get_views(uid, start_date, end_date)
-        async with self.db.acquire() as conn:
-            rp = await conn.execute(check_ownership_query)
-            p_data = await rp.first()
-
-            if p_data is None:
-                raise PlacementDoesNotExist()
-
-            if p_data.placer_id != user.specific_data['specific_id']:
-                raise AttemptToGetForeignViews()
-
-            rp = await conn.execute(query)
-        return rp
+    def _check_owner(self, owner_id, user: User, event_type: str):
+        if owner_id is None:
+            raise PlacementDoesNotExist()
 
-    async def _get_clicks_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime):
-        check_ownership_query = PlacementsQF.get_placement(uid)
-        query = PlacementsQF.get_clicks(uid, start_date, end_date)
-        async with self.db.acquire() as conn:
-            rp = await conn.execute(check_ownership_query)
-            p_data = await rp.first()
+        if owner_id != user.specific_data['specific_id']:
+            raise AttemptToGetForeignClicks() if event_type == EventTypes.CLICK else AttemptToGetForeignViews()
 
-            if p_data is None:
-                raise PlacementDoesNotExist()
+    async def _check_analytics_access(self, conn, user: User, uid: int, event_type: str):
+        self._check_owner(await conn.scalar(PlacementsQF.get_placer_id(uid)), user, event_type)
 
-            if p_data.placer_id != user.specific_data['specific_id']:
-                raise AttemptToGetForeignClicks()
+    async def _get_views_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime,
+                                       bucket: str) -> list:
+        query = PlacementsQF.get_owned_grouped_views(uid, start_date, end_date, bucket)
+        return await self._get_owned_bucket_rows(user, EventTypes.VIEW, query)
 
-            rp = await conn.execute(query)
-        return rp
+    async def _get_clicks_in_date_range(self, user: User, uid: int, start_date: datetime, end_date: datetime,
+                                        bucket: str) -> list:
+        query = PlacementsQF.get_owned_grouped_clicks(uid, start_date, end_date, bucket)
+        return await self._get_owned_bucket_rows(user, EventTypes.CLICK, query)
 
     @serialize(schema=list_placements_schema)
     async def get_placements(self, user: User) -> list:
         query = PlacementsQF.get_placements(user.specific_data['specific_id'])
 
-        async with self.db.acquire() as conn:
+        async with self.read_db.acquire() as conn:
             return await conn.execute(query)
 
+    @serialize_stream(schema=list_placements_schema)
+    async def stream_placements(self, user: User):
+        return PlacementsQF.get_placements(user.specific_data['specific_id'])
+
+    async def get_placement_version(self, user: User, placement_id: int):
+        """
+        Version of the placement data and of its analytics, `None` if the placement does not exist or the user
+        doesn't own it, so the handler checks the ownership. Only the counters change after the creation.
+        """
+        async with self.db.acquire() as conn:
+            rp = await conn.execute(PlacementsQF.get_owned_version(placement_id, user.specific_data['specific_id']))
+            data = await rp.first()
+        return None if data is None else tuple(data)
+
     async def get_placement(self, user: User, placement_id: int) -> dict:
         query = PlacementsQF.get_placement(placement_id)
 
@@ -89,6 +93,9 @@ class PlacementsController(GrabAnalyticsMixin, BaseController):
                 elif code == DatabaseErrors.FOREIGN_KEY_VIOLATION:
                     raise AdvertOrderDoesNotExist()
 
+        if self.app.placement_index is not None:
+            self.app.placement_index.add(pk)
+
         return {'id': pk}
 
     async def delete_placement(self, user: User, placement_id: int) -> None:
@@ -106,3 +113,6 @@ class PlacementsController(GrabAnalyticsMixin, BaseController):
                 raise AttemptToRemoveForeignPlacement()
 
             await conn.execute(delete_query)
+
+        if self.app.placement_index is not None:
+            self.app.placement_index.discard(p_data.id)
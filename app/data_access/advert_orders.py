@@ -1,9 +1,10 @@
 from datetime import datetime
 import sqlalchemy as sa
-from sqlalchemy.sql import selectable, dml
+from sqlalchemy.sql import dml
 from constants import AdvertOrderRanks
 from data_access.placements import placements
-from data_access.analytics import clicks, views
+from data_access.rollups import clicks_rollups, views_rollups, truncate_date
+from data_access.statements import cached_statement, BoundStatement
 from . import metadata
 
 
@@ -13,72 +14,128 @@ advert_orders = sa.Table('advert_orders', metadata,
     sa.Column('rank', sa.Integer(), nullable=False, server_default=str(AdvertOrderRanks.LOW)),
     sa.Column('follow_url_link', sa.String(255), unique=True, nullable=False),
     sa.Column('description', sa.Text(), nullable=False),
-    sa.Column('owner_id', sa.Integer(), sa.ForeignKey('ad_providers.id'), nullable=False))
+    sa.Column('owner_id', sa.Integer(), sa.ForeignKey('ad_providers.id'), nullable=False),
+    sa.Column('clicks_count', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('views_count', sa.BigInteger(), nullable=False, server_default='0'),
+    # incremented by every update of the order data, so the version of the order is read without the data
+    sa.Column('revision', sa.Integer(), nullable=False, server_default='0'),
+    sa.Index('advert_orders_owner_id_idx', 'owner_id'))
 
 
-def get_for_order(table: sa.Table, o_id: int, start_date: datetime, end_date: datetime):
-    tables = advert_orders\
-        .outerjoin(placements, advert_orders.c.id == placements.c.order_id)\
-        .outerjoin(table, placements.c.id == table.c.placement_id)
-    return sa.select([table.c.registered_at]).select_from(tables).where(sa.and_(
-        advert_orders.c.id == o_id,
-        table.c.registered_at >= start_date,
-        table.c.registered_at <= end_date
-    ))
+def count_for_order(table: sa.Table):
+    """
+    Number of `table` events of all placements of the order in the outer query, counted from the raw events.
+    """
+    tables = placements.join(table, placements.c.id == table.c.placement_id)
+    return sa.select([sa.func.count()]).select_from(tables)\
+        .where(placements.c.order_id == advert_orders.c.id)\
+        .as_scalar()
+
+
+def get_grouped_for_order(rollups: sa.Table, o_id: int, start_bucket: datetime, end_date: datetime, bucket: str):
+    bucket_column = sa.extract(bucket, rollups.c.bucket).label('bucket')
+    return sa.select([bucket_column, sa.func.sum(rollups.c.count).label('count')]).where(sa.and_(
+        rollups.c.order_id == o_id,
+        rollups.c.grain == bucket,
+        rollups.c.bucket >= start_bucket,
+        rollups.c.bucket < end_date
+    )).group_by(bucket_column)
+
+
+@cached_statement
+def get_owned_grouped_for_order(rollups: sa.Table, bucket: str):
+    """
+    Bucket counts of the order along with its `owner_id`, so the ownership is checked in the same round trip.
+    No rows are returned if the order doesn't exist, a row with `NULL` bucket is returned if it has no counts.
+    """
+    o_id = sa.bindparam('o_id')
+    grouped = get_grouped_for_order(rollups, o_id, sa.bindparam('start_bucket'), sa.bindparam('end_date'),
+                                    bucket).alias('grouped')
+    return sa.select([advert_orders.c.owner_id, grouped.c.bucket, grouped.c.count])\
+        .select_from(advert_orders.outerjoin(grouped, sa.true()))\
+        .where(advert_orders.c.id == o_id)
+
+
+@cached_statement
+def get_advert_orders_statement():
+    columns = [
+        advert_orders.c.id,
+        advert_orders.c.heading_picture,
+        advert_orders.c.rank,
+        advert_orders.c.follow_url_link,
+        advert_orders.c.description,
+        advert_orders.c.clicks_count.label('clicks'),
+        advert_orders.c.views_count.label('views')
+    ]
+    return sa.select(columns)\
+        .where(advert_orders.c.owner_id == sa.bindparam('user_id'))\
+        .order_by(advert_orders.c.rank.desc())
+
+
+@cached_statement
+def get_advert_order_by_id_statement():
+    columns = [
+        advert_orders.c.id,
+        advert_orders.c.heading_picture,
+        advert_orders.c.follow_url_link,
+        advert_orders.c.rank,
+        advert_orders.c.description,
+        advert_orders.c.owner_id,
+        advert_orders.c.clicks_count.label('clicks'),
+        advert_orders.c.views_count.label('views')
+    ]
+    return sa.select(columns).where(advert_orders.c.id == sa.bindparam('order_id'))
+
+
+@cached_statement
+def get_version_statement():
+    return sa.select([advert_orders.c.revision, advert_orders.c.clicks_count, advert_orders.c.views_count])\
+        .where(advert_orders.c.id == sa.bindparam('order_id'))
+
+
+@cached_statement
+def get_owned_version_statement():
+    return sa.select([advert_orders.c.revision, advert_orders.c.clicks_count, advert_orders.c.views_count])\
+        .where(sa.and_(advert_orders.c.id == sa.bindparam('order_id'),
+                       advert_orders.c.owner_id == sa.bindparam('owner_id')))
+
+
+@cached_statement
+def get_owner_id_statement():
+    return sa.select([advert_orders.c.owner_id]).where(advert_orders.c.id == sa.bindparam('order_id'))
 
 
 class AdvertOrdersQueryFactory:
 
     @staticmethod
-    def get_advert_orders(user_id: int) -> selectable.Select:
-        columns = [
-            advert_orders.c.id,
-            advert_orders.c.heading_picture,
-            advert_orders.c.rank,
-            advert_orders.c.follow_url_link,
-            advert_orders.c.description,
-            sa.func.count(clicks.c.id).label('clicks'),
-            sa.func.count(views.c.id).label('views')
-        ]
-        tables = advert_orders\
-            .outerjoin(placements, advert_orders.c.id == placements.c.order_id)\
-            .outerjoin(views, placements.c.id == views.c.placement_id)\
-            .outerjoin(clicks, placements.c.id == clicks.c.placement_id)
-        return sa.select(columns)\
-            .select_from(tables)\
-            .where(advert_orders.c.owner_id == user_id)\
-            .group_by(advert_orders.c.id)\
-            .order_by(advert_orders.c.rank.desc())
+    def get_advert_orders(user_id: int) -> BoundStatement:
+        return get_advert_orders_statement().bind(user_id=user_id)
 
     @staticmethod
     def get_advert_order_by_id(order_id):
-        columns = [
-            advert_orders.c.id,
-            advert_orders.c.heading_picture,
-            advert_orders.c.follow_url_link,
-            advert_orders.c.rank,
-            advert_orders.c.description,
-            advert_orders.c.owner_id,
-            sa.func.count(clicks.c.id).label('clicks'),
-            sa.func.count(views.c.id).label('views')
-        ]
-        tables = advert_orders \
-            .outerjoin(placements, advert_orders.c.id == placements.c.order_id) \
-            .outerjoin(views, placements.c.id == views.c.placement_id) \
-            .outerjoin(clicks, placements.c.id == clicks.c.placement_id)
-        return sa.select(columns) \
-            .select_from(tables)\
-            .where(advert_orders.c.id == order_id) \
-            .group_by(advert_orders.c.id) \
-            .order_by(advert_orders.c.rank.desc())
+        return get_advert_order_by_id_statement().bind(order_id=order_id)
+
+    @staticmethod
+    def get_version(order_id):
+        return get_version_statement().bind(order_id=order_id)
+
+    @staticmethod
+    def get_owned_version(order_id, owner_id: int):
+        return get_owned_version_statement().bind(order_id=order_id, owner_id=owner_id)
+
+    @staticmethod
+    def get_owner_id(order_id):
+        return get_owner_id_statement().bind(order_id=order_id)
 
     @staticmethod
-    def get_clicks(o_id: int, start_date: datetime, end_date: datetime):
-        return get_for_order(clicks, o_id, start_date, end_date)
+    def get_owned_grouped_clicks(o_id: int, start_date: datetime, end_date: datetime, bucket: str):
+        return get_owned_grouped_for_order(clicks_rollups, bucket).bind(
+            o_id=o_id, start_bucket=truncate_date(start_date, bucket), end_date=end_date)
 
     @staticmethod
-    def get_views(o_id: int, start_date: datetime, end_date: datetime):
-        return get_for_order(views, o_id, start_date, end_date)
+    def get_owned_grouped_views(o_id: int, start_date: datetime, end_date: datetime, bucket: str):
+        return get_owned_grouped_for_order(views_rollups, bucket).bind(
+            o_id=o_id, start_bucket=truncate_date(start_date, bucket), end_date=end_date)
 
     @staticmethod
     def create_advert_order(link: str, heading_picture: str, description: str, owner_id: int) -> dml.Insert:
@@ -93,8 +150,9 @@ class AdvertOrdersQueryFactory:
             'description': description,
             'heading_picture': heading_picture
         }
+        data = {k: v for k, v in data_unfiltered.items() if v is not None}
         return sa.update(advert_orders)\
-            .values(**{k: v for k, v in data_unfiltered.items() if v is not None})\
+            .values(revision=advert_orders.c.revision + 1, **data)\
             .where(advert_orders.c.id == oid)
 
     @staticmethod
@@ -1,17 +1,25 @@
 import sqlalchemy as sa
+from sqlalchemy.sql import dml
 from . import metadata
 
 
+# Both tables are range partitioned by month on `registered_at` with `(id, registered_at)` as the primary key,
+# partitions are managed with `data_access.partitions`.
+
 clicks = sa.Table('clicks', metadata,
     sa.Column('id', sa.Integer(), primary_key=True),
     sa.Column('placement_id', sa.Integer(), sa.ForeignKey('placements.id'), nullable=False),
-    sa.Column('registered_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    sa.Column('registered_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    sa.Index('clicks_placement_registered_at_idx', 'placement_id', 'registered_at'),
+    sa.Index('clicks_registered_at_brin_idx', 'registered_at', postgresql_using='brin'))
 
 
 views = sa.Table('views', metadata,
     sa.Column('id', sa.Integer(), primary_key=True),
     sa.Column('placement_id', sa.Integer(), sa.ForeignKey('placements.id'), nullable=False),
-    sa.Column('registered_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    sa.Column('registered_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    sa.Index('views_placement_registered_at_idx', 'placement_id', 'registered_at'),
+    sa.Index('views_registered_at_brin_idx', 'registered_at', postgresql_using='brin'))
 
 
 class ClicksQueryFactory:
@@ -20,9 +28,17 @@ class ClicksQueryFactory:
     def create_click(placement_id: int):
         return sa.insert(clicks).values(placement_id=placement_id)
 
+    @staticmethod
+    def create_clicks(events: list) -> dml.Insert:
+        return sa.insert(clicks).values(events)
+
 
 class ViewsQueryFactory:
 
     @staticmethod
     def create_view(placement_id: int):
         return sa.insert(views).values(placement_id=placement_id)
+
+    @staticmethod
+    def create_views(events: list) -> dml.Insert:
+        return sa.insert(views).values(events)
@@ -1,6 +1,7 @@
 import sqlalchemy as sa
-from sqlalchemy.sql import selectable, dml
+from sqlalchemy.sql import dml
 from constants import UserTypes
+from data_access.statements import cached_statement, BoundStatement
 from . import metadata
 
 
@@ -28,21 +29,36 @@ ad_placers = sa.Table('ad_placers', metadata,
     sa.Column('visitors_per_day_count', sa.Integer(), nullable=False))
 
 
+def get_user_type_table(user_type: str) -> sa.Table:
+    return ad_placers if user_type == UserTypes.AD_PLACER else ad_providers
+
+
+@cached_statement
+def get_user_data_statement(join_with: sa.Table):
+    columns = [users]
+
+    if join_with is ad_placers:
+        columns += [ad_placers.c.id.label('specific_id'), ad_placers.c.website, ad_placers.c.visitors_per_day_count]
+    else:
+        columns += [ad_providers.c.id.label('specific_id'), ad_providers.c.is_locked]
+    return sa.select(columns)\
+        .select_from(users.join(join_with, users.c.id == join_with.c.user_id))\
+        .where(join_with.c.id == sa.bindparam('user_id'))
+
+
+@cached_statement
+def select_user_data_by_email_statement(ut_table: sa.Table):
+    tables = ut_table.join(users, ut_table.c.user_id == users.c.id)
+    columns = [ut_table.c.id, users.c.hashed_password]
+
+    return sa.select(columns).select_from(tables).where(users.c.email == sa.bindparam('email'))
+
+
 class AuthQueryFactory:
 
     @staticmethod
-    def get_user_data(user_type: UserTypes, user_id: int) -> selectable.Select:
-        columns = [users]
-
-        if user_type == UserTypes.AD_PLACER:
-            join_with = ad_placers
-            columns += [ad_placers.c.id.label('specific_id'), ad_placers.c.website, ad_placers.c.visitors_per_day_count]
-        else:
-            join_with = ad_providers
-            columns += [ad_providers.c.id.label('specific_id'), ad_providers.c.is_locked]
-        return sa.select(columns)\
-            .select_from(users.join(join_with, users.c.id == join_with.c.user_id))\
-            .where(join_with.c.id == user_id)
+    def get_user_data(user_type: UserTypes, user_id: int) -> BoundStatement:
+        return get_user_data_statement(get_user_type_table(user_type)).bind(user_id=user_id)
 
     @staticmethod
     def insert_base_user(email: str, hashed_password: str, first_name: str = None, last_name: str = None) -> dml.Insert:
@@ -63,10 +79,5 @@ class AuthQueryFactory:
         return sa.insert(ad_providers).values(user_id=user_id)
 
     @staticmethod
-    def select_user_data_by_email(email: str, user_type: str) -> selectable.Select:
-        ut_table = (ad_placers if user_type == UserTypes.AD_PLACER else ad_providers)
-
-        tables = ut_table.join(users, ut_table.c.user_id == users.c.id)
-        columns = [ut_table.c.id, users.c.hashed_password]
-
-        return sa.select(columns).select_from(tables).where(users.c.email == email)
+    def select_user_data_by_email(email: str, user_type: str) -> BoundStatement:
+        return select_user_data_by_email_statement(get_user_type_table(user_type)).bind(email=email)
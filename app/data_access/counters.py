@@ -0,0 +1,134 @@
+from collections import Counter
+import sqlalchemy as sa
+from constants import EventTypes
+from data_access.rollups import EVENT_TABLES
+from data_access.placements import placements, count_for_placement
+from data_access.advert_orders import advert_orders, count_for_order
+from . import metadata
+
+
+COUNTER_COLUMNS = {EventTypes.CLICK: 'clicks_count', EventTypes.VIEW: 'views_count'}
+
+
+# events already written to the raw tables whose rollups and counters are not updated yet,
+# appended by single event writes so they don't contend for the rows of popular placements
+uncounted_events = sa.Table('uncounted_events', metadata,
+    sa.Column('id', sa.BigInteger(), primary_key=True),
+    sa.Column('event_type', sa.String(8), nullable=False),
+    sa.Column('placement_id', sa.Integer(), nullable=False),
+    sa.Column('registered_at', sa.DateTime(), nullable=False))
+
+
+def count_uncounted_for_placement(event_type: str):
+    """
+    Number of uncounted events of the placement in the outer query.
+    """
+    return sa.select([sa.func.count()]).where(sa.and_(
+        uncounted_events.c.event_type == event_type,
+        uncounted_events.c.placement_id == placements.c.id
+    )).as_scalar()
+
+
+def count_uncounted_for_order(event_type: str):
+    """
+    Number of uncounted events of all placements of the order in the outer query.
+    """
+    tables = placements.join(uncounted_events, placements.c.id == uncounted_events.c.placement_id)
+    return sa.select([sa.func.count()]).select_from(tables).where(sa.and_(
+        uncounted_events.c.event_type == event_type,
+        placements.c.order_id == advert_orders.c.id
+    )).as_scalar()
+
+
+def get_placement_counts(events: list) -> list:
+    counts = Counter(e['placement_id'] for e in events)
+    return sorted(counts.items())
+
+
+class CountersQueryFactory:
+
+    @staticmethod
+    def add_counts(event_type: str, counts: list) -> list:
+        """
+        Statements which add `(placement_id, count)` pairs to the counters of the placements and of their orders.
+        Rows are locked in id order, placements before orders, so concurrent writers can't deadlock each other.
+        """
+        column = COUNTER_COLUMNS[event_type]
+        values = []
+        params = {}
+        for i, (placement_id, count) in enumerate(counts):
+            # typed, so a server-side prepared statement doesn't infer the placeholders of `VALUES` as text
+            values.append('(CAST(:placement_id_{i} AS integer), CAST(:count_{i} AS bigint))'.format(i=i))
+            params['placement_id_{}'.format(i)] = placement_id
+            params['count_{}'.format(i)] = count
+        values = ', '.join(values)
+
+        return [
+            sa.text("""
+                WITH v (placement_id, count) AS (VALUES {values}),
+                locked AS (
+                    SELECT id FROM placements WHERE id IN (SELECT placement_id FROM v) ORDER BY id FOR NO KEY UPDATE
+                )
+                UPDATE placements SET {column} = placements.{column} + v.count
+                FROM v
+                WHERE placements.id = v.placement_id AND placements.id IN (SELECT id FROM locked)
+            """.format(values=values, column=column)).bindparams(**params),
+            sa.text("""
+                WITH v (placement_id, count) AS (VALUES {values}),
+                o AS (
+                    SELECT placements.order_id, sum(v.count) AS count
+                    FROM v JOIN placements ON placements.id = v.placement_id
+                    GROUP BY placements.order_id
+                ),
+                locked AS (
+                    SELECT id FROM advert_orders WHERE id IN (SELECT order_id FROM o) ORDER BY id FOR NO KEY UPDATE
+                )
+                UPDATE advert_orders SET {column} = advert_orders.{column} + o.count
+                FROM o
+                WHERE advert_orders.id = o.order_id AND advert_orders.id IN (SELECT id FROM locked)
+            """.format(values=values, column=column)).bindparams(**params)
+        ]
+
+    @staticmethod
+    def add_uncounted(event_type: str, events: list):
+        return sa.insert(uncounted_events).values([{
+            'event_type': event_type,
+            'placement_id': e['placement_id'],
+            'registered_at': e['registered_at']
+        } for e in events])
+
+    @staticmethod
+    def take_uncounted(limit: int):
+        """
+        Deletes and returns the oldest uncounted events. Rows taken by a concurrent transaction are skipped,
+        so several processes can fold the counts at once.
+        """
+        return sa.text("""
+            DELETE FROM uncounted_events WHERE id IN (
+                SELECT id FROM uncounted_events ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED
+            )
+            RETURNING event_type, placement_id, registered_at
+        """).bindparams(limit=limit)
+
+    @staticmethod
+    def reconcile(event_type: str) -> list:
+        """
+        Statements which repair the counters which have drifted from the raw events, to be run within one
+        transaction. Writes to the events table are blocked meanwhile, so no increment is lost. The uncounted
+        events are left out of the counts, `CounterFolder` adds them once the transaction is committed.
+        """
+        column = COUNTER_COLUMNS[event_type]
+        table = EVENT_TABLES[event_type]
+        placement_count = count_for_placement(table) - count_uncounted_for_placement(event_type)
+        order_count = count_for_order(table) - count_uncounted_for_order(event_type)
+        return [
+            sa.text('LOCK TABLE {} IN SHARE MODE'.format(table.name)),
+            # keeps the folder from taking the uncounted events before the counters are repaired
+            sa.text('LOCK TABLE uncounted_events IN SHARE MODE'),
+            sa.update(placements)
+                .values(**{column: placement_count})
+                .where(placements.c[column] != placement_count),
+            sa.update(advert_orders)
+                .values(**{column: order_count})
+                .where(advert_orders.c[column] != order_count)
+        ]
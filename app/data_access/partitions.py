@@ -0,0 +1,52 @@
+import re
+from datetime import date
+import sqlalchemy as sa
+
+
+def add_months(month: date, count: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_partition_name(table_name: str, month: date) -> str:
+    return '{}_y{:04d}m{:02d}'.format(table_name, month.year, month.month)
+
+
+def parse_partition_month(table_name: str, partition_name: str):
+    """
+    Returns the first day of the month held by a monthly partition, or `None` for other partitions.
+    """
+    match = re.match(r'^{}_y(\d{{4}})m(\d{{2}})$'.format(re.escape(table_name)), partition_name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+class PartitionsQueryFactory:
+
+    @staticmethod
+    def get_partitions(table_name: str):
+        return sa.text("""
+            SELECT child.relname AS name
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table_name
+        """).bindparams(table_name=table_name)
+
+    @staticmethod
+    def create_partition(table_name: str, month: date):
+        # DDL takes no bind parameters, the bounds are dates rendered as literals
+        return sa.text("""
+            CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+            FOR VALUES FROM ('{start_date}') TO ('{end_date}')
+        """.format(partition=get_partition_name(table_name, month), table=table_name,
+                   start_date=month.isoformat(), end_date=add_months(month, 1).isoformat()))
+
+    @staticmethod
+    def detach_partition(table_name: str, partition_name: str):
+        return sa.text('ALTER TABLE {} DETACH PARTITION {}'.format(table_name, partition_name))
+
+    @staticmethod
+    def drop_partition(partition_name: str):
+        return sa.text('DROP TABLE {}'.format(partition_name))
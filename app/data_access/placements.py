@@ -1,7 +1,8 @@
 from datetime import datetime
 import sqlalchemy as sa
 from . import metadata
-from data_access.analytics import clicks, views
+from data_access.rollups import clicks_rollups, views_rollups, truncate_date
+from data_access.statements import cached_statement
 
 
 placements = sa.Table('placements', metadata,
@@ -9,64 +10,116 @@ placements = sa.Table('placements', metadata,
     sa.Column('placer_id', sa.Integer(), sa.ForeignKey('ad_placers.id'), nullable=False),
     sa.Column('order_id', sa.Integer(), sa.ForeignKey('advert_orders.id'), nullable=False),
     sa.Column('placed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
-    sa.UniqueConstraint('placer_id', 'order_id', name='placements_placer_order_uc'))
+    sa.Column('clicks_count', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('views_count', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.UniqueConstraint('placer_id', 'order_id', name='placements_placer_order_uc'),
+    sa.Index('placements_order_id_idx', 'order_id'))
 
 
-def get_for_placement(table: sa.Table, p_id: int, start_date: datetime, end_date: datetime):
-    return sa.select([table.c.registered_at]).where(sa.and_(
-        table.c.placement_id == p_id,
-        table.c.registered_at >= start_date,
-        table.c.registered_at <= end_date
+def count_for_placement(table: sa.Table):
+    """
+    Number of `table` events of the placement in the outer query, counted from the raw events.
+    """
+    return sa.select([sa.func.count()]).where(table.c.placement_id == placements.c.id).as_scalar()
+
+
+def get_grouped_for_placement(rollups: sa.Table, p_id: int, start_bucket: datetime, end_date: datetime, bucket: str):
+    bucket_column = sa.extract(bucket, rollups.c.bucket).label('bucket')
+    return sa.select([bucket_column, rollups.c.count]).where(sa.and_(
+        rollups.c.placement_id == p_id,
+        rollups.c.grain == bucket,
+        rollups.c.bucket >= start_bucket,
+        rollups.c.bucket < end_date
     ))
 
 
+@cached_statement
+def get_owned_grouped_for_placement(rollups: sa.Table, bucket: str):
+    """
+    Bucket counts of the placement along with its `placer_id`, so the ownership is checked in the same round trip.
+    No rows are returned if the placement doesn't exist, a row with `NULL` bucket is returned if it has no counts.
+    """
+    p_id = sa.bindparam('p_id')
+    grouped = get_grouped_for_placement(rollups, p_id, sa.bindparam('start_bucket'), sa.bindparam('end_date'),
+                                        bucket).alias('grouped')
+    return sa.select([placements.c.placer_id, grouped.c.bucket, grouped.c.count])\
+        .select_from(placements.outerjoin(grouped, sa.true()))\
+        .where(placements.c.id == p_id)
+
+
+def get_placement_columns() -> list:
+    return [
+        placements.c.id,
+        placements.c.placer_id,
+        placements.c.order_id,
+        placements.c.placed_at,
+        placements.c.views_count.label('views'),
+        placements.c.clicks_count.label('clicks')
+    ]
+
+
+@cached_statement
+def get_placements_statement():
+    return sa.select(get_placement_columns()).where(placements.c.placer_id == sa.bindparam('owner_id'))
+
+
+@cached_statement
+def get_owned_version_statement():
+    return sa.select([placements.c.clicks_count, placements.c.views_count])\
+        .where(sa.and_(placements.c.id == sa.bindparam('placement_id'),
+                       placements.c.placer_id == sa.bindparam('placer_id')))
+
+
+@cached_statement
+def get_placement_statement():
+    return sa.select(get_placement_columns()).where(placements.c.id == sa.bindparam('placement_id'))
+
+
+@cached_statement
+def get_placer_id_statement():
+    return sa.select([placements.c.placer_id]).where(placements.c.id == sa.bindparam('placement_id'))
+
+
+@cached_statement
+def get_existing_ids_statement():
+    return sa.select([placements.c.id]).where(placements.c.id == sa.func.any(sa.bindparam('placement_ids')))
+
+
 class PlacementsQueryFactory:
 
     @staticmethod
     def get_placements(owner_id: int):
-        columns = [
-            placements.c.id,
-            placements.c.placer_id,
-            placements.c.order_id,
-            placements.c.placed_at,
-            sa.func.count(views.c.id).label('views'),
-            sa.func.count(clicks.c.id).label('clicks')
-        ]
-        tables = placements\
-            .outerjoin(clicks, clicks.c.placement_id == placements.c.id)\
-            .outerjoin(views, views.c.placement_id == placements.c.id)
-        return sa\
-            .select(columns)\
-            .select_from(tables)\
-            .where(placements.c.placer_id == owner_id)\
-            .group_by(placements.c.id)
+        return get_placements_statement().bind(owner_id=owner_id)
 
     @staticmethod
     def get_placement(placement_id: int):
-        columns = [
-            placements.c.id,
-            placements.c.placer_id,
-            placements.c.order_id,
-            placements.c.placed_at,
-            sa.func.count(views.c.id).label('views'),
-            sa.func.count(clicks.c.id).label('clicks')
-        ]
-        tables = placements \
-            .outerjoin(clicks, clicks.c.placement_id == placements.c.id) \
-            .outerjoin(views, views.c.placement_id == placements.c.id)
-        return sa \
-            .select(columns) \
-            .select_from(tables) \
-            .where(placements.c.id == placement_id) \
-            .group_by(placements.c.id)
+        return get_placement_statement().bind(placement_id=placement_id)
+
+    @staticmethod
+    def get_owned_version(placement_id: int, placer_id: int):
+        return get_owned_version_statement().bind(placement_id=placement_id, placer_id=placer_id)
+
+    @staticmethod
+    def get_placer_id(placement_id: int):
+        return get_placer_id_statement().bind(placement_id=placement_id)
+
+    @staticmethod
+    def get_owned_grouped_clicks(p_id: int, start_date: datetime, end_date: datetime, bucket: str):
+        return get_owned_grouped_for_placement(clicks_rollups, bucket).bind(
+            p_id=p_id, start_bucket=truncate_date(start_date, bucket), end_date=end_date)
+
+    @staticmethod
+    def get_owned_grouped_views(p_id: int, start_date: datetime, end_date: datetime, bucket: str):
+        return get_owned_grouped_for_placement(views_rollups, bucket).bind(
+            p_id=p_id, start_bucket=truncate_date(start_date, bucket), end_date=end_date)
 
     @staticmethod
-    def get_clicks(p_id: int, start_date: datetime, end_date: datetime):
-        return get_for_placement(clicks, p_id, start_date, end_date)
+    def get_all_ids():
+        return sa.select([placements.c.id])
 
     @staticmethod
-    def get_views(p_id: int, start_date: datetime, end_date: datetime):
-        return get_for_placement(views, p_id, start_date, end_date)
+    def get_existing_ids(placement_ids: list):
+        return get_existing_ids_statement().bind(placement_ids=list(placement_ids))
 
     @staticmethod
     def create_placement(placer_id: int, order_id: int):
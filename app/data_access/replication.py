@@ -0,0 +1,22 @@
+import sqlalchemy as sa
+
+
+class ReplicationQueryFactory:
+
+    @staticmethod
+    def get_lag():
+        """
+        Seconds the server is behind its primary, `0` for a primary. A replica which has replayed everything it
+        received is not lagging, however long ago the last transaction was, as long as it's streaming from the
+        primary. A replica which isn't streaming has no known lag, `NULL`: it has replayed everything it received
+        but may be missing any amount of WAL. The status of the WAL receiver is only visible to superusers and
+        members of `pg_read_all_stats`, so the replica users need that role.
+        """
+        return sa.text("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END AS lag
+        """)
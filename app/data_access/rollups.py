@@ -0,0 +1,101 @@
+from datetime import datetime
+from collections import Counter
+import sqlalchemy as sa
+from constants import EventTypes, TimeBuckets
+from data_access.analytics import clicks, views
+from . import metadata
+
+
+clicks_rollups = sa.Table('clicks_rollups', metadata,
+    sa.Column('placement_id', sa.Integer(), sa.ForeignKey('placements.id'), primary_key=True),
+    sa.Column('grain', sa.String(8), primary_key=True),
+    sa.Column('bucket', sa.DateTime(), primary_key=True),
+    sa.Column('order_id', sa.Integer(), sa.ForeignKey('advert_orders.id'), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Index('clicks_rollups_order_grain_bucket_idx', 'order_id', 'grain', 'bucket'))
+
+
+views_rollups = sa.Table('views_rollups', metadata,
+    sa.Column('placement_id', sa.Integer(), sa.ForeignKey('placements.id'), primary_key=True),
+    sa.Column('grain', sa.String(8), primary_key=True),
+    sa.Column('bucket', sa.DateTime(), primary_key=True),
+    sa.Column('order_id', sa.Integer(), sa.ForeignKey('advert_orders.id'), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Index('views_rollups_order_grain_bucket_idx', 'order_id', 'grain', 'bucket'))
+
+
+ROLLUP_TABLES = {EventTypes.CLICK: clicks_rollups, EventTypes.VIEW: views_rollups}
+EVENT_TABLES = {EventTypes.CLICK: clicks, EventTypes.VIEW: views}
+
+
+def truncate_date(date: datetime, grain: str) -> datetime:
+    if grain == TimeBuckets.HOUR:
+        return date.replace(minute=0, second=0, microsecond=0)
+    if grain == TimeBuckets.DAY:
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_rollup_counts(events: list) -> list:
+    """
+    Aggregates events into `(placement_id, grain, bucket, count)` rows for every grain. Rows are sorted, so
+    concurrent upserts lock rollup rows in the same order.
+    """
+    counts = Counter()
+    for event in events:
+        for grain in TimeBuckets.as_choices():
+            counts[(event['placement_id'], grain, truncate_date(event['registered_at'], grain))] += 1
+    return sorted(key + (count,) for key, count in counts.items())
+
+
+class RollupsQueryFactory:
+
+    @staticmethod
+    def add_counts(event_type: str, counts: list):
+        table = ROLLUP_TABLES[event_type]
+        values = []
+        params = {}
+        for i, (placement_id, grain, bucket, count) in enumerate(counts):
+            # typed, so a server-side prepared statement doesn't infer the placeholders of `VALUES` as text
+            values.append('(CAST(:placement_id_{i} AS integer), CAST(:grain_{i} AS varchar), '
+                          'CAST(:bucket_{i} AS timestamp), CAST(:count_{i} AS bigint))'.format(i=i))
+            params['placement_id_{}'.format(i)] = placement_id
+            params['grain_{}'.format(i)] = grain
+            params['bucket_{}'.format(i)] = bucket
+            params['count_{}'.format(i)] = count
+        return sa.text("""
+            INSERT INTO {table} (placement_id, grain, bucket, order_id, count)
+            SELECT v.placement_id, v.grain, v.bucket, placements.order_id, v.count
+            FROM (VALUES {values}) AS v (placement_id, grain, bucket, count)
+            JOIN placements ON placements.id = v.placement_id
+            ON CONFLICT (placement_id, grain, bucket) DO UPDATE SET count = {table}.count + excluded.count
+        """.format(table=table.name, values=', '.join(values))).bindparams(**params)
+
+    @staticmethod
+    def rebuild(event_type: str) -> list:
+        """
+        Statements which recompute the rollups from the raw events, to be run within one transaction. The
+        uncounted events are left out of the rollups, `CounterFolder` adds them once the transaction is committed.
+        """
+        table = ROLLUP_TABLES[event_type]
+        events_table = EVENT_TABLES[event_type]
+        statements = [
+            sa.text('LOCK TABLE {} IN SHARE MODE'.format(events_table.name)),
+            # keeps the folder from taking the uncounted events before the rollups are rebuilt
+            sa.text('LOCK TABLE uncounted_events IN SHARE MODE'),
+            sa.delete(table)
+        ]
+        for grain in TimeBuckets.as_choices():
+            statements.append(sa.text("""
+                INSERT INTO {table} (placement_id, grain, bucket, order_id, count)
+                SELECT e.placement_id, '{grain}', date_trunc('{grain}', e.registered_at), placements.order_id, sum(e.n)
+                FROM (
+                    SELECT placement_id, registered_at, 1 AS n FROM {events_table}
+                    UNION ALL
+                    SELECT placement_id, registered_at, -1 AS n FROM uncounted_events WHERE event_type = '{event_type}'
+                ) AS e
+                JOIN placements ON placements.id = e.placement_id
+                GROUP BY e.placement_id, date_trunc('{grain}', e.registered_at), placements.order_id
+                HAVING sum(e.n) > 0
+            """.format(table=table.name, events_table=events_table.name, grain=grain, event_type=event_type)))
+        return statements
@@ -0,0 +1,74 @@
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+from sqlalchemy.sql.expression import ClauseElement
+
+
+class BoundCompiled:
+    """
+    Compiled statement shared by all calls, along with the values bound by one call.
+    """
+
+    def __init__(self, compiled, values: dict):
+        self._compiled = compiled
+        self._values = values
+
+    def __getattr__(self, name):
+        return getattr(self._compiled, name)
+
+    def __str__(self):
+        return self._compiled.string
+
+    @property
+    def params(self) -> dict:
+        return self.construct_params()
+
+    def construct_params(self, params=None, **kwargs) -> dict:
+        values = dict(self._values, **params) if params else self._values
+        return self._compiled.construct_params(values, **kwargs)
+
+
+class BoundStatement(ClauseElement):
+    """
+    Cached statement with values of its bind parameters, executed like any other construct. Compiling it
+    returns the statement compiled for the dialect once, only the values differ between calls.
+    """
+
+    def __init__(self, statement, values: dict):
+        self.statement = statement
+        self.values = values
+
+    def compile(self, bind=None, dialect=None, **kwargs):
+        if dialect is None:
+            return self.statement.construct.params(self.values).compile(bind=bind, **kwargs)
+        return BoundCompiled(self.statement.compile(dialect), self.values)
+
+
+class Statement:
+    """
+    Construct with `sa.bindparam` placeholders, compiled once per dialect.
+    """
+
+    def __init__(self, construct):
+        self.construct = construct
+        self._compiled = WeakKeyDictionary()
+
+    def compile(self, dialect):
+        compiled = self._compiled.get(dialect)
+        if compiled is None:
+            compiled = self._compiled[dialect] = self.construct.compile(dialect=dialect)
+        return compiled
+
+    def bind(self, **values) -> BoundStatement:
+        return BoundStatement(self, values)
+
+
+def cached_statement(build):
+    """
+    Decorates a function building a construct with `sa.bindparam` placeholders from the arguments which change
+    its SQL, such as tables or buckets. The construct is built once per distinct arguments and the query
+    factories bind the values of each call to the returned `Statement`.
+    """
+    @lru_cache(maxsize=None)
+    def wrapper(*args):
+        return Statement(build(*args))
+    return wrapper
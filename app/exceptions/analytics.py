@@ -11,3 +11,7 @@ class AttemptToGetForeignClicks(DefaultMessageException):
 
 class AttemptToGetForeignViews(DefaultMessageException):
     default_message = 'Attempt to fetch views data which belongs to someone else'
+
+
+class IngestBufferIsFull(DefaultMessageException):
+    default_message = 'Too many events are waiting to be written, please retry later'
@@ -15,3 +15,7 @@ class UserDoesNotExist(DefaultMessageException):
 
 class InvalidPassword(DefaultMessageException):
     default_message = 'The password provided is invalid'
+
+
+class PasswordHashingIsOverloaded(DefaultMessageException):
+    default_message = 'Too many sign ins are being processed right now, please retry later'
@@ -1,4 +1,6 @@
 from aiohttp.web import Application, Response
+from extensions.http import set_cors_headers
+from extensions.metrics import get_app_metrics
 
 
 class ImproperlyConfigured(Exception):
@@ -7,10 +9,45 @@ class ImproperlyConfigured(Exception):
 
 class App(Application):
 
-    def __init__(self, *, db, route_config, **kwargs):
+    def __init__(self, *, db, route_config, ingest_buffer=None, placement_index=None, spool=None,
+                 partition_maintainer=None, analytics_cache=None,
+                 principal_cache=None, token_cache=None, hashing_executor=None, replicas=None, metrics=None,
+                 counter_folder=None, **kwargs):
         super().__init__(**kwargs)
         self.__db = db
+        self.__ingest_buffer = ingest_buffer
+        self.__placement_index = placement_index
+        self.__spool = spool
+        self.__partition_maintainer = partition_maintainer
+        self.__analytics_cache = analytics_cache
+        self.__principal_cache = principal_cache
+        self.__token_cache = token_cache
+        self.__hashing_executor = hashing_executor
+        self.__replicas = replicas
+        self.__metrics = metrics
+        self.__counter_folder = counter_folder
+        self.__uncompressed_resources = set()
         self.configure_routes(route_config)
+        self.on_response_prepare.append(set_cors_headers)
+
+        if metrics is not None:
+            metrics.add_collector(lambda: get_app_metrics(self))
+
+        if ingest_buffer is not None:
+            self.on_shutdown.append(self.close_ingest_buffer)
+        if placement_index is not None:
+            self.on_shutdown.append(self.close_placement_index)
+        if partition_maintainer is not None:
+            self.on_shutdown.append(self.close_partition_maintainer)
+        if hashing_executor is not None:
+            self.on_shutdown.append(self.close_hashing_executor)
+        if counter_folder is not None:
+            self.on_shutdown.append(self.close_counter_folder)
+        if replicas is not None:
+            self.on_shutdown.append(self.close_replicas)
+        # the spool goes last, so events which the ingest buffer fails to flush on shutdown are kept
+        if spool is not None:
+            self.on_shutdown.append(self.close_spool)
 
     def make_options_handler(self, methods):
         async def options_handler(request):
@@ -25,6 +62,67 @@ class App(Application):
     def db(self):
         return self.__db
 
+    @property
+    def ingest_buffer(self):
+        return self.__ingest_buffer
+
+    @property
+    def placement_index(self):
+        return self.__placement_index
+
+    @property
+    def spool(self):
+        return self.__spool
+
+    @property
+    def analytics_cache(self):
+        return self.__analytics_cache
+
+    @property
+    def principal_cache(self):
+        return self.__principal_cache
+
+    @property
+    def token_cache(self):
+        return self.__token_cache
+
+    @property
+    def hashing_executor(self):
+        return self.__hashing_executor
+
+    @property
+    def replicas(self):
+        return self.__replicas
+
+    @property
+    def metrics(self):
+        return self.__metrics
+
+    @property
+    def counter_folder(self):
+        return self.__counter_folder
+
+    async def close_ingest_buffer(self, app):
+        await self.__ingest_buffer.close()
+
+    async def close_placement_index(self, app):
+        self.__placement_index.stop_reloading()
+
+    async def close_partition_maintainer(self, app):
+        self.__partition_maintainer.stop()
+
+    async def close_hashing_executor(self, app):
+        self.__hashing_executor.close()
+
+    async def close_counter_folder(self, app):
+        await self.__counter_folder.close()
+
+    async def close_replicas(self, app):
+        await self.__replicas.close()
+
+    async def close_spool(self, app):
+        await self.__spool.close()
+
     def configure_routes(self, route_config: dict):
         for path, config in route_config.items():
             if 'name' not in config:
@@ -35,11 +133,18 @@ class App(Application):
                 raise ImproperlyConfigured('Resource should have at least one allowed method')
 
             resource = self.router.add_resource(path, name=config['name'])
+            if not config.get('compress', True):
+                self.__uncompressed_resources.add(config['name'])
 
             for method, handler in config['methods'].items():
                 resource.add_route(method, handler)
             resource.add_route('options', self.make_options_handler(config['methods'].keys()))
 
+    def is_compression_enabled(self, request) -> bool:
+        route = request.match_info.route
+        resource = getattr(route, 'resource', None)
+        return resource is None or resource.name not in self.__uncompressed_resources
+
     def get_url(self, resource_name, parts=None, query=None):
         kwargs = {}
         if parts is not None:
@@ -0,0 +1,94 @@
+import sys
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    In-memory LRU cache with an optional TTL per entry. At most `max_entries` entries and, if `max_bytes` is given,
+    at most `max_bytes` of their estimated size are kept, the least recently used entries are evicted first.
+    `get_size` estimates the size of a value in bytes, an entry set without TTL is kept until it is evicted
+    or invalidated.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int = None, get_size=sys.getsizeof, timer=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.get_size = get_size
+        self.timer = timer
+
+        # key -> (value, expires_at, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._is_expired(entry)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def _is_expired(self, entry) -> bool:
+        expires_at = entry[1]
+        return expires_at is not None and expires_at <= self.timer()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is not None and self._is_expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: float = None):
+        if key in self._entries:
+            self._remove(key)
+
+        size = sys.getsizeof(key) + self.get_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = None if ttl is None else self.timer() + ttl
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,123 @@
+"""
+JSON codecs used for request bodies and responses. An accelerated library is picked when it is installed,
+the stdlib `json` module is the fallback. Every codec encodes to `bytes` and raises `InvalidJSON` on malformed
+input, so callers don't depend on the library in use.
+"""
+import json
+from collections import OrderedDict
+from settings import settings
+
+
+AUTO = 'auto'
+
+
+class InvalidJSON(ValueError):
+    pass
+
+
+class JSONCodec:
+    name = None
+
+    def dumps(self, data) -> bytes:
+        raise NotImplementedError()
+
+    def loads(self, data):
+        raise NotImplementedError()
+
+
+class StdlibCodec(JSONCodec):
+    name = 'json'
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data).encode('utf8')
+
+    def loads(self, data):
+        try:
+            if isinstance(data, bytes):
+                data = data.decode('utf8')
+            return json.loads(data)
+        except ValueError as e:
+            raise InvalidJSON(str(e))
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data) -> bytes:
+        return self._orjson.dumps(data, option=self._options)
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except ValueError as e:
+            raise InvalidJSON(str(e))
+
+
+class UJSONCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, data) -> bytes:
+        return self._ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode('utf8')
+
+    def loads(self, data):
+        try:
+            return self._ujson.loads(data)
+        except ValueError as e:
+            raise InvalidJSON(str(e))
+
+
+class RapidJSONCodec(JSONCodec):
+    name = 'rapidjson'
+
+    def __init__(self):
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def dumps(self, data) -> bytes:
+        return self._rapidjson.dumps(data, ensure_ascii=False).encode('utf8')
+
+    def loads(self, data):
+        try:
+            return self._rapidjson.loads(data)
+        except ValueError as e:
+            raise InvalidJSON(str(e))
+
+
+# in order of preference for the `auto` codec
+CODECS = OrderedDict((codec_class.name, codec_class) for codec_class in (
+    OrjsonCodec, UJSONCodec, RapidJSONCodec, StdlibCodec
+))
+
+
+def get_available_codecs() -> list:
+    codecs = []
+    for codec_class in CODECS.values():
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            pass
+    return codecs
+
+
+def get_codec(name: str = AUTO) -> JSONCodec:
+    """
+    Returns the codec called `name`, or the fastest installed one for `auto`. A codec requested by name must be
+    installed.
+    """
+    if name == AUTO:
+        return get_available_codecs()[0]
+    if name not in CODECS:
+        raise ValueError('Unknown JSON codec {}, expected one of: {}'.format(name, ', '.join(CODECS)))
+    return CODECS[name]()
+
+
+codec = get_codec(settings.JSON_CODEC)
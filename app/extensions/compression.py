@@ -0,0 +1,105 @@
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp.web import Response, ContentCoding
+from settings import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+executor = ThreadPoolExecutor(max_workers=settings.COMPRESSION_THREADS)
+
+
+def get_supported_encodings() -> tuple:
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def get_encoding_qualities(accept_encoding: str) -> dict:
+    """
+    Returns qualities of the codings listed in an `Accept-Encoding` header value, including `*`.
+    """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.strip().lower()] = quality
+    return qualities
+
+
+def _is_accepted(qualities: dict, encoding: str) -> bool:
+    # `*` only stands for the codings which aren't listed, so it doesn't override `gzip;q=0`
+    return qualities.get(encoding, qualities.get('*', 0)) > 0
+
+
+def choose_encoding(accept_encoding: str):
+    qualities = get_encoding_qualities(accept_encoding)
+    for encoding in get_supported_encodings():
+        if _is_accepted(qualities, encoding):
+            return encoding
+    return None
+
+
+def add_vary(response, header: str):
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = header
+    elif vary.strip() != '*' and header.lower() not in {h.strip().lower() for h in vary.split(',')}:
+        response.headers['Vary'] = '{}, {}'.format(vary, header)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+def should_compress(response) -> bool:
+    # streamed responses are already being sent and empty ones have nothing to compress
+    if not isinstance(response, Response) or response.body is None:
+        return False
+    if 'Content-Encoding' in response.headers or response.status in (204, 304):
+        return False
+    return len(response.body) >= settings.COMPRESSION_MIN_SIZE
+
+
+def enable_stream_compression(request, response):
+    """
+    Makes a `StreamResponse` which isn't prepared yet gzip its chunks as they are written, if the client accepts
+    gzip. Streamed responses are skipped by `compress_response`, and aiohttp can't stream brotli.
+    """
+    add_vary(response, 'Accept-Encoding')
+    if _is_accepted(get_encoding_qualities(request.headers.get('Accept-Encoding', '')), GZIP):
+        response.enable_compression(ContentCoding.gzip)
+
+
+async def compress_response(request, response, loop):
+    """
+    Compresses the body of `response` with the best coding accepted by the client. Bodies over
+    `COMPRESSION_EXECUTOR_MIN_SIZE` bytes are compressed in a thread, so they don't block the event loop.
+    """
+    if not should_compress(response):
+        return
+    add_vary(response, 'Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return
+
+    body = response.body
+    if len(body) >= settings.COMPRESSION_EXECUTOR_MIN_SIZE:
+        response.body = await loop.run_in_executor(executor, compress, body, encoding)
+    else:
+        response.body = compress(body, encoding)
+    response.headers['Content-Encoding'] = encoding
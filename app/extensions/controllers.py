@@ -1,6 +1,7 @@
 from asyncio import wrap_future
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from settings import settings
+from extensions.replicas import get_read_db
 
 
 class BaseController:
@@ -11,6 +12,13 @@ class BaseController:
         self.db = database
         self.app = app
 
+    @property
+    def read_db(self):
+        """
+        `db` for read-only queries which tolerate replication lag.
+        """
+        return get_read_db(self.app, self.db)
+
     async def to_thread(self, func, *args, **kwargs):
         return await wrap_future(self.thread_executor.submit(func, *args, **kwargs), loop=self.app.loop)
 
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from settings import settings
+from constants import EventTypes
+from extensions.ingest import add_counts
+from data_access.counters import CountersQueryFactory as CountersQF
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+
+class CounterFolder:
+    """
+    Periodically adds the uncounted events, appended by single event writes, to the rollups and to the
+    placement and order counters, `batch_size` events per transaction. A popular placement's rows are then
+    updated once per batch instead of once per event. Counts lag the raw events by up to `interval` seconds.
+    """
+
+    def __init__(self, db, loop, interval: float, batch_size: int):
+        self.db = db
+        self.loop = loop
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+        self.folded_events = 0
+
+    def stats(self) -> dict:
+        return {'folded_events': self.folded_events}
+
+    async def fold(self) -> int:
+        """
+        Adds one batch of uncounted events to the counts, returns the number of events added.
+        """
+        async with self.db.acquire() as conn:
+            trans = await conn.begin()
+            try:
+                rp = await conn.execute(CountersQF.take_uncounted(self.batch_size))
+                rows = await rp.fetchall()
+                grouped = {event_type: [] for event_type in EventTypes.as_choices()}
+                for row in rows:
+                    grouped[row.event_type].append({'placement_id': row.placement_id,
+                                                    'registered_at': row.registered_at})
+                for event_type, events in grouped.items():
+                    if events:
+                        await add_counts(conn, event_type, events)
+            except Exception:
+                await trans.rollback()
+                raise
+            await trans.commit()
+        self.folded_events += len(rows)
+        return len(rows)
+
+    async def fold_all(self):
+        while await self.fold() == self.batch_size:
+            pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.fold_all()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.fold_all()
+            except Exception:
+                logger.exception('Failed to add uncounted events to the counts')
+            await asyncio.sleep(self.interval, loop=self.loop)
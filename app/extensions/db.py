@@ -1,3 +1,68 @@
+from asyncio import TimeoutError
+from psycopg2 import OperationalError, InterfaceError
+
+
 class DatabaseErrors:
     FOREIGN_KEY_VIOLATION = 23503
     UNIQUE_VIOLATION = 23505
+
+
+# errors meaning that the database can't be reached right now, as opposed to errors caused by the query itself
+DB_UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, TimeoutError)
+
+
+def is_pool_saturated(db) -> bool:
+    return db.freesize == 0 and db.size >= db.maxsize
+
+
+class _RequestConnectionContextManager:
+
+    def __init__(self, request_connection):
+        self._request_connection = request_connection
+
+    def __await__(self):
+        return self._request_connection.get_connection().__await__()
+
+    async def __aenter__(self):
+        return await self._request_connection.get_connection()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # the connection is kept till the end of the request
+        pass
+
+
+class RequestConnection:
+    """
+    Stand-in for the engine which hands out one connection for the whole request: it's acquired from `engine`
+    on first use and released by `close` once the response is produced. Everything else is delegated to
+    `engine`. The connection is shared, so it must be used by one coroutine of the request at a time.
+    `checkouts` counts connections taken from the pool and `uses` counts connections asked for.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.checkouts = 0
+        self.uses = 0
+        self._conn = None
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    async def get_connection(self):
+        self.uses += 1
+        if self._conn is None:
+            self._conn = await self.engine.acquire()
+            self.checkouts += 1
+        return self._conn
+
+    def acquire(self) -> _RequestConnectionContextManager:
+        return _RequestConnectionContextManager(self)
+
+    def release(self, conn):
+        # the connection is released by `close`
+        pass
+
+    async def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self.engine.release(conn)
@@ -1,15 +1,19 @@
-import json
+from io import BytesIO
 from schematics.exceptions import ValidationError, ModelConversionError
 from extensions.http import HTTPBadRequest, HTTPUnauthorized, HTTPForbidden
+from extensions.codecs import codec, InvalidJSON
 from constants import ApiErrorCodes
 
 
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
 def validate_body_json(validator, kw_name='body'):
     def decorator(handler):
         async def wrapper(request, *args, **kwargs):
             try:
-                data = await request.json()
-            except json.JSONDecodeError:
+                data = codec.loads(await request.read())
+            except InvalidJSON:
                 return HTTPBadRequest(code=ApiErrorCodes.INVALID_BODY_JSON, errors={'general': ['Invalid JSON']})
             try:
                 v = validator(data)
@@ -22,6 +26,75 @@ def validate_body_json(validator, kw_name='body'):
     return decorator
 
 
+def _validate_item(validator, item):
+    if not isinstance(item, dict):
+        return None, {'general': ['Object is expected']}
+    try:
+        v = validator(item)
+        v.validate()
+        return v.to_native(), None
+    except (ValidationError, ModelConversionError) as e:
+        return None, e.messages
+
+
+def _get_batch_is_too_large_response(max_items):
+    return HTTPBadRequest(code=ApiErrorCodes.BATCH_IS_TOO_LARGE,
+                          errors={'general': ['At most {} items are allowed'.format(max_items)]})
+
+
+def validate_body_json_items(validator, max_items, kw_name='items', rejected_kw_name='rejected'):
+    """
+    Validates a body which is either a JSON array or newline delimited JSON objects (when sent with the
+    `application/x-ndjson` content type). Items are validated one by one, so a single invalid item doesn't
+    reject the whole body: valid items are passed as `(index, data)` pairs and invalid ones as
+    `{'index': index, 'errors': errors}` dicts.
+    """
+    def decorator(handler):
+        async def wrapper(request, *args, **kwargs):
+            raw_body = await request.read()
+            raw_items = []
+
+            if request.content_type == NDJSON_CONTENT_TYPE:
+                # lines are parsed one at a time, so parsing stops as soon as there are too many items
+                for line in BytesIO(raw_body):
+                    if not line.strip():
+                        continue
+                    if len(raw_items) == max_items:
+                        return _get_batch_is_too_large_response(max_items)
+                    try:
+                        raw_items.append((codec.loads(line), None))
+                    except InvalidJSON:
+                        raw_items.append((None, {'general': ['Invalid JSON']}))
+            else:
+                try:
+                    data = codec.loads(raw_body)
+                except InvalidJSON:
+                    return HTTPBadRequest(code=ApiErrorCodes.INVALID_BODY_JSON, errors={'general': ['Invalid JSON']})
+                if not isinstance(data, list):
+                    return HTTPBadRequest(code=ApiErrorCodes.BODY_VALIDATION_ERROR,
+                                          errors={'general': ['Array is expected']})
+                raw_items = [(item, None) for item in data]
+
+            if len(raw_items) > max_items:
+                return _get_batch_is_too_large_response(max_items)
+
+            items = []
+            rejected = []
+            for index, (item, errors) in enumerate(raw_items):
+                if errors is None:
+                    item, errors = _validate_item(validator, item)
+                if errors is None:
+                    items.append((index, item))
+                else:
+                    rejected.append({'index': index, 'errors': errors})
+
+            kwargs[kw_name] = items
+            kwargs[rejected_kw_name] = rejected
+            return await handler(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 def parse_query_params(validator, kw_name='params'):
     def decorator(handler):
         async def wrapper(request, *args, **kwargs):
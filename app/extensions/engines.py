@@ -0,0 +1,292 @@
+import re
+import asyncio
+import itertools
+import psycopg2
+from aiopg.sa import create_engine as create_aiopg_engine
+from sqlalchemy.sql.sqltypes import Integer
+from sqlalchemy.dialects.postgresql.base import PGDialect, PGCompiler
+from settings import settings
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+AIOPG = 'aiopg'
+ASYNCPG = 'asyncpg'
+
+
+class AsyncpgCompiler(PGCompiler):
+    """
+    Renders bind parameters as `$1, $2, ...` and leaves `%` as is, asyncpg uses server side parameters.
+    """
+
+    def _apply_numbered_params(self):
+        position = itertools.count(1)
+        self.string = re.sub(r':\[_POSITION\]', lambda m: '${}'.format(next(position)), self.string)
+
+    def escape_literal_column(self, text):
+        return text
+
+
+class AsyncpgDialect(PGDialect):
+    statement_compiler = AsyncpgCompiler
+    default_paramstyle = 'numeric'
+    implicit_returning = True
+
+
+def get_bind_args(compiled, params: dict = None) -> list:
+    """
+    Positional arguments of a statement compiled with `AsyncpgDialect`. Unlike psycopg2, asyncpg doesn't let the
+    server cast text arguments, so ids taken from URLs are converted to integers here.
+    """
+    values = compiled.construct_params(params)
+    args = []
+    for name in compiled.positiontup:
+        value = values[name]
+        if isinstance(value, str) and isinstance(compiled.binds[name].type, Integer):
+            value = int(value)
+        args.append(value)
+    return args
+
+
+class _PgCodeMixin:
+
+    def __init__(self, message, pgcode=None):
+        super().__init__(message)
+        self._pgcode = pgcode
+
+    @property
+    def pgcode(self):
+        return self._pgcode
+
+
+class AsyncpgIntegrityError(_PgCodeMixin, psycopg2.IntegrityError):
+    pass
+
+
+class AsyncpgOperationalError(_PgCodeMixin, psycopg2.OperationalError):
+    pass
+
+
+class AsyncpgDatabaseError(_PgCodeMixin, psycopg2.DatabaseError):
+    pass
+
+
+def translate_error(e: Exception) -> Exception:
+    """
+    asyncpg errors as the psycopg2 errors which the controllers and `DB_UNAVAILABLE_ERRORS` expect.
+    """
+    if isinstance(e, asyncpg.exceptions.IntegrityConstraintViolationError):
+        return AsyncpgIntegrityError(str(e), e.sqlstate)
+    if isinstance(e, (asyncpg.exceptions.PostgresConnectionError, asyncpg.exceptions.InterfaceError, OSError)):
+        return AsyncpgOperationalError(str(e))
+    if isinstance(e, asyncpg.exceptions.PostgresError):
+        return AsyncpgDatabaseError(str(e), e.sqlstate)
+    return e
+
+
+class Row:
+    """
+    asyncpg record with attribute access to its columns, like rows of aiopg.
+    """
+    __slots__ = ('_record',)
+
+    def __init__(self, record):
+        self._record = record
+
+    def __getattr__(self, name):
+        try:
+            return self._record[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        return self._record[key]
+
+    def __iter__(self):
+        return iter(self._record.values())
+
+    def __len__(self) -> int:
+        return len(self._record)
+
+    def keys(self):
+        return list(self._record.keys())
+
+
+class AsyncpgResultProxy:
+
+    def __init__(self, records: list):
+        self._records = records
+        self._position = 0
+
+    @property
+    def rowcount(self) -> int:
+        return len(self._records)
+
+    async def fetchone(self):
+        if self._position >= len(self._records):
+            return None
+        self._position += 1
+        return Row(self._records[self._position - 1])
+
+    async def fetchall(self) -> list:
+        rows = [Row(record) for record in self._records[self._position:]]
+        self._position = len(self._records)
+        return rows
+
+    async def first(self):
+        row = await self.fetchone()
+        self._position = len(self._records)
+        return row
+
+    async def scalar(self):
+        row = await self.first()
+        return row[0] if row is not None else None
+
+
+class AsyncpgTransaction:
+
+    def __init__(self, transaction):
+        self._transaction = transaction
+        self.is_active = True
+
+    async def commit(self):
+        self.is_active = False
+        await self._transaction.commit()
+
+    async def rollback(self):
+        self.is_active = False
+        await self._transaction.rollback()
+
+
+class AsyncpgConnection:
+    """
+    asyncpg connection which runs SQLAlchemy Core statements the way `aiopg.sa.SAConnection` does. Statements
+    are compiled with `AsyncpgDialect` and run as prepared statements, which asyncpg caches by their SQL.
+    """
+
+    def __init__(self, connection, dialect: AsyncpgDialect):
+        self.connection = connection
+        self._dialect = dialect
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.connection.is_in_transaction()
+
+    def _compile(self, query, multiparams, params):
+        if isinstance(query, str):
+            return query, list(multiparams[0]) if multiparams else []
+        compiled = query.compile(dialect=self._dialect)
+        return compiled.string, get_bind_args(compiled, params or None)
+
+    async def execute(self, query, *multiparams, **params) -> AsyncpgResultProxy:
+        sql, args = self._compile(query, multiparams, params)
+        try:
+            if not args and ';' in sql.strip().rstrip(';'):
+                # several statements can't be prepared, they are run with the simple query protocol
+                await self.connection.execute(sql)
+                records = []
+            else:
+                records = await self.connection.fetch(sql, *args)
+        except Exception as e:
+            raise translate_error(e) from e
+        return AsyncpgResultProxy(records)
+
+    async def scalar(self, query, *multiparams, **params):
+        rp = await self.execute(query, *multiparams, **params)
+        return await rp.scalar()
+
+    async def begin(self) -> AsyncpgTransaction:
+        transaction = self.connection.transaction()
+        await transaction.start()
+        return AsyncpgTransaction(transaction)
+
+
+class _AsyncpgAcquireContextManager:
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._conn = None
+
+    def __await__(self):
+        return self._engine.acquire_connection().__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._engine.acquire_connection()
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        conn, self._conn = self._conn, None
+        await self._engine.release(conn)
+
+
+class AsyncpgEngine:
+    """
+    Pool of asyncpg connections with the interface of `aiopg.sa.Engine` used by the app.
+    """
+
+    def __init__(self, pool, loop, maxsize: int):
+        self._pool = pool
+        self._loop = loop
+        self._maxsize = maxsize
+        self._in_use = 0
+        self._dialect = AsyncpgDialect()
+        self._closing = None
+
+    @property
+    def dialect(self) -> AsyncpgDialect:
+        return self._dialect
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @property
+    def size(self) -> int:
+        return self._maxsize
+
+    @property
+    def freesize(self) -> int:
+        return self._maxsize - self._in_use
+
+    def acquire(self) -> _AsyncpgAcquireContextManager:
+        return _AsyncpgAcquireContextManager(self)
+
+    async def acquire_connection(self) -> AsyncpgConnection:
+        try:
+            connection = await self._pool.acquire()
+        except Exception as e:
+            raise translate_error(e) from e
+        self._in_use += 1
+        return AsyncpgConnection(connection, self._dialect)
+
+    def release(self, conn: AsyncpgConnection):
+        self._in_use -= 1
+        return asyncio.ensure_future(self._pool.release(conn.connection), loop=self._loop)
+
+    def close(self):
+        self._closing = asyncio.ensure_future(self._pool.close(), loop=self._loop)
+
+    async def wait_closed(self):
+        if self._closing is not None:
+            await self._closing
+
+
+async def create_engine(user: str, database: str, host: str, password: str, loop=None, backend: str = None,
+                        minsize: int = 10, maxsize: int = 10):
+    """
+    Creates an engine of `backend`, `settings.DB_BACKEND` by default.
+    """
+    backend = backend or settings.DB_BACKEND
+    if backend == AIOPG:
+        return await create_aiopg_engine(user=user, database=database, host=host, password=password, loop=loop,
+                                         minsize=minsize, maxsize=maxsize)
+    if backend == ASYNCPG:
+        if asyncpg is None:
+            raise ValueError('asyncpg is not installed')
+        pool = await asyncpg.create_pool(user=user, database=database, host=host, password=password, loop=loop,
+                                         min_size=minsize, max_size=maxsize)
+        return AsyncpgEngine(pool, loop=loop or asyncio.get_event_loop(), maxsize=maxsize)
+    raise ValueError('Unknown database backend {}'.format(backend))
@@ -0,0 +1,74 @@
+import os
+import time
+from asyncio import wrap_future
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from exceptions.auth import PasswordHashingIsOverloaded
+
+
+def get_default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _timed_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class HashingExecutor:
+    """
+    Dedicated pool for password hashing, so a burst of sign ins doesn't hold up the rest of the work done in
+    `BaseController.thread_executor`. At most `max_pending` hashings are admitted, running or waiting for
+    a worker, the ones over the limit fail at once with `PasswordHashingIsOverloaded`. bcrypt releases the GIL,
+    so threads are used unless `use_processes` is on.
+    """
+
+    def __init__(self, loop, workers: int = None, max_pending: int = None, use_processes: bool = False):
+        self.loop = loop
+        self.workers = workers or get_default_workers()
+        self.max_pending = max_pending or self.workers * 4
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=self.workers)
+        self._pending = 0
+
+        self.hashed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._pending - self.workers, 0)
+
+    def stats(self) -> dict:
+        return {
+            'pending': self._pending,
+            'queue_depth': self.queue_depth,
+            'hashed': self.hashed,
+            'rejected': self.rejected,
+            'mean_latency': self.total_latency / self.hashed if self.hashed else 0.0,
+            'max_latency': self.max_latency
+        }
+
+    async def run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHashingIsOverloaded()
+
+        self._pending += 1
+        try:
+            result, latency = await wrap_future(self._executor.submit(_timed_call, func, *args), loop=self.loop)
+        finally:
+            self._pending -= 1
+
+        self.hashed += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -1,17 +1,23 @@
-import json
-from aiohttp.web import Response
+import hmac
+import hashlib
+from aiohttp.web import Response, StreamResponse
+from settings import settings
 from constants import ERROR_MESSAGES
+from extensions.codecs import codec
+from extensions.compression import enable_stream_compression
 
 
 class StatusCodes:
     OK = 200
     CREATED = 201
     NO_CONTENT = 204
+    NOT_MODIFIED = 304
     BAD_REQUEST = 400
     UNAUTHORIZED = 401
     FORBIDDEN = 403
     NOT_FOUND = 404
     METHOD_NOT_ALLOWED = 405
+    SERVICE_UNAVAILABLE = 503
 
 
 GET = 'get'
@@ -36,7 +42,7 @@ class JSONBodyResponse(StatusCodeResponse):
 
     def __init__(self, *args, data={}, **kwargs):
         kwargs['content_type'] = self.CONTENT_TYPE
-        kwargs['text'] = json.dumps(data)
+        kwargs['body'] = codec.dumps(data)
         super(JSONBodyResponse, self).__init__(**kwargs)
 
 
@@ -64,6 +70,10 @@ class HTTPNoContent(JSONBodyResponse):
     status_code = StatusCodes.NO_CONTENT
 
 
+class HTTPNotModified(StatusCodeResponse):
+    status_code = StatusCodes.NOT_MODIFIED
+
+
 class HTTPBadRequest(ApiErrorCodeResponse):
     status_code = StatusCodes.BAD_REQUEST
 
@@ -82,3 +92,122 @@ class HTTPNotFound(JSONBodyResponse):
 
 class HTTPMethodNotAllowed(JSONBodyResponse):
     status_code = StatusCodes.METHOD_NOT_ALLOWED
+
+
+class HTTPServiceUnavailable(ApiErrorCodeResponse):
+    status_code = StatusCodes.SERVICE_UNAVAILABLE
+
+
+CORS_REQUEST_KEY = 'cors'
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+    'Access-Control-Max-Age': '86400'
+}
+
+
+async def set_cors_headers(request, response):
+    """
+    `on_response_prepare` handler which adds the CORS headers to the responses of requests marked by
+    `cors_middleware`. Headers are set right before they are sent, so streamed responses get them as well.
+    """
+    if request.get(CORS_REQUEST_KEY):
+        response.headers.update(CORS_HEADERS)
+
+
+async def _get_next_chunk(items):
+    try:
+        return await items.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def stream_json_list(request, items, status: int = StatusCodes.OK) -> StreamResponse:
+    """
+    Writes a JSON array with chunked encoding, `items` is an asynchronous iterator over lists of array items,
+    such as `extensions.serializers.StreamingSerializer`. Each list is encoded and written as soon as it arrives.
+    The first list is fetched before the status is sent, so a failing query gets an error response. If fetching
+    fails later, the connection is dropped without the final chunk, so the client can't take the list as complete.
+    """
+    try:
+        chunk = await _get_next_chunk(items)
+    except Exception:
+        await items.close()
+        raise
+
+    response = StreamResponse(status=status)
+    response.content_type = JSONBodyResponse.CONTENT_TYPE
+    response.enable_chunked_encoding()
+    if settings.COMPRESSION_ENABLED and request.app.is_compression_enabled(request):
+        enable_stream_compression(request, response)
+
+    separator = b'['
+    try:
+        await response.prepare(request)
+        try:
+            while chunk is not None:
+                for item in chunk:
+                    response.write(separator + codec.dumps(item))
+                    separator = b','
+                await response.drain()
+                chunk = await _get_next_chunk(items)
+        except Exception:
+            request.transport.close()
+            raise
+    finally:
+        await items.close()
+
+    response.write(b'[]' if separator == b'[' else b']')
+    await response.write_eof()
+    return response
+
+
+def make_etag(*parts) -> str:
+    # weak, since the compression middleware serves the same representation under several content codings
+    digest = hmac.new(settings.ETAG_SECRET.encode('utf8'), repr(parts).encode('utf8'), hashlib.sha1).hexdigest()
+    return 'W/"{}"'.format(digest)
+
+
+def get_opaque_tag(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def is_etag_matched(request, etag: str) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison, so the weakness indicator is ignored
+    tags = {get_opaque_tag(tag) for tag in if_none_match.split(',')}
+    return get_opaque_tag(etag) in tags
+
+
+def with_etag(get_version):
+    """
+    Lets a handler answer conditional requests. `get_version` is awaited with the handler arguments and returns
+    a value which changes whenever the response would change, such as counters of the requested entity, or
+    `None` when there's no version to rely on. A weak ETag is derived from the version, the request path and
+    the requesting user, keyed with `ETAG_SECRET`, so a 304 is only given to a user who has got the 200 response
+    before: a matching `If-None-Match` gets 304 without running the handler, otherwise the ETag is set on a 200
+    response. The handler's permission checks are skipped on a 304, so `get_version` must return `None` for a
+    user who may not see the response.
+    """
+    def decorator(handler):
+        async def wrapper(request, *args, **kwargs):
+            version = await get_version(request, *args, **kwargs)
+            if version is None:
+                return await handler(request, *args, **kwargs)
+
+            user = getattr(request, 'user', None)
+            etag = make_etag(request.path_qs, user.id if user is not None else None, version)
+            if is_etag_matched(request, etag):
+                return HTTPNotModified(headers={'ETag': etag})
+
+            response = await handler(request, *args, **kwargs)
+            if response.status == StatusCodes.OK:
+                response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from settings import settings
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+
+class IdIndex:
+    """
+    In-process set of the ids returned by `query`, used to answer existence checks without a database
+    round trip. The process which changes the table keeps the index current with `add` and `discard`,
+    changes made by other processes become visible after the next periodic reload.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self._ids = set()
+        # `(is_added, uid)` of the changes made while a load is running, `None` when there's no load
+        self._changes = None
+        self._reload_task = None
+        self.is_loaded = False
+
+    def __contains__(self, uid) -> bool:
+        return uid in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, uid: int):
+        self._ids.add(uid)
+        if self._changes is not None:
+            self._changes.append((True, uid))
+
+    def discard(self, uid: int):
+        self._ids.discard(uid)
+        if self._changes is not None:
+            self._changes.append((False, uid))
+
+    async def load(self, db):
+        """
+        Replaces the ids with the ones returned by the query. The changes made while the query runs may be
+        missing from its result, so they are applied again on top of it.
+        """
+        changes = self._changes = []
+        try:
+            async with db.acquire() as conn:
+                rp = await conn.execute(self.query)
+                ids = {row[0] for row in await rp.fetchall()}
+        finally:
+            self._changes = None
+        for is_added, uid in changes:
+            if is_added:
+                ids.add(uid)
+            else:
+                ids.discard(uid)
+        self._ids = ids
+        self.is_loaded = True
+
+    def start_reloading(self, db, loop, interval: float):
+        if self._reload_task is None:
+            self._reload_task = asyncio.ensure_future(self._reload(db, loop, interval), loop=loop)
+
+    def stop_reloading(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            self._reload_task = None
+
+    async def _reload(self, db, loop, interval: float):
+        while True:
+            await asyncio.sleep(interval, loop=loop)
+            try:
+                await self.load(db)
+            except Exception:
+                logger.exception('Failed to reload the id index')
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from datetime import datetime
+from psycopg2 import IntegrityError
+from settings import settings
+from constants import EventTypes
+from data_access.analytics import ClicksQueryFactory as ClicksQF, ViewsQueryFactory as ViewsQF
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
+from data_access.rollups import RollupsQueryFactory as RollupsQF, get_rollup_counts
+from data_access.counters import CountersQueryFactory as CountersQF, get_placement_counts
+from exceptions.analytics import IngestBufferIsFull
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+
+def get_insert_events_query(event_type: str, events: list):
+    if event_type == EventTypes.CLICK:
+        return ClicksQF.create_clicks(events)
+    return ViewsQF.create_views(events)
+
+
+async def add_counts(conn, event_type: str, events: list):
+    """
+    Adds events of one type to the rollups and to the placement and order counters.
+    """
+    await conn.execute(RollupsQF.add_counts(event_type, get_rollup_counts(events)))
+    for query in CountersQF.add_counts(event_type, get_placement_counts(events)):
+        await conn.execute(query)
+
+
+async def insert_events(conn, event_type: str, events: list, defer_counts: bool = False):
+    """
+    Inserts events of one type with a single multi-row insert and adds them to the rollups and to the
+    placement and order counters. Must be called within a transaction, so the rollups and the counters
+    never diverge from the raw events. With `defer_counts` the events are appended to the uncounted events
+    instead, to be added to the counts in batches by `CounterFolder`.
+    """
+    await conn.execute(get_insert_events_query(event_type, events))
+    if defer_counts:
+        await conn.execute(CountersQF.add_uncounted(event_type, events))
+    else:
+        await add_counts(conn, event_type, events)
+
+
+async def _insert_events_in_transaction(conn, event_type: str, events: list, defer_counts: bool):
+    trans = await conn.begin()
+    try:
+        await insert_events(conn, event_type, events, defer_counts)
+    except Exception:
+        await trans.rollback()
+        raise
+    await trans.commit()
+
+
+async def write_events(conn, event_type: str, events: list, drop_unknown: bool = True,
+                       defer_counts: bool = False) -> int:
+    """
+    Writes events of one type in one transaction and returns the number of events written.
+    If some of the events refer to placements which do not exist the whole insert is rejected by the
+    database, so these events are dropped and the rest is written again, unless `drop_unknown` is off.
+    """
+    try:
+        await _insert_events_in_transaction(conn, event_type, events, defer_counts)
+        return len(events)
+    except IntegrityError:
+        if not drop_unknown:
+            raise
+
+    rp = await conn.execute(PlacementsQF.get_existing_ids(list({e['placement_id'] for e in events})))
+    existing_ids = {row.id for row in await rp.fetchall()}
+    known_events = [e for e in events if e['placement_id'] in existing_ids]
+    if known_events:
+        await _insert_events_in_transaction(conn, event_type, known_events, defer_counts)
+    return len(known_events)
+
+
+class IngestBuffer:
+    """
+    Write-behind buffer for clicks and views. Events are kept in memory and written with one multi-row
+    insert per table as soon as `flush_size` events are pending or `flush_interval` seconds have passed.
+    At most `max_size` events are kept: when the buffer is full the caller waits for a flush, and if the
+    database can't take the events either `IngestBufferIsFull` is raised. If a `spool` is given, events which
+    fail to be flushed are moved to it instead of being kept in memory.
+    """
+
+    def __init__(self, db, loop, flush_size: int, flush_interval: float, max_size: int, spool=None):
+        self.db = db
+        self.loop = loop
+        self.spool = spool
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+
+        self._pending = self._get_empty_pending()
+        self._depth = 0
+        self._flush_lock = asyncio.Lock(loop=loop)
+        self._flush_task = None
+        self._timer_task = None
+
+        self.flushed_events = 0
+        self.dropped_events = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @staticmethod
+    def _get_empty_pending() -> dict:
+        return {event_type: [] for event_type in EventTypes.as_choices()}
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def stats(self) -> dict:
+        return {
+            'depth': self._depth,
+            'flushed_events': self.flushed_events,
+            'dropped_events': self.dropped_events,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency
+        }
+
+    def start(self):
+        if self._timer_task is None:
+            self._timer_task = asyncio.ensure_future(self._run_timer(), loop=self.loop)
+
+    async def close(self):
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await self.flush()
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.flush_interval, loop=self.loop)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Failed to flush the ingest buffer, will retry later')
+
+    async def add(self, event_type: str, placement_id: int, registered_at: datetime = None):
+        await self.add_many(event_type, [{'placement_id': placement_id, 'registered_at': registered_at}])
+
+    async def add_many(self, event_type: str, events: list):
+        await self.add_grouped({event_type: events})
+
+    async def add_grouped(self, grouped: dict):
+        """
+        Adds lists of events by event type, all of them or, when there's no room, none: the caller can retry
+        the whole batch without duplicating a part of it.
+        """
+        count = sum(len(events) for events in grouped.values())
+        if self._depth + count > self.max_size:
+            await self.flush()
+            if self._depth + count > self.max_size:
+                raise IngestBufferIsFull()
+
+        now = datetime.now()
+        for event_type, events in grouped.items():
+            self._pending[event_type].extend({
+                'placement_id': e['placement_id'],
+                'registered_at': e['registered_at'] or now
+            } for e in events)
+        self._depth += count
+
+        if self._depth >= self.flush_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush(), loop=self.loop)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._depth:
+                return
+
+            pending, self._pending = self._pending, self._get_empty_pending()
+            self._depth = 0
+
+            start_time = self.loop.time()
+            try:
+                async with self.db.acquire() as conn:
+                    for event_type, events in pending.items():
+                        if events:
+                            self.flushed_events += await write_events(conn, event_type, events)
+                            events.clear()
+            except Exception:
+                logger.exception('Failed to flush the ingest buffer')
+                if self.spool is not None:
+                    await self._spool(pending)
+                else:
+                    self._requeue(pending)
+                return
+            finally:
+                self.last_flush_latency = self.loop.time() - start_time
+                self.max_flush_latency = max(self.max_flush_latency, self.last_flush_latency)
+
+    async def _spool(self, pending: dict):
+        for event_type, events in pending.items():
+            await self.spool.append_many(event_type, events)
+
+    def _requeue(self, pending: dict):
+        for event_type, events in pending.items():
+            room = max(self.max_size - self._depth, 0)
+            kept = events[:room]
+            self._pending[event_type][:0] = kept
+            self._depth += len(kept)
+            self.dropped_events += len(events) - len(kept)
@@ -0,0 +1,275 @@
+import math
+import ipaddress
+from bisect import bisect_left
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value) -> str:
+    if value is None:
+        return 'NaN'
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(n, escape_label_value(v)) for n, v in zip(names, values)) + '}'
+
+
+class Metric:
+    """
+    Metric family with values per tuple of label values. Updates are a dict lookup and an addition, with no lock:
+    they happen on the event loop only, so they never interleave.
+    """
+    type = None
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def get(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        """
+        Yields `(name, label names, label values, value)` of every sample of the family.
+        """
+        for label_values, value in self._values.items():
+            yield self.name, self.label_names, label_values, value
+
+    def render(self) -> list:
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation.replace('\\', '\\\\').replace('\n', '\\n')),
+            '# TYPE {} {}'.format(self.name, self.type)
+        ]
+        for name, label_names, label_values, value in self.samples():
+            lines.append('{}{} {}'.format(name, format_labels(label_names, label_values), format_value(value)))
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, *label_values):
+        self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Observations counted in the first bucket with an upper bound not less than the value, the buckets are
+    made cumulative only when rendered.
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values):
+        # label values -> [counts per bucket and +Inf, sum]
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def get(self, *label_values) -> int:
+        entry = self._values.get(label_values)
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self):
+        bucket_label_names = self.label_names + ('le',)
+        for label_values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (self.name + '_bucket', bucket_label_names, label_values + (format_value(bound),),
+                       cumulative)
+            yield self.name + '_count', self.label_names, label_values, cumulative
+            yield self.name + '_sum', self.label_names, label_values, total
+
+
+class Registry:
+    """
+    Metrics updated as things happen, along with collectors: functions called on every scrape which return
+    metrics built from the current state, such as pool sizes or queue depths.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: tuple = (),
+                  buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+
+    def collect(self) -> list:
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+        return metrics
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self.collect():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class AppMetrics(Registry):
+    """
+    Request metrics labeled by the route name from `EndpointsMapper`, updated by `metrics_middleware`.
+    Requests which match no route are labeled `unmatched`. The metrics are only served to clients with an
+    address in one of `allowed_networks`.
+    """
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS, allowed_networks=('127.0.0.0/8', '::1/128')):
+        super().__init__()
+        self.allowed_networks = [ipaddress.ip_network(network) for network in allowed_networks]
+        self.request_latency = self.histogram('http_request_duration_seconds', 'Time to produce the response.',
+                                              ('route', 'method'), buckets=latency_buckets)
+        self.responses = self.counter('http_responses_total', 'Responses by status code.',
+                                      ('route', 'method', 'status'))
+        self.in_flight = self.gauge('http_requests_in_flight', 'Requests being handled.', ('route',))
+
+    def is_allowed(self, address: str) -> bool:
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(address in network for network in self.allowed_networks)
+
+
+def get_pool_metrics(pools: list) -> list:
+    """
+    Gauges of the connection pools in `pools`, a list of `(name, engine)`.
+    """
+    free = Gauge('db_pool_free_connections', 'Idle connections of the pool.', ('pool',))
+    size = Gauge('db_pool_connections', 'Connections opened by the pool.', ('pool',))
+    max_size = Gauge('db_pool_max_connections', 'Maximum connections of the pool.', ('pool',))
+    for name, engine in pools:
+        free.set(engine.freesize, name)
+        size.set(engine.size, name)
+        max_size.set(engine.maxsize, name)
+    return [free, size, max_size]
+
+
+def get_cache_metrics(caches: list) -> list:
+    """
+    Metrics of the caches in `caches`, a list of `(name, cache)` where the cache has `LRUCache` stats.
+    """
+    entries = Gauge('cache_entries', 'Entries kept by the cache.', ('cache',))
+    size = Gauge('cache_bytes', 'Estimated size of the cache entries.', ('cache',))
+    counters = [(key, Counter('cache_{}_total'.format(key), 'Cache {} so far.'.format(key), ('cache',)))
+                for key in ('hits', 'misses', 'evictions', 'expirations')]
+    for name, cache in caches:
+        stats = cache.stats()
+        entries.set(stats['entries'], name)
+        size.set(stats['bytes'], name)
+        for key, counter in counters:
+            counter.inc(name, amount=stats[key])
+    return [entries, size] + [counter for _, counter in counters]
+
+
+def get_app_metrics(app) -> list:
+    """
+    Metrics of the optional app components which are enabled, built from their stats on every scrape.
+    """
+    pools = [('primary', app.db)]
+    if app.replicas is not None:
+        pools += [('replica{}'.format(i), engine) for i, engine in enumerate(app.replicas.engines)]
+    metrics = get_pool_metrics(pools)
+
+    if app.ingest_buffer is not None:
+        stats = app.ingest_buffer.stats()
+        depth = Gauge('ingest_buffer_depth', 'Events waiting to be flushed.')
+        depth.set(stats['depth'])
+        flushed = Counter('ingest_buffer_flushed_events_total', 'Events flushed to the database.')
+        flushed.inc(amount=stats['flushed_events'])
+        dropped = Counter('ingest_buffer_dropped_events_total', 'Events dropped by the full buffer.')
+        dropped.inc(amount=stats['dropped_events'])
+        latency = Gauge('ingest_buffer_last_flush_seconds', 'Duration of the last flush.')
+        latency.set(stats['last_flush_latency'])
+        metrics += [depth, flushed, dropped, latency]
+
+    if app.counter_folder is not None:
+        folded = Counter('counter_folder_folded_events_total', 'Uncounted events added to the counts.')
+        folded.inc(amount=app.counter_folder.stats()['folded_events'])
+        metrics.append(folded)
+
+    if app.spool is not None:
+        stats = app.spool.stats()
+        pending = Gauge('spool_pending_bytes', 'Spooled bytes waiting to be replayed.')
+        pending.set(stats['pending_bytes'])
+        spooled = Counter('spool_spooled_events_total', 'Events written to the spool.')
+        spooled.inc(amount=stats['spooled_events'])
+        replayed = Counter('spool_replayed_events_total', 'Spooled events replayed to the database.')
+        replayed.inc(amount=stats['replayed_events'])
+        metrics += [pending, spooled, replayed]
+
+    caches = [(name, cache) for name, cache in (('analytics', app.analytics_cache),
+                                                ('principal', app.principal_cache),
+                                                ('token', app.token_cache)) if cache is not None]
+    if caches:
+        metrics += get_cache_metrics(caches)
+
+    if app.hashing_executor is not None:
+        stats = app.hashing_executor.stats()
+        pending = Gauge('hashing_pending', 'Password hashings admitted and not finished.')
+        pending.set(stats['pending'])
+        rejected = Counter('hashing_rejected_total', 'Password hashings rejected by the admission limit.')
+        rejected.inc(amount=stats['rejected'])
+        metrics += [pending, rejected]
+
+    if app.replicas is not None:
+        stats = app.replicas.stats()
+        available = Gauge('replicas_available', 'Replicas within the lag tolerance.')
+        available.set(stats['available'])
+        fallbacks = Counter('replica_fallbacks_total', 'Reads which went to the primary.')
+        fallbacks.inc(amount=stats['fallbacks'])
+        metrics += [available, fallbacks]
+
+    return metrics
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from datetime import date
+from psycopg2 import IntegrityError
+from settings import settings
+from data_access.analytics import clicks, views
+from data_access.partitions import PartitionsQueryFactory as PartitionsQF, add_months, get_partition_name
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+PARTITIONED_TABLES = (clicks.name, views.name)
+
+
+async def ensure_partitions(db, months_ahead: int, today: date = None) -> list:
+    """
+    Creates the monthly partitions of the events tables from the current month up to `months_ahead` months
+    ahead, so new events never land in the default partition. Returns names of the partitions created.
+    A partition can't be created while the default partition holds rows of its month: the error is logged and
+    the other partitions are still created.
+    """
+    this_month = (today or date.today()).replace(day=1)
+    created = []
+    async with db.acquire() as conn:
+        for table_name in PARTITIONED_TABLES:
+            rp = await conn.execute(PartitionsQF.get_partitions(table_name))
+            existing = {row.name for row in await rp.fetchall()}
+            for i in range(months_ahead + 1):
+                month = add_months(this_month, i)
+                if get_partition_name(table_name, month) in existing:
+                    continue
+                try:
+                    await conn.execute(PartitionsQF.create_partition(table_name, month))
+                except IntegrityError:
+                    logger.error('Partition {} can\'t be created while {}_default holds events of its month, '
+                                 'they must be moved out of the default partition first'.format(
+                                     get_partition_name(table_name, month), table_name))
+                    continue
+                created.append(get_partition_name(table_name, month))
+    return created
+
+
+class PartitionMaintainer:
+    """
+    Periodically creates the upcoming monthly partitions of the events tables.
+    """
+
+    def __init__(self, db, loop, months_ahead: int, interval: float):
+        self.db = db
+        self.loop = loop
+        self.months_ahead = months_ahead
+        self.interval = interval
+        self._task = None
+
+    async def maintain(self):
+        created = await ensure_partitions(self.db, self.months_ahead)
+        if created:
+            logger.info('Created partitions: {}'.format(', '.join(created)))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.maintain()
+            except Exception:
+                logger.exception('Failed to create upcoming partitions')
+            await asyncio.sleep(self.interval, loop=self.loop)
@@ -0,0 +1,39 @@
+import time
+from extensions.cache import LRUCache
+from extensions.user_model import User
+
+
+class PrincipalCache:
+    """
+    Authenticated users by `(type, user_id)` of their tokens, each kept for `ttl` seconds, so an authenticated
+    request normally doesn't query the database. No endpoint changes a user after the signup: users and
+    providers are changed out of band, e.g. a provider is locked by an operator, and such changes are picked
+    up once the TTL expires, so it's kept short. Code which changes user data should call `invalidate`.
+    """
+
+    def __init__(self, db, ttl: float, max_entries: int, timer=time.monotonic):
+        self.db = db
+        self.ttl = ttl
+        self._cache = LRUCache(max_entries=max_entries, timer=timer)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    async def get(self, user_type: str, user_id: int, db=None):
+        """
+        Returns the cached user, loading a missing one through `db`, e.g. the connection of the request,
+        or through the cache's own engine.
+        """
+        key = (user_type, user_id)
+        user = self._cache.get(key)
+        if user is None:
+            user = await User.create(db=db if db is not None else self.db, token_data={'type': user_type, 'user_id': user_id})
+            if user is not None:
+                self._cache.set(key, user, ttl=self.ttl)
+        return user
+
+    def invalidate(self, user_type: str, user_id: int):
+        self._cache.invalidate((user_type, user_id))
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import logging
+from settings import settings
+from extensions.db import DB_UNAVAILABLE_ERRORS
+from data_access.replication import ReplicationQueryFactory as ReplicationQF
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+
+class ReplicaSet:
+    """
+    Replica engines along with their replication lag, checked every `check_interval` seconds. Reads are routed
+    round robin to the replicas at most `max_lag` seconds behind the primary. A replica which can't be reached
+    is skipped till the next check finds it reachable again.
+    """
+
+    def __init__(self, engines: list, loop, max_lag: float, check_interval: float):
+        self.engines = engines
+        self.loop = loop
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lags = {engine: None for engine in engines}
+        self._order = itertools.cycle(engines)
+        self._task = None
+        self.reads = 0
+        self.fallbacks = 0
+
+    def get_lag(self, engine):
+        """
+        Last known lag of the replica in seconds, `None` if it's unknown or the replica is unavailable.
+        """
+        return self._lags[engine]
+
+    def set_lag(self, engine, lag):
+        self._lags[engine] = lag
+
+    def mark_unavailable(self, engine):
+        self._lags[engine] = None
+
+    def get_engine(self):
+        """
+        Next replica fit for reads, `None` if every replica is lagging or unavailable.
+        """
+        for _ in range(len(self.engines)):
+            engine = next(self._order)
+            lag = self._lags[engine]
+            if lag is not None and lag <= self.max_lag:
+                self.reads += 1
+                return engine
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> dict:
+        lags = [lag for lag in self._lags.values() if lag is not None]
+        return {
+            'replicas': len(self.engines),
+            'available': sum(1 for lag in lags if lag <= self.max_lag),
+            'max_lag': max(lags) if lags else None,
+            'reads': self.reads,
+            'fallbacks': self.fallbacks
+        }
+
+    async def check(self):
+        for engine in self.engines:
+            try:
+                async with engine.acquire() as conn:
+                    lag = await conn.scalar(ReplicationQF.get_lag())
+            except DB_UNAVAILABLE_ERRORS:
+                logger.warning('Replica is unavailable, reads go to the other replicas or the primary')
+                self._lags[engine] = None
+                continue
+            if lag is None:
+                logger.warning('Replica is not streaming from the primary, reads go to the other replicas or the '
+                               'primary')
+            self._lags[engine] = None if lag is None else float(lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def close(self):
+        self.stop()
+        engines, self.engines = self.engines, []
+        for engine in engines:
+            engine.close()
+            await engine.wait_closed()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval, loop=self.loop)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception('Failed to check the replication lag')
+
+
+class _ReplicaReaderContextManager:
+
+    def __init__(self, reader):
+        self._reader = reader
+        self._acquiring = None
+
+    async def __aenter__(self):
+        replicas = self._reader.replicas
+        engine = replicas.get_engine()
+        if engine is not None:
+            self._acquiring = engine.acquire()
+            try:
+                return await self._acquiring.__aenter__()
+            except DB_UNAVAILABLE_ERRORS:
+                logger.warning('Replica is unavailable, the read goes to the primary')
+                replicas.mark_unavailable(engine)
+                replicas.fallbacks += 1
+        self._acquiring = self._reader.primary.acquire()
+        return await self._acquiring.__aenter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        acquiring, self._acquiring = self._acquiring, None
+        await acquiring.__aexit__(exc_type, exc, tb)
+
+
+class ReplicaReader:
+    """
+    Stand-in for the engine in read-only queries which tolerate replication lag: connections come from a replica
+    of `replicas` when one is fit for reads and from `primary` otherwise. Queries which must see the writes made
+    just before them, such as version checks, should keep using the primary.
+    """
+
+    def __init__(self, replicas: ReplicaSet, primary):
+        self.replicas = replicas
+        self.primary = primary
+
+    def acquire(self) -> _ReplicaReaderContextManager:
+        return _ReplicaReaderContextManager(self)
+
+
+def get_read_db(app, db):
+    """
+    `db` for read-only queries, routed to the replicas of the app if it has any.
+    """
+    return db if app.replicas is None else ReplicaReader(app.replicas, db)
+
+
+def get_read_engine(app, db):
+    """
+    Replica engine fit for reads or `db`, for code which needs the engine itself rather than its connections.
+    """
+    engine = app.replicas.get_engine() if app.replicas is not None else None
+    return engine or db
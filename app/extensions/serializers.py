@@ -1,70 +1,183 @@
+from settings import settings
+from extensions.engines import get_bind_args
+from extensions.replicas import get_read_engine
+
+
+STREAM_CURSOR_NAME = 'serializer_stream'
+
+
+class SchemaPlan:
+    """
+    Schema compiled into a grouping plan. Tuple configs `(name, type)` become fields of the level, dict configs
+    become nested levels aggregated into lists. Rows with equal values of the level fields are grouped into
+    one item, so a level is serialized with one pass over its rows and a dict lookup per row.
+    """
+
+    def __init__(self, schema: dict):
+        self.fields = []
+        self.nested = []
+        for db_name, field_config in schema.items():
+            if type(field_config) is tuple:
+                out_name, cast = field_config
+                self.fields.append((db_name, out_name, cast))
+            else:
+                self.nested.append((db_name, SchemaPlan(field_config)))
+        self.key_names = tuple(db_name for db_name, _, _ in self.fields)
+
+    def _make_item(self, row) -> dict:
+        return {out_name: cast(row[db_name]) for db_name, out_name, cast in self.fields}
+
+    def serialize(self, rows) -> list:
+        if not self.key_names:
+            # a level without own fields can't group rows: every row is an item aggregating all the rows
+            items = [{} for _ in rows]
+            for item in items:
+                for name, plan in self.nested:
+                    item[name] = plan.serialize(rows)
+            return items
+
+        key_names = self.key_names
+        items = []
+        groups = {}
+
+        if not self.nested:
+            for row in rows:
+                key = tuple(row[name] for name in key_names)
+                if key not in groups:
+                    groups[key] = None
+                    items.append(self._make_item(row))
+            return items
+
+        grouped_rows = []
+        for row in rows:
+            key = tuple(row[name] for name in key_names)
+            index = groups.get(key)
+            if index is None:
+                groups[key] = len(items)
+                items.append(self._make_item(row))
+                grouped_rows.append([row])
+            else:
+                grouped_rows[index].append(row)
+
+        for item, item_rows in zip(items, grouped_rows):
+            for name, plan in self.nested:
+                item[name] = plan.serialize(item_rows)
+        return items
+
+
 class Serializer:
 
     def __init__(self, result_proxy, schema, many=False):
         self.rp = result_proxy
-        self.schema = schema
+        self.plan = schema if isinstance(schema, SchemaPlan) else SchemaPlan(schema)
         self.many = many
 
     async def serialize(self):
         self.data = await self.rp.fetchall()
-        serialized_data = []
-        self._serialize_level(container=serialized_data, rows=self.data, schema=self.schema)
-        return serialized_data
-
-    def _get_row_hash(self, row, fields):
-        return '___'.join(map(str, [v for k, v in row.items() if k in fields]))
+        return self.plan.serialize(self.data)
 
-    def _serialize_level(self, container, rows, schema):
-        fields = []
-        db_fields = []
-        agr_fields = []
 
-        # splitting fields into two sections: fields that should be populated on this level and fields that
-        # aggregate data from the deeper level
-        for db_name, field_config in schema.items():
-            if type(field_config) is tuple:
-                fields.append((db_name, field_config))
-                db_fields.append(db_name)
-            else:
-                agr_fields.append(db_name)
+class StreamingSerializer:
+    """
+    Asynchronous iterator over serialized items of `query`, fetched from a server-side cursor `chunk_size` rows at
+    a time, so only one chunk of rows is held in memory. Rows of one top-level item must be contiguous in the
+    query results, each chunk yields the items completed so far. The connection is held until the iterator is
+    exhausted or closed.
+    """
 
-        for row in rows:
-            _row_hash = self._get_row_hash(row, db_fields)
+    def __init__(self, db, query, plan: SchemaPlan, chunk_size: int):
+        if not plan.key_names:
+            raise ValueError('A streamed schema should have fields on its top level')
+        self.db = db
+        self.query = query
+        self.plan = plan
+        self.chunk_size = chunk_size
+        self._conn = None
+        self._trans = None
+        self._is_exhausted = False
+        self._group_key = None
+        self._group_rows = []
 
-            exists = False
-            for i in container:
-                if i['_row_hash'] == _row_hash and _row_hash != '':
-                    exists = True
+    def __aiter__(self):
+        return self
 
-            if exists:
-                continue
+    async def _open(self):
+        self._conn = await self.db.acquire()
+        self._trans = await self._conn.begin()
+        compiled = self.query.compile(dialect=self.db.dialect)
+        params = get_bind_args(compiled) if compiled.positional else compiled.params
+        await self._conn.execute('DECLARE {} NO SCROLL CURSOR FOR {}'.format(STREAM_CURSOR_NAME, compiled), params)
 
-            item = {}
+    async def close(self):
+        self._is_exhausted = True
+        if self._conn is None:
+            return
+        try:
+            if self._trans is not None and self._trans.is_active:
+                await self._trans.rollback()
+        finally:
+            self.db.release(self._conn)
+            self._conn = None
+            self._trans = None
 
-            for db_name, field_config in fields:
-                item[field_config[0]] = field_config[1](row[db_name])
-            item['_row_hash'] = _row_hash
+    def _feed(self, rows) -> list:
+        items = []
+        key_names = self.plan.key_names
+        for row in rows:
+            key = tuple(row[name] for name in key_names)
+            if self._group_rows and key != self._group_key:
+                items.extend(self.plan.serialize(self._group_rows))
+                self._group_rows = []
+            self._group_key = key
+            self._group_rows.append(row)
+        return items
 
-            for agr_f in agr_fields:
-                item[agr_f] = []
+    async def __anext__(self) -> list:
+        if self._is_exhausted:
+            raise StopAsyncIteration
+        if self._conn is None:
+            await self._open()
 
-            container.append(item)
+        while True:
+            rp = await self._conn.execute('FETCH FORWARD {} FROM {}'.format(self.chunk_size, STREAM_CURSOR_NAME))
+            rows = await rp.fetchall()
+            if rows:
+                items = self._feed(rows)
+                if items:
+                    return items
+                continue
 
-        for item in container:
-            for agr_f in agr_fields:
-                agr_rows = []
-                for row in rows:
-                    if item['_row_hash'] == self._get_row_hash(row, db_fields):
-                        agr_rows.append(row)
-                self._serialize_level(item[agr_f], agr_rows, schema[agr_f])
-            del item['_row_hash']
+            items = self.plan.serialize(self._group_rows)
+            self._group_rows = []
+            await self.close()
+            if items:
+                return items
+            raise StopAsyncIteration
 
 
 def serialize(schema, many=True):
+    plan = SchemaPlan(schema)
+
     def decorator(method):
         async def wrapper(*args, **kwargs):
             result_proxy = await method(*args, **kwargs)
-            serializer = Serializer(result_proxy=result_proxy, schema=schema, many=many)
+            serializer = Serializer(result_proxy=result_proxy, schema=plan, many=many)
             return await serializer.serialize()
         return wrapper
     return decorator
+
+
+def serialize_stream(schema, chunk_size=None):
+    """
+    Streaming counterpart of `serialize`: the decorated controller method returns a query, which is run
+    on a server-side cursor by the returned `StreamingSerializer`.
+    """
+    plan = SchemaPlan(schema)
+
+    def decorator(method):
+        async def wrapper(controller, *args, **kwargs):
+            query = await method(controller, *args, **kwargs)
+            return StreamingSerializer(db=get_read_engine(controller.app, controller.db), query=query, plan=plan,
+                                       chunk_size=chunk_size or settings.STREAM_CHUNK_SIZE)
+        return wrapper
+    return decorator
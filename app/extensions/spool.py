@@ -0,0 +1,194 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from settings import settings
+from constants import EventTypes
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
+from extensions.ingest import insert_events
+
+
+logger = logging.getLogger(settings.LOGGER_NAME)
+
+SEGMENT_SUFFIX = '.spool'
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def _serialize_event(event_type: str, event: dict) -> str:
+    return '{}\t{}\t{}\n'.format(event_type, event['placement_id'], event['registered_at'].strftime(TIMESTAMP_FORMAT))
+
+
+def _parse_event(line: str):
+    try:
+        event_type, placement_id, registered_at = line.split('\t')
+        return event_type, {
+            'placement_id': int(placement_id),
+            'registered_at': datetime.strptime(registered_at, TIMESTAMP_FORMAT)
+        }
+    except ValueError:
+        return None, None
+
+
+class Spool:
+    """
+    Durable local spool for ingest events which can't be written to the database right now. Events are appended
+    to the active segment file, one line per event, and a new segment is started once the active one grows over
+    `segment_size` bytes. The replayer periodically seals the active segment and drains sealed segments into the
+    database, one transaction per segment, removing each segment after its transaction is committed. A crash
+    between the commit and the removal replays the segment again, so delivery is at least once. The active
+    segment is written and sealed by a single writer thread, so disk writes and fsyncs don't block the event
+    loop and appends land in the order they were made.
+    """
+
+    def __init__(self, directory: str, db, loop, segment_size: int, replay_interval: float,
+                 replay_batch_size: int, fsync: bool = False):
+        self.directory = directory
+        self.db = db
+        self.loop = loop
+        self.segment_size = segment_size
+        self.replay_interval = replay_interval
+        self.replay_batch_size = replay_batch_size
+        self.fsync = fsync
+
+        os.makedirs(directory, exist_ok=True)
+        existing_segments = self._get_segment_numbers()
+        self._segment_number = existing_segments[-1] + 1 if existing_segments else 0
+        self._fd = None
+        self._segment_bytes = 0
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._replay_lock = asyncio.Lock(loop=loop)
+        self._replay_task = None
+
+        self.spooled_events = 0
+        self.replayed_events = 0
+
+    def _get_segment_numbers(self) -> list:
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def _get_segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, '{:012d}{}'.format(number, SEGMENT_SUFFIX))
+
+    @property
+    def pending_bytes(self) -> int:
+        return sum(os.path.getsize(self._get_segment_path(n)) for n in self._get_segment_numbers())
+
+    def stats(self) -> dict:
+        return {
+            'pending_bytes': self.pending_bytes,
+            'spooled_events': self.spooled_events,
+            'replayed_events': self.replayed_events
+        }
+
+    async def append_many(self, event_type: str, events: list):
+        if not events:
+            return
+        now = datetime.now()
+        data = ''.join(_serialize_event(event_type, {
+            'placement_id': e['placement_id'],
+            'registered_at': e.get('registered_at') or now
+        }) for e in events).encode('utf8')
+        await self.loop.run_in_executor(self._writer, self._write, data)
+        self.spooled_events += len(events)
+
+    def _write(self, data: bytes):
+        # runs in the writer thread
+        if self._fd is None:
+            self._fd = os.open(self._get_segment_path(self._segment_number), os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+            self._segment_bytes = 0
+
+        # `os.write` may write a part of the data, e.g. when interrupted by a signal
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        if self.fsync:
+            os.fsync(self._fd)
+
+        self._segment_bytes += len(data)
+        if self._segment_bytes >= self.segment_size:
+            self._seal_active_segment()
+
+    async def _seal(self):
+        await self.loop.run_in_executor(self._writer, self._seal_active_segment)
+
+    def _seal_active_segment(self):
+        # runs in the writer thread
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._segment_number += 1
+
+    def _read_segment(self, path: str) -> dict:
+        events = {event_type: [] for event_type in EventTypes.as_choices()}
+        with open(path, encoding='utf8') as f:
+            for line in f:
+                # a line without the trailing newline is a torn write
+                if not line.endswith('\n'):
+                    continue
+                event_type, event = _parse_event(line[:-1])
+                if event_type in events:
+                    events[event_type].append(event)
+        return events
+
+    async def _replay_segment(self, conn, path: str) -> int:
+        events = self._read_segment(path)
+        placement_ids = list({e['placement_id'] for rows in events.values() for e in rows})
+        if not placement_ids:
+            return 0
+
+        replayed = 0
+        trans = await conn.begin()
+        try:
+            rp = await conn.execute(PlacementsQF.get_existing_ids(placement_ids))
+            existing_ids = {row.id for row in await rp.fetchall()}
+            for event_type, rows in events.items():
+                rows = [e for e in rows if e['placement_id'] in existing_ids]
+                for i in range(0, len(rows), self.replay_batch_size):
+                    chunk = rows[i:i + self.replay_batch_size]
+                    await insert_events(conn, event_type, chunk)
+                    replayed += len(chunk)
+        except Exception:
+            await trans.rollback()
+            raise
+        await trans.commit()
+        return replayed
+
+    async def replay(self) -> int:
+        async with self._replay_lock:
+            await self._seal()
+            replayed = 0
+            for number in self._get_segment_numbers():
+                if number >= self._segment_number:
+                    break
+                path = self._get_segment_path(number)
+                async with self.db.acquire() as conn:
+                    replayed += await self._replay_segment(conn, path)
+                os.remove(path)
+            self.replayed_events += replayed
+            return replayed
+
+    def start(self):
+        if self._replay_task is None:
+            self._replay_task = asyncio.ensure_future(self._run_replayer(), loop=self.loop)
+
+    async def close(self):
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            self._replay_task = None
+        if self._writer is not None:
+            await self._seal()
+            writer, self._writer = self._writer, None
+            writer.shutdown()
+
+    async def _run_replayer(self):
+        while True:
+            await asyncio.sleep(self.replay_interval, loop=self.loop)
+            if self._fd is None and not self._get_segment_numbers():
+                continue
+            try:
+                replayed = await self.replay()
+                if replayed:
+                    logger.info('Replayed {} spooled events'.format(replayed))
+            except Exception:
+                logger.exception('Failed to replay the spool, will retry later')
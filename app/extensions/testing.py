@@ -1,13 +1,15 @@
 from aiohttp.test_utils import AioHTTPTestCase
-from aiopg.sa import create_engine
-from sqlalchemy import text
+from sqlalchemy import text, select, func
 from middlewares import test_middlewares
 from routes import route_config
 from settings import settings
 from .app import App
+from .engines import create_engine
 
 
 class BaseTestCase(AioHTTPTestCase):
+    # test cases which check the production middleware chain set `middlewares.middlewares`
+    app_middlewares = test_middlewares
 
     async def set_up(self):
         pass
@@ -15,6 +17,12 @@ class BaseTestCase(AioHTTPTestCase):
     async def tear_down(self):
         pass
 
+    def get_app_kwargs(self, db, loop) -> dict:
+        """
+        Extra keyword arguments for `App`, test cases override it to enable optional app components.
+        """
+        return {}
+
     def get_app(self, loop):
         _db = loop.run_until_complete(create_engine(
             user=settings.TEST_DB_USER, database=settings.TEST_DB_NAME,
@@ -22,7 +30,8 @@ class BaseTestCase(AioHTTPTestCase):
             loop=loop
         ))
 
-        app = App(db=_db, loop=loop, route_config=route_config, middlewares=test_middlewares)
+        app = App(db=_db, loop=loop, route_config=route_config, middlewares=self.app_middlewares,
+                  **self.get_app_kwargs(_db, loop))
 
         self.test_db_eng = app.db
 
@@ -34,6 +43,9 @@ class BaseTestCase(AioHTTPTestCase):
         """
         async with self.test_db_eng.acquire() as conn:
             await conn.execute(text("""
+                DELETE FROM uncounted_events;
+                DELETE FROM views_rollups;
+                DELETE FROM clicks_rollups;
                 DELETE FROM views;
                 DELETE FROM clicks;
                 DELETE FROM placements;
@@ -52,6 +64,10 @@ class BaseTestCase(AioHTTPTestCase):
         self.loop.run_until_complete(self.reset_db())
         super().tearDown()
 
+    async def count_rows(self, table) -> int:
+        async with self.test_db_eng.acquire() as conn:
+            return await conn.scalar(select([func.count()]).select_from(table))
+
     def check_error_response_body(self, body, code, *invalid_fields):
         assert 'code' in body
         assert body['code'] == code
@@ -0,0 +1,44 @@
+import sys
+import time
+import jwt
+from settings import settings
+from extensions.cache import LRUCache
+
+
+def decode_token(token: str) -> dict:
+    return jwt.decode(token, key=settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+
+
+def get_claims_size(claims: dict) -> int:
+    return sys.getsizeof(claims) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in claims.items())
+
+
+class TokenCache:
+    """
+    Claims of verified tokens, so a token is verified once per `ttl` seconds instead of on every request.
+    An entry never outlives the `exp` claim of its token, invalid tokens are not cached and are verified
+    every time, raising the same errors as `decode_token`.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int = None):
+        self.ttl = ttl
+        self._cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes, get_size=get_claims_size)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def decode(self, token: str) -> dict:
+        claims = self._cache.get(token)
+        if claims is not None:
+            return claims
+
+        claims = decode_token(token)
+        ttl = self.ttl
+        if 'exp' in claims:
+            ttl = min(ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self._cache.set(token, claims, ttl=ttl)
+        return claims
+
+    def clear(self):
+        self._cache.clear()
@@ -2,7 +2,19 @@ from constants import UserTypes
 from data_access.auth import AuthQueryFactory as AuthQF
 
 
+SPECIFIC_FIELDS = {
+    UserTypes.AD_PLACER: ('specific_id', 'website', 'visitors_per_day_count'),
+    UserTypes.AD_PROVIDER: ('specific_id', 'is_locked')
+}
+
+
 class User:
+    """
+    Authenticated user. Only the columns of the user type are kept in `specific_data`, so a user can be cached
+    without holding on to the result row.
+    """
+    __slots__ = ('id', 'email', 'first_name', 'last_name', 'cash', 'created_at', 'updated_at', 'type',
+                 'specific_data')
 
     @classmethod
     async def create(cls, db, token_data):
@@ -11,6 +23,8 @@ class User:
         async with db.acquire() as conn:
             rp = await conn.execute(get_data_query)
             data = await rp.first()
+        if data is None:
+            return None
         return User(user_type, data)
 
     def __init__(self, user_type, data):
@@ -24,7 +38,7 @@ class User:
 
         self.type = user_type
 
-        self.specific_data = data
+        self.specific_data = {name: data[name] for name in SPECIFIC_FIELDS[user_type]}
 
     def as_dict(self):
         base = {
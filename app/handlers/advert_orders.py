@@ -1,5 +1,8 @@
+from datetime import date
 from aiohttp.web import Request, Response
-from extensions.http import HTTPSuccess, HTTPCreated, HTTPBadRequest, HTTPForbidden, HTTPNotFound, HTTPNoContent
+from extensions.http import (
+    HTTPSuccess, HTTPCreated, HTTPBadRequest, HTTPForbidden, HTTPNotFound, HTTPNoContent, stream_json_list, with_etag
+)
 from extensions.controllers import bind_controller
 from extensions.decorators import auth_required, validate_body_json, ad_provider_only, parse_query_params
 from controllers.advert_orders import AdvertOrdersController
@@ -11,17 +14,32 @@ from exceptions.advert_orders import (
 from validators.analytics import YearValidator, MonthValidator, DayValidator
 from validators.advert_orders import CreateAdvertValidator, UpdateAdvertValidator
 from constants import ApiErrorCodes
+from settings import settings
+
+
+async def get_order_version(request: Request, controller: AdvertOrdersController, **kwargs):
+    return await controller.get_order_version(request.match_info['order_id'])
+
+
+async def get_order_analytics_version(request: Request, controller: AdvertOrdersController, **kwargs):
+    # periods default to the current date, so the version changes with it
+    # analytics are only served to the owner
+    version = await controller.get_order_version(request.match_info['order_id'], request.user)
+    return None if version is None else (version, date.today())
 
 
 @auth_required
 @bind_controller(AdvertOrdersController)
 async def get_advert_orders(request: Request, controller: AdvertOrdersController) -> Response:
+    if settings.STREAM_LIST_RESPONSES:
+        return await stream_json_list(request, await controller.stream_orders(request.user))
     result = await controller.get_orders(request.user)
     return HTTPSuccess(data=result)
 
 
 @auth_required
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_version)
 async def get_advert_order(request: Request, controller: AdvertOrdersController) -> Response:
     try:
         response_data = await controller.get_order(request.match_info['order_id'])
@@ -71,6 +89,7 @@ async def delete_advert_order(request: Request, controller: AdvertOrdersControll
 @ad_provider_only
 @parse_query_params(YearValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_year_advert_order_views(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_year_views(request.user,
@@ -86,6 +105,7 @@ async def get_year_advert_order_views(request: Request, controller: AdvertOrders
 @ad_provider_only
 @parse_query_params(MonthValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_month_advert_order_views(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_month_views(request.user,
@@ -102,6 +122,7 @@ async def get_month_advert_order_views(request: Request, controller: AdvertOrder
 @ad_provider_only
 @parse_query_params(DayValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_day_advert_order_views(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_day_views(request.user,
@@ -119,6 +140,7 @@ async def get_day_advert_order_views(request: Request, controller: AdvertOrdersC
 @ad_provider_only
 @parse_query_params(YearValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_year_advert_order_clicks(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_year_clicks(request.user,
@@ -134,6 +156,7 @@ async def get_year_advert_order_clicks(request: Request, controller: AdvertOrder
 @ad_provider_only
 @parse_query_params(MonthValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_month_advert_order_clicks(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_month_clicks(request.user,
@@ -150,6 +173,7 @@ async def get_month_advert_order_clicks(request: Request, controller: AdvertOrde
 @ad_provider_only
 @parse_query_params(DayValidator)
 @bind_controller(AdvertOrdersController)
+@with_etag(get_order_analytics_version)
 async def get_day_advert_order_clicks(request: Request, controller: AdvertOrdersController, params: dict) -> Response:
     try:
         data = await controller.get_day_clicks(request.user,
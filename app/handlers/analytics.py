@@ -1,11 +1,12 @@
 from aiohttp.web import Request, Response
-from extensions.http import HTTPCreated, HTTPBadRequest
+from extensions.http import HTTPCreated, HTTPBadRequest, HTTPServiceUnavailable
 from extensions.controllers import bind_controller
-from extensions.decorators import validate_body_json
+from extensions.decorators import validate_body_json, validate_body_json_items
+from settings import settings
 from constants import ApiErrorCodes
 from controllers.analytics import AnalyticsController
-from validators.analytics import RegisterValidator
-from exceptions.analytics import PlacementDoesNotExist
+from validators.analytics import RegisterValidator, EventValidator
+from exceptions.analytics import PlacementDoesNotExist, IngestBufferIsFull
 
 
 @validate_body_json(RegisterValidator)
@@ -16,6 +17,8 @@ async def register_click(request: Request, controller: AnalyticsController, body
         return HTTPCreated()
     except PlacementDoesNotExist as e:
         return HTTPBadRequest(errors={'placement_id': e.message}, code=ApiErrorCodes.PLACEMENT_DOES_NOT_EXIST)
+    except IngestBufferIsFull as e:
+        return HTTPServiceUnavailable(errors={'general': e.message}, code=ApiErrorCodes.INGEST_IS_UNAVAILABLE)
 
 
 @validate_body_json(RegisterValidator)
@@ -26,3 +29,23 @@ async def register_view(request: Request, controller: AnalyticsController, body:
         return HTTPCreated()
     except PlacementDoesNotExist as e:
         return HTTPBadRequest(errors={'placement_id': e.message}, code=ApiErrorCodes.PLACEMENT_DOES_NOT_EXIST)
+    except IngestBufferIsFull as e:
+        return HTTPServiceUnavailable(errors={'general': e.message}, code=ApiErrorCodes.INGEST_IS_UNAVAILABLE)
+
+
+@validate_body_json_items(EventValidator, max_items=settings.BATCH_MAX_EVENTS)
+@bind_controller(AnalyticsController)
+async def register_batch(request: Request, controller: AnalyticsController, items: list, rejected: list) -> Response:
+    try:
+        unknown_positions = await controller.register_events([data for _, data in items])
+    except IngestBufferIsFull as e:
+        return HTTPServiceUnavailable(errors={'general': e.message}, code=ApiErrorCodes.INGEST_IS_UNAVAILABLE)
+
+    for position in unknown_positions:
+        rejected.append({
+            'index': items[position][0],
+            'errors': {'placement_id': [PlacementDoesNotExist.default_message]}
+        })
+    rejected.sort(key=lambda r: r['index'])
+
+    return HTTPCreated(data={'accepted': len(items) - len(unknown_positions), 'rejected': rejected})
@@ -1,13 +1,20 @@
 from aiohttp.web import Request, Response
 from extensions.controllers import bind_controller
 from extensions.decorators import validate_body_json, auth_required
-from extensions.http import HTTPCreated, HTTPBadRequest, HTTPSuccess
+from extensions.http import HTTPCreated, HTTPBadRequest, HTTPSuccess, HTTPServiceUnavailable
 from controllers.auth import AuthController
 from validators.auth import AdPlacerSignupValidator, AdProviderSignupValidator, LoginValidator
-from exceptions.auth import EmailAlreadyInUse, WebsiteAlreadyRegistered, UserDoesNotExist, InvalidPassword
+from exceptions.auth import (
+    EmailAlreadyInUse, WebsiteAlreadyRegistered, UserDoesNotExist, InvalidPassword, PasswordHashingIsOverloaded
+)
 from constants import ApiErrorCodes
 
 
+def get_overloaded_response(e: PasswordHashingIsOverloaded) -> Response:
+    return HTTPServiceUnavailable(errors={'general': e.message}, code=ApiErrorCodes.AUTH_IS_OVERLOADED,
+                                  headers={'Retry-After': '1'})
+
+
 @validate_body_json(AdPlacerSignupValidator)
 @bind_controller(AuthController)
 async def signup_ad_placer(request: Request, controller: AuthController, body: dict) -> Response:
@@ -18,6 +25,8 @@ async def signup_ad_placer(request: Request, controller: AuthController, body: d
         return HTTPBadRequest(errors={'email': [e.message]}, code=ApiErrorCodes.EMAIL_ALREADY_IN_USE)
     except WebsiteAlreadyRegistered as e:
         return HTTPBadRequest(errors={'website': [e.message]}, code=ApiErrorCodes.WEBSITE_IS_ALREADY_REGISTERED)
+    except PasswordHashingIsOverloaded as e:
+        return get_overloaded_response(e)
 
 
 @validate_body_json(AdProviderSignupValidator)
@@ -28,6 +37,8 @@ async def signup_ad_provider(request: Request, controller: AuthController, body:
         return HTTPCreated(data={'token': token})
     except EmailAlreadyInUse as e:
         return HTTPBadRequest(errors={'email': [e.message]}, code=ApiErrorCodes.EMAIL_ALREADY_IN_USE)
+    except PasswordHashingIsOverloaded as e:
+        return get_overloaded_response(e)
 
 
 @validate_body_json(LoginValidator)
@@ -40,6 +51,8 @@ async def login(request: Request, controller: AuthController, body: dict) -> Res
         return HTTPBadRequest(errors={'email': [e.message]}, code=ApiErrorCodes.USER_DOES_NOT_EXIST)
     except InvalidPassword as e:
         return HTTPBadRequest(errors={'password': [e.message]}, code=ApiErrorCodes.PASSWORD_IS_INVALID)
+    except PasswordHashingIsOverloaded as e:
+        return get_overloaded_response(e)
 
 
 @auth_required
@@ -0,0 +1,12 @@
+from aiohttp.web import Request, Response
+from extensions.http import HTTPNotFound
+from extensions.metrics import CONTENT_TYPE
+
+
+async def get_metrics(request: Request) -> Response:
+    metrics = request.app.metrics
+    # the peer is checked rather than forwarding headers, which clients can set to anything
+    peername = request.transport.get_extra_info('peername') if request.transport is not None else None
+    if metrics is None or peername is None or not metrics.is_allowed(peername[0]):
+        return HTTPNotFound()
+    return Response(body=metrics.render().encode('utf8'), headers={'Content-Type': CONTENT_TYPE})
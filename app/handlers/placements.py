@@ -1,7 +1,11 @@
+from datetime import date
 from aiohttp.web import Request, Response
 from extensions.decorators import ad_placer_only, validate_body_json, parse_query_params
 from extensions.controllers import bind_controller
-from extensions.http import HTTPSuccess, HTTPBadRequest, HTTPNotFound, HTTPCreated, HTTPNoContent, HTTPForbidden
+from extensions.http import (
+    HTTPSuccess, HTTPBadRequest, HTTPNotFound, HTTPCreated, HTTPNoContent, HTTPForbidden, stream_json_list, with_etag
+)
+from settings import settings
 from constants import ApiErrorCodes
 from controllers.placements import PlacementsController
 from exceptions.placements import (
@@ -12,15 +16,28 @@ from validators.placements import RegisterPlacementValidator
 from validators.analytics import YearValidator, MonthValidator, DayValidator
 
 
+async def get_placement_version(request: Request, controller: PlacementsController, **kwargs):
+    return await controller.get_placement_version(request.user, request.match_info['placement_id'])
+
+
+async def get_placement_analytics_version(request: Request, controller: PlacementsController, **kwargs):
+    # periods default to the current date, so the version changes with it
+    version = await controller.get_placement_version(request.user, request.match_info['placement_id'])
+    return None if version is None else (version, date.today())
+
+
 @ad_placer_only
 @bind_controller(PlacementsController)
 async def get_placements(request: Request, controller: PlacementsController) -> Response:
+    if settings.STREAM_LIST_RESPONSES:
+        return await stream_json_list(request, await controller.stream_placements(user=request.user))
     data = await controller.get_placements(user=request.user)
     return HTTPSuccess(data=data)
 
 
 @ad_placer_only
 @bind_controller(PlacementsController)
+@with_etag(get_placement_version)
 async def get_placement(request: Request, controller: PlacementsController) -> Response:
     try:
         data = await controller.get_placement(request.user, request.match_info['placement_id'])
@@ -60,6 +77,7 @@ async def delete_placement(request: Request, controller: PlacementsController) -
 @ad_placer_only
 @parse_query_params(YearValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_year_placement_views(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_year_views(request.user,
@@ -75,6 +93,7 @@ async def get_year_placement_views(request: Request, controller: PlacementsContr
 @ad_placer_only
 @parse_query_params(MonthValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_month_placement_views(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_month_views(request.user,
@@ -91,6 +110,7 @@ async def get_month_placement_views(request: Request, controller: PlacementsCont
 @ad_placer_only
 @parse_query_params(DayValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_day_placement_views(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_day_views(request.user,
@@ -108,6 +128,7 @@ async def get_day_placement_views(request: Request, controller: PlacementsContro
 @ad_placer_only
 @parse_query_params(YearValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_year_placement_clicks(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_year_clicks(request.user,
@@ -123,6 +144,7 @@ async def get_year_placement_clicks(request: Request, controller: PlacementsCont
 @ad_placer_only
 @parse_query_params(MonthValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_month_placement_clicks(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_month_clicks(request.user,
@@ -139,6 +161,7 @@ async def get_month_placement_clicks(request: Request, controller: PlacementsCon
 @ad_placer_only
 @parse_query_params(DayValidator)
 @bind_controller(PlacementsController)
+@with_etag(get_placement_analytics_version)
 async def get_day_placement_clicks(request: Request, controller: PlacementsController, params: dict) -> Response:
     try:
         data = await controller.get_day_clicks(request.user,
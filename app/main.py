@@ -1,20 +1,113 @@
 import logging
 import asyncio
 from aiohttp import web
-from aiopg.sa import create_engine
 from middlewares import middlewares
 from settings import settings
 from routes import route_config
 from extensions.app import App
+from extensions.engines import create_engine
+from extensions.ingest import IngestBuffer
+from extensions.indexes import IdIndex
+from extensions.spool import Spool
+from extensions.partitions import PartitionMaintainer
+from extensions.cache import LRUCache
+from extensions.principals import PrincipalCache
+from extensions.tokens import TokenCache
+from extensions.hashing import HashingExecutor
+from extensions.replicas import ReplicaSet
+from extensions.metrics import AppMetrics
+from extensions.counters import CounterFolder
+from controllers.mixins import get_bucket_counts_size
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
 
 
 def init_app(loop):
     _db = loop.run_until_complete(create_engine(
         user=settings.DB_USER, database=settings.DB_NAME,
-        host=settings.DB_HOST, password=settings.DB_PASS
+        host=settings.DB_HOST, password=settings.DB_PASS,
+        loop=loop, minsize=settings.DB_POOL_MIN_SIZE, maxsize=settings.DB_POOL_MAX_SIZE
     ))
 
-    app = App(db=_db, route_config=route_config, middlewares=middlewares)
+    replicas = None
+    if settings.DB_REPLICAS:
+        replica_engines = [loop.run_until_complete(create_engine(
+            user=replica['user'], database=replica['database'],
+            host=replica['host'], password=replica['password'],
+            loop=loop, minsize=settings.DB_POOL_MIN_SIZE, maxsize=settings.DB_POOL_MAX_SIZE
+        )) for replica in settings.DB_REPLICAS]
+        replicas = ReplicaSet(replica_engines, loop=loop, max_lag=settings.REPLICA_MAX_LAG,
+                              check_interval=settings.REPLICA_CHECK_INTERVAL)
+        loop.run_until_complete(replicas.check())
+        replicas.start()
+
+    spool = None
+    if settings.SPOOL_ENABLED:
+        spool = Spool(directory=settings.SPOOL_DIRECTORY, db=_db, loop=loop,
+                      segment_size=settings.SPOOL_SEGMENT_SIZE,
+                      replay_interval=settings.SPOOL_REPLAY_INTERVAL,
+                      replay_batch_size=settings.SPOOL_REPLAY_BATCH_SIZE,
+                      fsync=settings.SPOOL_FSYNC)
+        spool.start()
+
+    ingest_buffer = None
+    if settings.INGEST_BUFFER_ENABLED:
+        ingest_buffer = IngestBuffer(db=_db, loop=loop,
+                                     flush_size=settings.INGEST_BUFFER_FLUSH_SIZE,
+                                     flush_interval=settings.INGEST_BUFFER_FLUSH_INTERVAL,
+                                     max_size=settings.INGEST_BUFFER_MAX_SIZE,
+                                     spool=spool)
+        ingest_buffer.start()
+
+    counter_folder = None
+    if settings.COUNTER_FOLDER_ENABLED:
+        counter_folder = CounterFolder(db=_db, loop=loop, interval=settings.COUNTER_FOLD_INTERVAL,
+                                       batch_size=settings.COUNTER_FOLD_BATCH_SIZE)
+        counter_folder.start()
+
+    placement_index = None
+    if settings.PLACEMENT_INDEX_ENABLED:
+        placement_index = IdIndex(PlacementsQF.get_all_ids())
+        loop.run_until_complete(placement_index.load(_db))
+        placement_index.start_reloading(_db, loop, settings.PLACEMENT_INDEX_RELOAD_INTERVAL)
+
+    partition_maintainer = None
+    if settings.PARTITIONS_MAINTENANCE_ENABLED:
+        partition_maintainer = PartitionMaintainer(db=_db, loop=loop, months_ahead=settings.PARTITIONS_MONTHS_AHEAD,
+                                                   interval=settings.PARTITIONS_CHECK_INTERVAL)
+        partition_maintainer.start()
+
+    analytics_cache = None
+    if settings.ANALYTICS_CACHE_ENABLED:
+        analytics_cache = LRUCache(max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES,
+                                   max_bytes=settings.ANALYTICS_CACHE_MAX_BYTES,
+                                   get_size=get_bucket_counts_size)
+
+    principal_cache = None
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        principal_cache = PrincipalCache(db=_db, ttl=settings.PRINCIPAL_CACHE_TTL,
+                                         max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+
+    token_cache = None
+    if settings.TOKEN_CACHE_ENABLED:
+        token_cache = TokenCache(ttl=settings.TOKEN_CACHE_TTL, max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+                                 max_bytes=settings.TOKEN_CACHE_MAX_BYTES)
+
+    hashing_executor = None
+    if settings.HASHING_EXECUTOR_ENABLED:
+        hashing_executor = HashingExecutor(loop=loop, workers=settings.HASHING_WORKERS,
+                                           max_pending=settings.HASHING_MAX_PENDING,
+                                           use_processes=settings.HASHING_USE_PROCESSES)
+
+    metrics = None
+    if settings.METRICS_ENABLED:
+        metrics = AppMetrics(latency_buckets=settings.METRICS_LATENCY_BUCKETS,
+                             allowed_networks=settings.METRICS_ALLOWED_NETWORKS)
+
+    app = App(db=_db, ingest_buffer=ingest_buffer, placement_index=placement_index, spool=spool,
+              partition_maintainer=partition_maintainer, analytics_cache=analytics_cache,
+              principal_cache=principal_cache, token_cache=token_cache, hashing_executor=hashing_executor,
+              replicas=replicas, metrics=metrics,
+              counter_folder=counter_folder, route_config=route_config, middlewares=middlewares)
 
     logger = logging.getLogger(settings.LOGGER_NAME)
     logger.setLevel(settings.LOGGER_LEVEL)
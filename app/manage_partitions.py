@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date, datetime
+from optparse import OptionParser
+from sqlalchemy import create_engine
+from settings import settings
+from data_access.partitions import PartitionsQueryFactory as PartitionsQF, parse_partition_month
+from extensions.engines import create_engine as create_async_engine
+from extensions.partitions import PARTITIONED_TABLES, ensure_partitions
+
+
+def create_partitions(months_ahead: int) -> list:
+    loop = asyncio.get_event_loop()
+    db = loop.run_until_complete(create_async_engine(
+        user=settings.DB_USER, database=settings.DB_NAME, host=settings.DB_HOST, password=settings.DB_PASS,
+        loop=loop, minsize=1, maxsize=1
+    ))
+    try:
+        return loop.run_until_complete(ensure_partitions(db, months_ahead))
+    finally:
+        db.close()
+        loop.run_until_complete(db.wait_closed())
+
+
+def remove_partitions(conn, before: date, detach_only: bool):
+    """
+    Detaches the monthly partitions holding events older than `before`. Detached partitions are dropped unless
+    `detach_only` is set, in which case they are left as standalone tables to be archived.
+    Rollups are kept, so analytics for the removed months stay available.
+    """
+    for table_name in PARTITIONED_TABLES:
+        rp = conn.execute(PartitionsQF.get_partitions(table_name))
+        for row in rp.fetchall():
+            month = parse_partition_month(table_name, row.name)
+            if month is None or month >= before:
+                continue
+            with conn.begin():
+                conn.execute(PartitionsQF.detach_partition(table_name, row.name))
+                if not detach_only:
+                    conn.execute(PartitionsQF.drop_partition(row.name))
+            print('{} {}'.format('Detached' if detach_only else 'Dropped', row.name))
+
+
+def main():
+    parser = OptionParser(description='Manages monthly partitions of the clicks and views tables.')
+    parser.add_option('-a', '--ahead', dest='months_ahead', type='int', default=settings.PARTITIONS_MONTHS_AHEAD,
+                      help='Create partitions for this many months ahead of the current one')
+    parser.add_option('-b', '--remove-before', dest='remove_before',
+                      help='Remove partitions of the months before this one, format YYYY-MM')
+    parser.add_option('-d', '--detach-only', dest='detach_only', action='store_true', default=False,
+                      help='Detach old partitions for archiving instead of dropping them')
+    (options, args) = parser.parse_args()
+
+    engine = create_engine('postgresql+psycopg2://{user}:{password}@{host}/{database}'.format(
+        user=settings.DB_USER, password=settings.DB_PASS, host=settings.DB_HOST, database=settings.DB_NAME
+    ))
+    for name in create_partitions(options.months_ahead):
+        print('Created {}'.format(name))
+    with engine.connect() as conn:
+        if options.remove_before:
+            remove_partitions(conn, datetime.strptime(options.remove_before, '%Y-%m').date(), options.detach_only)
+
+
+if __name__ == '__main__':
+    main()
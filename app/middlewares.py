@@ -1,10 +1,17 @@
 import time
 import logging
 import jwt
+from aiohttp.web import HTTPException
 from settings import settings
 from constants import ApiErrorCodes
 from extensions.user_model import User
-from extensions.http import HTTPBadRequest
+from extensions.tokens import decode_token
+from extensions.db import RequestConnection
+from extensions.http import HTTPBadRequest, CORS_REQUEST_KEY
+from extensions.compression import compress_response
+
+
+METRICS_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
 
 
 def get_milliseconds_timestamp():
@@ -27,10 +34,59 @@ async def logging_middleware(app, handler):
     return middleware_wrapper
 
 
+def get_route_name(request) -> str:
+    resource = getattr(request.match_info.route, 'resource', None)
+    name = resource.name if resource is not None else None
+    return name or 'unmatched'
+
+
+def get_method_label(request) -> str:
+    # any token is a valid method, so unknown ones share a label and can't grow the number of series
+    return request.method if request.method in METRICS_METHODS else 'other'
+
+
+async def metrics_middleware(app, handler):
+    async def middleware_wrapper(request):
+        metrics = app.metrics
+        if metrics is None:
+            return await handler(request)
+
+        route = get_route_name(request)
+        method = get_method_label(request)
+        metrics.in_flight.inc(route)
+        start_time = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            metrics.in_flight.dec(route)
+            metrics.request_latency.observe(time.perf_counter() - start_time, route, method)
+            metrics.responses.inc(route, method, str(status))
+    return middleware_wrapper
+
+
 async def db_middleware(app, handler):
     async def middleware_wrapper(request):
-        request.db = app.db
-        return await handler(request)
+        if not settings.REQUEST_SCOPED_CONNECTION:
+            request.db = app.db
+            return await handler(request)
+
+        request.db = RequestConnection(app.db)
+        try:
+            return await handler(request)
+        finally:
+            await request.db.close()
+            logger.debug('[ {method} ] -- {url} -- {checkouts} DB checkouts for {uses} uses'.format(
+                method=request.method.upper(),
+                url=request.path_qs,
+                checkouts=request.db.checkouts,
+                uses=request.db.uses
+            ))
     return middleware_wrapper
 
 
@@ -40,23 +96,38 @@ async def auth_middleware(app, handler):
         token = request.headers.get(settings.JWT_HEADER, None)
         if token:
             try:
-                payload = jwt.decode(token, key=settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+                if app.token_cache is not None:
+                    payload = app.token_cache.decode(token)
+                else:
+                    payload = decode_token(token)
             except (jwt.DecodeError, jwt.ExpiredSignatureError):
                 return HTTPBadRequest(ApiErrorCodes.AUTH_TOKEN_IS_INVALID, errors={'token': 'Your token is invalid'})
-            request.user = await User.create(db=app.db, token_data=payload)
+            if app.principal_cache is not None:
+                request.user = await app.principal_cache.get(payload['type'], payload['user_id'], db=request.db)
+            else:
+                # the primary, a replica may not have the user yet right after the signup
+                request.user = await User.create(db=request.db, token_data=payload)
         return await handler(request)
     return middleware_wrapper
 
 
 async def cors_middleware(app, handler):
+    async def middleware_wrapper(request):
+        # the headers are added by `set_cors_headers` when the response is prepared
+        request[CORS_REQUEST_KEY] = True
+        return await handler(request)
+    return middleware_wrapper
+
+
+async def compression_middleware(app, handler):
     async def middleware_wrapper(request):
         response = await handler(request)
-        response.headers['Access-Control-Allow-Origin'] = '*'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
-        response.headers['Access-Control-Max-Age'] = '86400'
+        if settings.COMPRESSION_ENABLED and app.is_compression_enabled(request):
+            await compress_response(request, response, loop=app.loop)
         return response
     return middleware_wrapper
 
 
-middlewares = (cors_middleware, db_middleware, logging_middleware, auth_middleware)
-test_middlewares = (db_middleware, auth_middleware)
+middlewares = (metrics_middleware, cors_middleware, compression_middleware, db_middleware, logging_middleware,
+               auth_middleware)
+test_middlewares = (metrics_middleware, compression_middleware, db_middleware, auth_middleware)
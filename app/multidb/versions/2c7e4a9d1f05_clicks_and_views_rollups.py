@@ -0,0 +1,54 @@
+"""clicks and views rollups
+
+Revision ID: 2c7e4a9d1f05
+Revises: b5fcaef7f906
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2c7e4a9d1f05'
+down_revision = 'b5fcaef7f906'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+GRAINS = ('month', 'day', 'hour')
+
+
+def create_rollups_table(name, events_table):
+    op.create_table(name,
+    sa.Column('placement_id', sa.Integer(), nullable=False),
+    sa.Column('grain', sa.String(length=8), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['advert_orders.id'], ),
+    sa.ForeignKeyConstraint(['placement_id'], ['placements.id'], ),
+    sa.PrimaryKeyConstraint('placement_id', 'grain', 'bucket')
+    )
+    op.create_index('{}_order_grain_bucket_idx'.format(name), name, ['order_id', 'grain', 'bucket'], unique=False)
+
+    for grain in GRAINS:
+        op.execute("""
+            INSERT INTO {table} (placement_id, grain, bucket, order_id, count)
+            SELECT e.placement_id, '{grain}', date_trunc('{grain}', e.registered_at), placements.order_id, count(*)
+            FROM {events_table} AS e
+            JOIN placements ON placements.id = e.placement_id
+            GROUP BY e.placement_id, date_trunc('{grain}', e.registered_at), placements.order_id
+        """.format(table=name, events_table=events_table, grain=grain))
+
+
+def upgrade():
+    create_rollups_table('clicks_rollups', 'clicks')
+    create_rollups_table('views_rollups', 'views')
+
+
+def downgrade():
+    op.drop_index('views_rollups_order_grain_bucket_idx', table_name='views_rollups')
+    op.drop_table('views_rollups')
+    op.drop_index('clicks_rollups_order_grain_bucket_idx', table_name='clicks_rollups')
+    op.drop_table('clicks_rollups')
@@ -0,0 +1,84 @@
+"""monthly partitions for clicks and views
+
+Revision ID: 7e31b0c85a2d
+Revises: 2c7e4a9d1f05
+Create Date: 2026-10-18 11:03:52.771540
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7e31b0c85a2d'
+down_revision = '2c7e4a9d1f05'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+
+
+MONTHS_AHEAD = 3
+
+
+def partition_table(table):
+    op.execute('ALTER TABLE {t} RENAME TO {t}_unpartitioned'.format(t=table))
+    op.execute('ALTER INDEX {t}_pkey RENAME TO {t}_unpartitioned_pkey'.format(t=table))
+    op.execute("""
+        CREATE TABLE {t} (
+            id integer NOT NULL DEFAULT nextval('{t}_id_seq'),
+            placement_id integer NOT NULL REFERENCES placements (id),
+            registered_at timestamp without time zone NOT NULL DEFAULT now(),
+            CONSTRAINT {t}_pkey PRIMARY KEY (id, registered_at)
+        ) PARTITION BY RANGE (registered_at)
+    """.format(t=table))
+    op.execute('CREATE TABLE {t}_default PARTITION OF {t} DEFAULT'.format(t=table))
+    op.execute("""
+        DO $$
+        DECLARE
+            month date;
+            last_month date := (date_trunc('month', now()) + interval '{ahead} months')::date;
+        BEGIN
+            SELECT coalesce(date_trunc('month', min(registered_at)), date_trunc('month', now()))::date
+            INTO month FROM {t}_unpartitioned;
+            WHILE month <= last_month LOOP
+                EXECUTE 'CREATE TABLE ' || quote_ident('{t}_' || to_char(month, '"y"YYYY"m"MM'))
+                    || ' PARTITION OF {t} FOR VALUES FROM (' || quote_literal(month)
+                    || ') TO (' || quote_literal((month + interval '1 month')::date) || ')';
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END
+        $$
+    """.format(t=table, ahead=MONTHS_AHEAD))
+    op.execute("""
+        INSERT INTO {t} (id, placement_id, registered_at)
+        SELECT id, placement_id, registered_at FROM {t}_unpartitioned
+    """.format(t=table))
+    op.execute('ALTER SEQUENCE {t}_id_seq OWNED BY {t}.id'.format(t=table))
+    op.execute('DROP TABLE {t}_unpartitioned'.format(t=table))
+
+
+def unpartition_table(table):
+    op.execute('ALTER TABLE {t} RENAME TO {t}_partitioned'.format(t=table))
+    op.execute('ALTER INDEX {t}_pkey RENAME TO {t}_partitioned_pkey'.format(t=table))
+    op.execute("""
+        CREATE TABLE {t} (
+            id integer NOT NULL DEFAULT nextval('{t}_id_seq'),
+            placement_id integer NOT NULL REFERENCES placements (id),
+            registered_at timestamp without time zone NOT NULL DEFAULT now(),
+            CONSTRAINT {t}_pkey PRIMARY KEY (id)
+        )
+    """.format(t=table))
+    op.execute("""
+        INSERT INTO {t} (id, placement_id, registered_at)
+        SELECT id, placement_id, registered_at FROM {t}_partitioned
+    """.format(t=table))
+    op.execute('ALTER SEQUENCE {t}_id_seq OWNED BY {t}.id'.format(t=table))
+    op.execute('DROP TABLE {t}_partitioned CASCADE'.format(t=table))
+
+
+def upgrade():
+    partition_table('clicks')
+    partition_table('views')
+
+
+def downgrade():
+    unpartition_table('views')
+    unpartition_table('clicks')
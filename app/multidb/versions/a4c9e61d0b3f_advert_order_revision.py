@@ -0,0 +1,24 @@
+"""advert order revision
+
+Revision ID: a4c9e61d0b3f
+Revises: f3b82c19d4e7
+Create Date: 2026-10-18 18:40:27.518302
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e61d0b3f'
+down_revision = 'f3b82c19d4e7'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('advert_orders', sa.Column('revision', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('advert_orders', 'revision')
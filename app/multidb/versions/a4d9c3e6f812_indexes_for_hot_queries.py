@@ -0,0 +1,75 @@
+"""indexes for hot queries
+
+Revision ID: a4d9c3e6f812
+Revises: 7e31b0c85a2d
+Create Date: 2026-10-18 11:48:09.130266
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9c3e6f812'
+down_revision = '7e31b0c85a2d'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# (table, index name suffix, access method, columns)
+EVENTS_INDEXES = [
+    ('clicks', 'placement_registered_at_idx', 'btree', 'placement_id, registered_at'),
+    ('clicks', 'registered_at_brin_idx', 'brin', 'registered_at'),
+    ('views', 'placement_registered_at_idx', 'btree', 'placement_id, registered_at'),
+    ('views', 'registered_at_brin_idx', 'brin', 'registered_at'),
+]
+
+# placements.placer_id is already covered by placements_placer_order_uc
+TABLE_INDEXES = [
+    ('placements', 'placements_order_id_idx', 'order_id'),
+    ('advert_orders', 'advert_orders_owner_id_idx', 'owner_id'),
+]
+
+
+def get_partitions(table):
+    rp = op.get_bind().execute(sa.text("""
+        SELECT child.relname AS name
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table_name
+    """).bindparams(table_name=table))
+    return [row.name for row in rp]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block, so the one alembic has opened
+    # is committed. Indexes are created with IF NOT EXISTS, so a failed upgrade can be rerun.
+    op.execute('COMMIT')
+
+    for table, name, method, columns in EVENTS_INDEXES:
+        # a partitioned table can't be indexed concurrently: an invalid index is created on the parent only,
+        # each partition is indexed concurrently and attached, and the parent index becomes valid once all
+        # partitions are attached. Partitions created later get the index automatically.
+        parent_index = '{}_{}'.format(table, name)
+        op.execute('CREATE INDEX IF NOT EXISTS {} ON ONLY {} USING {} ({})'.format(
+            parent_index, table, method, columns))
+        for partition in get_partitions(table):
+            partition_index = '{}_{}'.format(partition, name)
+            op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} USING {} ({})'.format(
+                partition_index, partition, method, columns))
+            op.execute('ALTER INDEX {} ATTACH PARTITION {}'.format(parent_index, partition_index))
+
+    for table, name, column in TABLE_INDEXES:
+        op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ({})'.format(name, table, column))
+
+
+def downgrade():
+    op.execute('COMMIT')
+
+    for table, name, column in TABLE_INDEXES:
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS {}'.format(name))
+
+    # indexes of partitioned tables can't be dropped concurrently, dropping the parent index drops the attached ones
+    for table, name, method, columns in EVENTS_INDEXES:
+        op.execute('DROP INDEX IF EXISTS {}_{}'.format(table, name))
@@ -0,0 +1,40 @@
+"""clicks and views counters
+
+Revision ID: d51f8a2b6c47
+Revises: a4d9c3e6f812
+Create Date: 2026-10-18 12:36:44.508813
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd51f8a2b6c47'
+down_revision = 'a4d9c3e6f812'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    for table in ('placements', 'advert_orders'):
+        op.add_column(table, sa.Column('clicks_count', sa.BigInteger(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('views_count', sa.BigInteger(), server_default='0', nullable=False))
+
+    for events_table, column in (('clicks', 'clicks_count'), ('views', 'views_count')):
+        op.execute("""
+            UPDATE placements SET {column} = c.count
+            FROM (SELECT placement_id, count(*) AS count FROM {events_table} GROUP BY placement_id) AS c
+            WHERE placements.id = c.placement_id
+        """.format(column=column, events_table=events_table))
+        op.execute("""
+            UPDATE advert_orders SET {column} = c.count
+            FROM (SELECT order_id, sum({column}) AS count FROM placements GROUP BY order_id) AS c
+            WHERE advert_orders.id = c.order_id
+        """.format(column=column))
+
+
+def downgrade():
+    for table in ('advert_orders', 'placements'):
+        op.drop_column(table, 'views_count')
+        op.drop_column(table, 'clicks_count')
@@ -0,0 +1,28 @@
+"""uncounted events
+
+Revision ID: f3b82c19d4e7
+Revises: d51f8a2b6c47
+Create Date: 2026-10-18 15:02:11.204118
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'f3b82c19d4e7'
+down_revision = 'd51f8a2b6c47'
+branch_labels = None
+depends_on = None
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('uncounted_events',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('event_type', sa.String(8), nullable=False),
+        sa.Column('placement_id', sa.Integer(), nullable=False),
+        sa.Column('registered_at', sa.DateTime(), nullable=False))
+
+
+def downgrade():
+    op.drop_table('uncounted_events')
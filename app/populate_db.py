@@ -6,10 +6,13 @@ from loremipsum import get_sentence
 from psycopg2 import IntegrityError
 from sqlalchemy import create_engine, insert, select, exc
 from settings import settings
+from constants import EventTypes
 from data_access.auth import users, ad_placers, ad_providers
 from data_access.advert_orders import advert_orders
 from data_access.placements import placements
 from data_access.analytics import clicks, views
+from rebuild_rollups import rebuild_rollups
+from reconcile_counters import reconcile_counters
 
 
 random.seed()
@@ -122,6 +125,9 @@ def populate_db(provider_email, placer_email):
 
         conn.execute(insert(views), analytics_data)
 
+        rebuild_rollups(conn, EventTypes.as_choices())
+        reconcile_counters(conn, EventTypes.as_choices())
+
 
 def main():
     parser = OptionParser()
@@ -0,0 +1,29 @@
+from optparse import OptionParser
+from sqlalchemy import create_engine
+from settings import settings
+from constants import EventTypes
+from data_access.rollups import RollupsQueryFactory as RollupsQF
+
+
+def rebuild_rollups(conn, event_types: list):
+    for event_type in event_types:
+        with conn.begin():
+            for statement in RollupsQF.rebuild(event_type):
+                conn.execute(statement)
+
+
+def main():
+    parser = OptionParser(description='Recomputes clicks and views rollups from the raw events.')
+    parser.add_option('-t', '--type', dest='event_type', choices=EventTypes.as_choices(),
+                      help='Rebuild the rollups of this event type only')
+    (options, args) = parser.parse_args()
+
+    engine = create_engine('postgresql+psycopg2://{user}:{password}@{host}/{database}'.format(
+        user=settings.DB_USER, password=settings.DB_PASS, host=settings.DB_HOST, database=settings.DB_NAME
+    ))
+    with engine.connect() as conn:
+        rebuild_rollups(conn, [options.event_type] if options.event_type else EventTypes.as_choices())
+
+
+if __name__ == '__main__':
+    main()
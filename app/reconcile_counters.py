@@ -0,0 +1,35 @@
+from optparse import OptionParser
+from sqlalchemy import create_engine
+from settings import settings
+from constants import EventTypes
+from data_access.counters import CountersQueryFactory as CountersQF
+
+
+def reconcile_counters(conn, event_types: list) -> int:
+    """
+    Repairs clicks and views counters of placements and advert orders, returns the number of rows repaired.
+    """
+    repaired = 0
+    for event_type in event_types:
+        with conn.begin():
+            for statement in CountersQF.reconcile(event_type):
+                repaired += conn.execute(statement).rowcount or 0
+    return repaired
+
+
+def main():
+    parser = OptionParser(description='Repairs clicks and views counters which have drifted from the raw events.')
+    parser.add_option('-t', '--type', dest='event_type', choices=EventTypes.as_choices(),
+                      help='Reconcile the counters of this event type only')
+    (options, args) = parser.parse_args()
+
+    engine = create_engine('postgresql+psycopg2://{user}:{password}@{host}/{database}'.format(
+        user=settings.DB_USER, password=settings.DB_PASS, host=settings.DB_HOST, database=settings.DB_NAME
+    ))
+    with engine.connect() as conn:
+        repaired = reconcile_counters(conn, [options.event_type] if options.event_type else EventTypes.as_choices())
+    print('Repaired {} counters'.format(repaired))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,8 @@ from handlers.placements import (
     get_year_placement_views, get_month_placement_views, get_day_placement_views,
     get_month_placement_clicks, get_day_placement_clicks, get_placement
 )
-from handlers.analytics import register_click, register_view
+from handlers.analytics import register_click, register_view, register_batch
+from handlers.metrics import get_metrics
 
 
 class EndpointsMapper:
@@ -27,6 +28,7 @@ class EndpointsMapper:
 
     CLICKS = 'clicks'
     VIEWS = 'views'
+    EVENTS_BATCH = 'events-batch'
 
     AD_ORDER_YEAR_CLICKS = 'ad-order-year-clicks'
     AD_ORDER_MONTH_CLICKS = 'ad-order-month-clicks'
@@ -44,6 +46,8 @@ class EndpointsMapper:
     PLACEMENT_MONTH_VIEWS = 'placement-month-views'
     PLACEMENT_DAY_VIEWS = 'placement-day-views'
 
+    METRICS = 'metrics'
+
 
 route_config = {
     '/signup-ad-placer': {
@@ -141,10 +145,21 @@ route_config = {
     },
     '/analytics/clicks': {
         'name': EndpointsMapper.CLICKS,
-        'methods': {POST: register_click}
+        'methods': {POST: register_click},
+        'compress': False
     },
     '/analytics/views': {
         'name': EndpointsMapper.VIEWS,
-        'methods': {POST: register_view}
+        'methods': {POST: register_view},
+        'compress': False
+    },
+    '/analytics/batch': {
+        'name': EndpointsMapper.EVENTS_BATCH,
+        'methods': {POST: register_batch},
+        'compress': False
+    },
+    '/metrics': {
+        'name': EndpointsMapper.METRICS,
+        'methods': {GET: get_metrics}
     }
 }
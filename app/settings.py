@@ -7,11 +7,103 @@ class BaseSettings:
     JWT_ALGORITHM = 'HS256'
     JWT_EXT_DELTA_SECONDS = 365 * 24 * 3600
 
+    # keys the ETags, so they can't be computed from guessed versions
+    ETAG_SECRET = 'k#2Vd!9qL+x*Ur7@mZ(w$3Np)eYc&8Hs^Tf=0jBg'
+
     THREAD_POOL_LIMIT = 2
     PROCESS_POOL_LIMIT = 20
 
     LOGGER_NAME = 'ads-logger'
 
+    INGEST_BUFFER_ENABLED = False
+    INGEST_BUFFER_FLUSH_SIZE = 500
+    INGEST_BUFFER_FLUSH_INTERVAL = 1.0
+    INGEST_BUFFER_MAX_SIZE = 10000
+
+    # events written one request at a time are added to the rollups and counters in batches, in the background
+    COUNTER_FOLDER_ENABLED = True
+    COUNTER_FOLD_INTERVAL = 1.0
+    COUNTER_FOLD_BATCH_SIZE = 5000
+
+    SPOOL_ENABLED = False
+    SPOOL_DIRECTORY = 'spool'
+    SPOOL_SEGMENT_SIZE = 16 * 1024 * 1024
+    SPOOL_REPLAY_INTERVAL = 5.0
+    SPOOL_REPLAY_BATCH_SIZE = 1000
+    SPOOL_FSYNC = False
+
+    PLACEMENT_INDEX_ENABLED = False
+    PLACEMENT_INDEX_RELOAD_INTERVAL = 30.0
+
+    # `aiopg` or `asyncpg`, the latter has to be installed separately
+    DB_BACKEND = 'aiopg'
+    DB_POOL_MIN_SIZE = 10
+    DB_POOL_MAX_SIZE = 10
+
+    # read-only dashboard queries are routed to replicas at most `REPLICA_MAX_LAG` seconds behind the primary,
+    # `DB_REPLICAS` holds a dict of `user`, `database`, `host` and `password` per replica, the users need the
+    # `pg_read_all_stats` role to see whether their replica is streaming from the primary
+    DB_REPLICAS = ()
+    REPLICA_MAX_LAG = 5.0
+    REPLICA_CHECK_INTERVAL = 1.0
+
+    # requests check one connection out of the pool on first use and keep it till the response is produced
+    REQUEST_SCOPED_CONNECTION = False
+
+    # partitions are created by a scheduled `manage_partitions.py`; the in-app maintainer runs the same DDL
+    # on the app's pool, so enable it in one process at most
+    PARTITIONS_MAINTENANCE_ENABLED = False
+    PARTITIONS_MONTHS_AHEAD = 3
+    PARTITIONS_CHECK_INTERVAL = 6 * 3600.0
+
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 1024
+    COMPRESSION_EXECUTOR_MIN_SIZE = 64 * 1024
+    COMPRESSION_THREADS = 2
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5
+
+    # one of `auto`, `orjson`, `ujson`, `rapidjson` or `json`
+    JSON_CODEC = 'auto'
+
+    STREAM_LIST_RESPONSES = False
+    STREAM_CHUNK_SIZE = 500
+
+    BATCH_MAX_EVENTS = 1000
+    BATCH_EVENT_MAX_AGE_SECONDS = 24 * 3600
+    BATCH_EVENT_MAX_CLOCK_SKEW_SECONDS = 5 * 60
+
+    ANALYTICS_CACHE_ENABLED = True
+    ANALYTICS_CACHE_MAX_ENTRIES = 100000
+    ANALYTICS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    ANALYTICS_CACHE_OPEN_PERIOD_TTL = 10.0
+    # a period is closed once batched events can't be registered for it anymore
+    ANALYTICS_CACHE_CLOSE_DELAY = BATCH_EVENT_MAX_AGE_SECONDS + BATCH_EVENT_MAX_CLOCK_SKEW_SECONDS
+    # events still reach closed periods from the spool replay, late flushes and rollup rebuilds
+    ANALYTICS_CACHE_CLOSED_PERIOD_TTL = 3600.0
+
+    PRINCIPAL_CACHE_ENABLED = True
+    # users are only changed out of band, the TTL bounds how long such a change, e.g. a lock, goes unnoticed
+    PRINCIPAL_CACHE_TTL = 5.0
+    PRINCIPAL_CACHE_MAX_ENTRIES = 10000
+
+    TOKEN_CACHE_ENABLED = True
+    TOKEN_CACHE_TTL = 3600.0
+    TOKEN_CACHE_MAX_ENTRIES = 10000
+    TOKEN_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+    HASHING_EXECUTOR_ENABLED = True
+    # `None` is one worker per core and 4 pending hashings per worker
+    HASHING_WORKERS = None
+    HASHING_MAX_PENDING = None
+    HASHING_USE_PROCESSES = False
+
+    # request metrics and component stats are served on `/metrics` in the Prometheus text format, only to
+    # clients connecting from `METRICS_ALLOWED_NETWORKS`, so a reverse proxy in front of the app must not expose it
+    METRICS_ENABLED = True
+    METRICS_ALLOWED_NETWORKS = ('127.0.0.0/8', '::1/128')
+    METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
 
 class DevSettings(BaseSettings):
     HOST = '0.0.0.0'
@@ -27,6 +119,9 @@ class DevSettings(BaseSettings):
     TEST_DB_HOST = '127.0.0.1'
     TEST_DB_PASS = 'homm1994'
 
+    # a second database with the same schema standing in for a replica
+    TEST_REPLICA_DB_NAME = 'ads-dev-test-replica'
+
     SALT_ROUNDS = 10
 
     LOGGER_LEVEL = logging.DEBUG
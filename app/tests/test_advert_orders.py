@@ -1,11 +1,13 @@
 import json
 import jwt
+from unittest.mock import patch
 from sqlalchemy import insert
 from settings import settings
 from aiohttp.test_utils import unittest_run_loop
 from extensions.http import StatusCodes
 from extensions.testing import BaseTestCase
 from routes import EndpointsMapper
+from middlewares import middlewares
 from constants import AdvertOrderRanks, ApiErrorCodes
 from data_access.advert_orders import advert_orders, AdvertOrdersQueryFactory as AdOrdersQF
 
@@ -67,6 +69,38 @@ class GetAdvertOrdersTestCase(BaseTestCase):
         for order in body:
             assert 'id' in order
 
+    @unittest_run_loop
+    async def test_streams_data_in_chunks(self):
+        user_data = {
+            'email': 'popow.andrej2009@yandex.ru',
+            'password': 'homm1994'
+        }
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps(user_data))
+        token = (await response.json())['token']
+        owner_id = jwt.decode(token, key=settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])['user_id']
+        async with self.test_db_eng.acquire() as conn:
+            for i in range(5):
+                await conn.execute(insert(advert_orders).values(
+                    follow_url_link='https://link{}.com'.format(i),
+                    description='description #{}'.format(i),
+                    rank=AdvertOrderRanks.HIGH if i == 3 else AdvertOrderRanks.LOW,
+                    owner_id=owner_id
+                ))
+
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        with patch.object(settings, 'STREAM_LIST_RESPONSES', True), patch.object(settings, 'STREAM_CHUNK_SIZE', 2):
+            response = await self.client.get(url, headers={settings.JWT_HEADER: token})
+
+            assert response.status == StatusCodes.OK
+            assert response.headers.get('Transfer-Encoding') == 'chunked'
+            body = await response.json()
+            await response.release()
+
+        assert len(body) == 5
+        assert body[0]['follow_url_link'] == 'https://link3.com'
+        assert all(order['clicks'] == 0 and order['views'] == 0 for order in body)
+
     @unittest_run_loop
     async def test_returns_401_when_anon(self):
         response = await self.client.get(self.app.get_url(EndpointsMapper.ADVERT_ORDERS))
@@ -74,6 +108,27 @@ class GetAdvertOrdersTestCase(BaseTestCase):
         await response.release()
 
 
+class ProductionMiddlewaresTestCase(BaseTestCase):
+    app_middlewares = middlewares
+
+    @unittest_run_loop
+    async def test_streamed_list_has_cors_headers(self):
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps({'email': 'a@b.com', 'password': 'homm1994'}))
+        token = (await response.json())['token']
+        assert response.headers.get('Access-Control-Allow-Origin') == '*'
+
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        with patch.object(settings, 'STREAM_LIST_RESPONSES', True):
+            response = await self.client.get(url, headers={settings.JWT_HEADER: token})
+            assert response.status == StatusCodes.OK
+            assert response.headers.get('Transfer-Encoding') == 'chunked'
+            assert response.headers.get('Access-Control-Allow-Origin') == '*'
+            assert 'Authorization' in response.headers.get('Access-Control-Allow-Headers')
+            assert await response.json() == []
+            await response.release()
+
+
 class CreateAdvertOrderTestCase(BaseTestCase):
 
     @unittest_run_loop
@@ -230,6 +285,28 @@ class UpdateAdvertOrderTestCase(BaseTestCase):
 
         assert (await self.db_data)['heading_picture'] == data['heading_picture']
 
+    @unittest_run_loop
+    async def test_returns_304_until_order_is_updated(self):
+        response = await self.client.get(self.url, headers=self.headers)
+        assert response.status == StatusCodes.OK
+        etag = response.headers['ETag']
+        await response.release()
+
+        headers = dict(self.headers, **{'If-None-Match': etag})
+        response = await self.client.get(self.url, headers=headers)
+        assert response.status == StatusCodes.NOT_MODIFIED
+        await response.release()
+
+        data = {'description': 'Another description text'}
+        response = await self.client.patch(self.url, headers=self.headers, data=json.dumps(data))
+        await response.release()
+
+        response = await self.client.get(self.url, headers=headers)
+        assert response.status == StatusCodes.OK
+        assert response.headers['ETag'] != etag
+        assert (await response.json())['description'] == data['description']
+        await response.release()
+
     @unittest_run_loop
     async def test_returns_400_when_order_not_exist(self):
         data = {'heading_picture': 'https://www.cdn.class.com/new_promo_cover_image'}
@@ -1,14 +1,29 @@
+import os
 import json
+import asyncio
+import tempfile
 from datetime import datetime
 from calendar import monthrange
-from sqlalchemy import insert
+from sqlalchemy import select, func
 from aiohttp.test_utils import unittest_run_loop
 from extensions.testing import BaseTestCase
 from extensions.http import StatusCodes
+from extensions.ingest import IngestBuffer, write_events
+from extensions.decorators import NDJSON_CONTENT_TYPE
+from extensions.indexes import IdIndex
+from extensions.spool import Spool
+from extensions.cache import LRUCache
+from extensions.engines import create_engine
+from extensions.counters import CounterFolder
 from routes import EndpointsMapper
 from settings import settings
-from constants import ApiErrorCodes
+from constants import ApiErrorCodes, EventTypes, TimeBuckets
 from data_access.analytics import clicks, views
+from data_access.rollups import clicks_rollups
+from data_access.counters import uncounted_events
+from data_access.advert_orders import advert_orders
+from data_access.placements import placements, PlacementsQueryFactory as PlacementsQF
+from exceptions.analytics import IngestBufferIsFull
 
 
 class AnalyticsSetupMixin:
@@ -150,6 +165,258 @@ class AnalyticsRegisterTestCase(AnalyticsSetupMixin, BaseTestCase):
         await response.release()
 
 
+class AnalyticsBatchTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    @unittest_run_loop
+    async def test_registers_valid_events_and_rejects_invalid_ones(self):
+        url = self.app.get_url(EndpointsMapper.EVENTS_BATCH)
+        data = json.dumps([
+            {'type': 'click', 'placement_id': self.p_id},
+            {'type': 'view', 'placement_id': self.p_id},
+            {'type': 'view', 'placement_id': self.p_id, 'ts': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')},
+            {'type': 'unknown', 'placement_id': self.p_id},
+            {'type': 'view', 'placement_id': self.p_id - 1}
+        ])
+        response = await self.client.post(url, data=data)
+
+        assert response.status == StatusCodes.CREATED
+        body = await response.json()
+        await response.release()
+
+        assert body['accepted'] == 3
+        assert [r['index'] for r in body['rejected']] == [3, 4]
+        assert 'type' in body['rejected'][0]['errors']
+        assert 'placement_id' in body['rejected'][1]['errors']
+        assert await self.count_rows(clicks) == 1
+        assert await self.count_rows(views) == 2
+
+    @unittest_run_loop
+    async def test_accepts_ndjson(self):
+        url = self.app.get_url(EndpointsMapper.EVENTS_BATCH)
+        data = '\n'.join([
+            json.dumps({'type': 'click', 'placement_id': self.p_id}),
+            '{invalid',
+            json.dumps({'type': 'view', 'placement_id': self.p_id})
+        ])
+        response = await self.client.post(url, data=data, headers={'Content-Type': NDJSON_CONTENT_TYPE})
+
+        assert response.status == StatusCodes.CREATED
+        body = await response.json()
+        await response.release()
+
+        assert body['accepted'] == 2
+        assert [r['index'] for r in body['rejected']] == [1]
+
+    @unittest_run_loop
+    async def test_returns_400_when_body_is_not_array(self):
+        url = self.app.get_url(EndpointsMapper.EVENTS_BATCH)
+        response = await self.client.post(url, data=json.dumps({'type': 'click', 'placement_id': self.p_id}))
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        body = await response.json()
+        await response.release()
+        self.check_error_response_body(body, ApiErrorCodes.BODY_VALIDATION_ERROR)
+
+    @unittest_run_loop
+    async def test_returns_400_when_batch_is_too_large(self):
+        url = self.app.get_url(EndpointsMapper.EVENTS_BATCH)
+        data = json.dumps([{'type': 'view', 'placement_id': self.p_id}] * (settings.BATCH_MAX_EVENTS + 1))
+        response = await self.client.post(url, data=data)
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        body = await response.json()
+        await response.release()
+        self.check_error_response_body(body, ApiErrorCodes.BATCH_IS_TOO_LARGE)
+
+    @unittest_run_loop
+    async def test_returns_400_when_ndjson_batch_is_too_large(self):
+        url = self.app.get_url(EndpointsMapper.EVENTS_BATCH)
+        data = '\n'.join([json.dumps({'type': 'view', 'placement_id': self.p_id})] * (settings.BATCH_MAX_EVENTS + 1))
+        response = await self.client.post(url, data=data, headers={'Content-Type': NDJSON_CONTENT_TYPE})
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        body = await response.json()
+        await response.release()
+        self.check_error_response_body(body, ApiErrorCodes.BATCH_IS_TOO_LARGE)
+
+
+class BufferedAnalyticsRegisterTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        return {'ingest_buffer': IngestBuffer(db=db, loop=loop, flush_size=100, flush_interval=60, max_size=100)}
+
+    @unittest_run_loop
+    async def test_click_is_written_on_flush(self):
+        url = self.app.get_url(EndpointsMapper.CLICKS)
+        data = json.dumps({'placement_id': self.p_id})
+        response = await self.client.post(url, headers=self.placer_headers, data=data)
+
+        assert response.status == StatusCodes.CREATED
+        await response.release()
+
+        assert self.app.ingest_buffer.depth == 1
+        assert await self.count_rows(clicks) == 0
+
+        await self.app.ingest_buffer.flush()
+
+        assert self.app.ingest_buffer.depth == 0
+        assert await self.count_rows(clicks) == 1
+
+    @unittest_run_loop
+    async def test_full_buffer_takes_none_of_the_batch(self):
+        # a closed engine, so flushes fail and the buffer stays full
+        db = await create_engine(user=settings.TEST_DB_USER, database=settings.TEST_DB_NAME,
+                                 host=settings.TEST_DB_HOST, password=settings.TEST_DB_PASS,
+                                 loop=self.loop, minsize=0, maxsize=1)
+        db.close()
+        await db.wait_closed()
+        ingest_buffer = IngestBuffer(db=db, loop=self.loop, flush_size=100, flush_interval=60, max_size=3)
+        await ingest_buffer.add(EventTypes.CLICK, self.p_id)
+        await ingest_buffer.add(EventTypes.CLICK, self.p_id)
+
+        event = {'placement_id': self.p_id, 'registered_at': None}
+        with self.assertRaises(IngestBufferIsFull):
+            await ingest_buffer.add_grouped({EventTypes.CLICK: [event], EventTypes.VIEW: [event]})
+        assert ingest_buffer.depth == 2
+
+    @unittest_run_loop
+    async def test_events_for_non_existent_placement_are_dropped_on_flush(self):
+        url = self.app.get_url(EndpointsMapper.VIEWS)
+        for placement_id in (self.p_id, self.p_id - 1):
+            response = await self.client.post(url, headers=self.placer_headers,
+                                              data=json.dumps({'placement_id': placement_id}))
+            assert response.status == StatusCodes.CREATED
+            await response.release()
+
+        await self.app.ingest_buffer.flush()
+
+        assert self.app.ingest_buffer.flushed_events == 1
+        assert await self.count_rows(views) == 1
+
+
+class FoldedAnalyticsRegisterTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        return {'counter_folder': CounterFolder(db=db, loop=loop, interval=60, batch_size=2)}
+
+    async def get_counts(self):
+        async with self.test_db_eng.acquire() as conn:
+            return (await conn.scalar(select([placements.c.clicks_count])),
+                    await conn.scalar(select([advert_orders.c.clicks_count])),
+                    await conn.scalar(select([func.coalesce(func.sum(clicks_rollups.c.count), 0)])
+                                      .where(clicks_rollups.c.grain == TimeBuckets.MONTH)))
+
+    @unittest_run_loop
+    async def test_clicks_are_counted_on_fold(self):
+        url = self.app.get_url(EndpointsMapper.CLICKS)
+        for _ in range(3):
+            response = await self.client.post(url, headers=self.placer_headers,
+                                              data=json.dumps({'placement_id': self.p_id}))
+            assert response.status == StatusCodes.CREATED
+            await response.release()
+
+        assert await self.get_counts() == (0, 0, 0)
+
+        assert await self.app.counter_folder.fold() == 2
+        assert await self.get_counts() == (2, 2, 2)
+
+        await self.app.counter_folder.fold_all()
+        assert await self.get_counts() == (3, 3, 3)
+        async with self.test_db_eng.acquire() as conn:
+            assert await conn.scalar(select([func.count()]).select_from(uncounted_events)) == 0
+
+
+class IndexedAnalyticsRegisterTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        placement_index = IdIndex(PlacementsQF.get_all_ids())
+        loop.run_until_complete(placement_index.load(db))
+        return {'placement_index': placement_index}
+
+    @unittest_run_loop
+    async def test_created_placement_is_indexed(self):
+        assert self.p_id in self.app.placement_index
+
+        url = self.app.get_url(EndpointsMapper.CLICKS)
+        response = await self.client.post(url, headers=self.placer_headers, data=json.dumps({'placement_id': self.p_id}))
+
+        assert response.status == StatusCodes.CREATED
+        await response.release()
+
+    @unittest_run_loop
+    async def test_returns_400_for_non_indexed_placement(self):
+        url = self.app.get_url(EndpointsMapper.CLICKS)
+        data = json.dumps({'placement_id': self.p_id + 1})
+        response = await self.client.post(url, headers=self.placer_headers, data=data)
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        body = await response.json()
+        await response.release()
+        self.check_error_response_body(body, ApiErrorCodes.PLACEMENT_DOES_NOT_EXIST, 'placement_id')
+
+    @unittest_run_loop
+    async def test_keeps_changes_made_during_load(self):
+        placement_index = self.app.placement_index
+        loading = asyncio.ensure_future(placement_index.load(self.test_db_eng), loop=self.loop)
+        await asyncio.sleep(0, loop=self.loop)
+        placement_index.add(self.p_id + 1)
+        placement_index.discard(self.p_id)
+        await loading
+
+        assert self.p_id + 1 in placement_index
+        assert self.p_id not in placement_index
+
+    @unittest_run_loop
+    async def test_deleted_placement_is_removed_from_index(self):
+        url = self.app.get_url(EndpointsMapper.PLACEMENT, parts={'placement_id': self.p_id})
+        response = await self.client.delete(url, headers=self.placer_headers)
+
+        assert response.status == StatusCodes.NO_CONTENT
+        await response.release()
+
+        assert self.p_id not in self.app.placement_index
+
+
+class SpoolTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        self.spool_dir = tempfile.TemporaryDirectory()
+        spool = Spool(directory=self.spool_dir.name, db=db, loop=loop, segment_size=1024,
+                      replay_interval=60, replay_batch_size=10)
+        return {'spool': spool}
+
+    async def tear_down(self):
+        await self.app.spool.close()
+        self.spool_dir.cleanup()
+
+    @unittest_run_loop
+    async def test_spooled_events_are_replayed(self):
+        spool = self.app.spool
+        await spool.append_many(EventTypes.CLICK, [{'placement_id': self.p_id}] * 30)
+        await spool.append_many(EventTypes.VIEW, [{'placement_id': self.p_id}, {'placement_id': self.p_id - 1}])
+
+        assert await self.count_rows(clicks) == 0
+
+        replayed = await spool.replay()
+
+        assert replayed == 31
+        assert await self.count_rows(clicks) == 30
+        assert await self.count_rows(views) == 1
+        assert spool.pending_bytes == 0
+
+    @unittest_run_loop
+    async def test_segments_left_by_previous_process_are_replayed_without_torn_records(self):
+        with open(os.path.join(self.spool_dir.name, '{:012d}.spool'.format(0)), 'w') as f:
+            f.write('click\t{p_id}\t2016-12-01T10:00:00.000000\nclick\t{p_id}\t2016-12'.format(p_id=self.p_id))
+
+        spool = Spool(directory=self.spool_dir.name, db=self.test_db_eng, loop=self.loop, segment_size=1024,
+                      replay_interval=60, replay_batch_size=10)
+        replayed = await spool.replay()
+
+        assert replayed == 1
+        assert await self.count_rows(clicks) == 1
+
+
 class AnalyticsClicksTestCase(AnalyticsSetupMixin, BaseTestCase):
 
     async def set_up(self):
@@ -170,8 +437,56 @@ class AnalyticsClicksTestCase(AnalyticsSetupMixin, BaseTestCase):
             datetime(2014, 5, 5, 9)
         ]
         async with self.test_db_eng.acquire() as conn:
-            for date in date_range:
-                await conn.execute(insert(clicks).values(placement_id=self.p_id, registered_at=date))
+            await write_events(conn, EventTypes.CLICK, [
+                {'placement_id': self.p_id, 'registered_at': date} for date in date_range
+            ])
+
+    @unittest_run_loop
+    async def test_order_clicks_etag_is_not_honored_for_foreign_user(self):
+        url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS, parts={'order_id': self.order_id})
+        response = await self.client.get(url, headers=self.provider_headers)
+        etag = response.headers['ETag']
+        await response.release()
+
+        signup_url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(signup_url, data=json.dumps({'email': 'foreign@yandex.ru',
+                                                                       'password': 'homm1994'}))
+        headers = {settings.JWT_HEADER: (await response.json())['token'], 'If-None-Match': etag}
+        await response.release()
+
+        response = await self.client.get(url, headers=headers)
+        assert response.status == StatusCodes.FORBIDDEN
+        await response.release()
+
+    @unittest_run_loop
+    async def test_clicks_are_rolled_up_per_grain(self):
+        async with self.test_db_eng.acquire() as conn:
+            for grain in TimeBuckets.as_choices():
+                count = await conn.scalar(select([func.sum(clicks_rollups.c.count)])
+                                          .where(clicks_rollups.c.grain == grain))
+                assert count == 11
+
+    @unittest_run_loop
+    async def test_order_year_clicks_returns_304_until_click(self):
+        url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS, parts={'order_id': self.order_id})
+        response = await self.client.get(url, headers=self.provider_headers)
+        assert response.status == StatusCodes.OK
+        etag = response.headers['ETag']
+        await response.release()
+        assert etag.startswith('W/')
+
+        headers = dict(self.provider_headers, **{'If-None-Match': etag})
+        response = await self.client.get(url, headers=headers)
+        assert response.status == StatusCodes.NOT_MODIFIED
+        await response.release()
+
+        async with self.test_db_eng.acquire() as conn:
+            await write_events(conn, EventTypes.CLICK, [{'placement_id': self.p_id, 'registered_at': self.now}])
+
+        response = await self.client.get(url, headers=headers)
+        assert response.status == StatusCodes.OK
+        assert response.headers['ETag'] != etag
+        await response.release()
 
     @unittest_run_loop
     async def test_order_year_clicks_returns_default_year_data(self):
@@ -186,6 +501,31 @@ class AnalyticsClicksTestCase(AnalyticsSetupMixin, BaseTestCase):
         assert body[1]['value'] == 1
         assert body[self.now.month - 1]['value'] == 6
 
+    @unittest_run_loop
+    async def test_order_year_clicks_returns_zeros_for_year_without_clicks(self):
+        url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS,
+                               parts={'order_id': self.order_id},
+                               query={'year': 2010})
+        response = await self.client.get(url, headers=self.provider_headers)
+
+        assert response.status == StatusCodes.OK
+        body = await response.json()
+        await response.release()
+
+        assert len(body) == 12
+        assert all(item['value'] == 0 for item in body)
+
+    @unittest_run_loop
+    async def test_order_year_clicks_returns_400_for_non_existent_order(self):
+        url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS, parts={'order_id': self.order_id + 1})
+        response = await self.client.get(url, headers=self.provider_headers)
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        body = await response.json()
+        await response.release()
+
+        self.check_error_response_body(body, ApiErrorCodes.AD_ORDER_DOES_NOT_EXIST, 'order_id')
+
     @unittest_run_loop
     async def test_order_year_clicks_returns_paramed_year(self):
         url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS,
@@ -336,6 +676,69 @@ class AnalyticsClicksTestCase(AnalyticsSetupMixin, BaseTestCase):
         assert body[9]['value'] == 1
 
 
+class CachedAnalyticsTestCase(AnalyticsSetupMixin, BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        self.clock = 0.0
+        return {'analytics_cache': LRUCache(max_entries=100, timer=lambda: self.clock)}
+
+    async def write_click(self, registered_at):
+        async with self.test_db_eng.acquire() as conn:
+            await write_events(conn, EventTypes.CLICK, [{'placement_id': self.p_id, 'registered_at': registered_at}])
+
+    async def get_year_clicks(self, year, headers):
+        url = self.app.get_url(EndpointsMapper.AD_ORDER_YEAR_CLICKS,
+                               parts={'order_id': self.order_id},
+                               query={'year': year})
+        response = await self.client.get(url, headers=headers)
+        body = await response.json()
+        await response.release()
+        return response.status, body
+
+    @unittest_run_loop
+    async def test_closed_period_is_cached(self):
+        await self.write_click(datetime(2015, 3, 3, 10))
+        status, body = await self.get_year_clicks(2015, self.provider_headers)
+        assert status == StatusCodes.OK
+        assert body[2]['value'] == 1
+
+        await self.write_click(datetime(2015, 3, 4, 10))
+        status, body = await self.get_year_clicks(2015, self.provider_headers)
+        assert status == StatusCodes.OK
+        assert body[2]['value'] == 1
+        assert self.app.analytics_cache.hits == 1
+        assert self.app.analytics_cache.misses == 1
+
+    @unittest_run_loop
+    async def test_closed_period_expires(self):
+        await self.write_click(datetime(2015, 3, 3, 10))
+        status, body = await self.get_year_clicks(2015, self.provider_headers)
+        assert body[2]['value'] == 1
+
+        await self.write_click(datetime(2015, 3, 4, 10))
+        self.clock += settings.ANALYTICS_CACHE_CLOSED_PERIOD_TTL
+        status, body = await self.get_year_clicks(2015, self.provider_headers)
+        assert status == StatusCodes.OK
+        assert body[2]['value'] == 2
+
+    @unittest_run_loop
+    async def test_ownership_is_checked_for_cached_period(self):
+        status, _ = await self.get_year_clicks(2015, self.provider_headers)
+        assert status == StatusCodes.OK
+
+        data = {
+            'email': 'popow.andrej2007@yandex.ru',
+            'password': 'homm1994'
+        }
+        response = await self.client.post(self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP), data=json.dumps(data))
+        headers = {settings.JWT_HEADER: (await response.json())['token']}
+        await response.release()
+
+        status, body = await self.get_year_clicks(2015, headers)
+        assert status == StatusCodes.FORBIDDEN
+        self.check_error_response_body(body, ApiErrorCodes.ATTEMPT_TO_GET_FOREIGN_CLICKS_DATA)
+
+
 class AnalyticsViewsTestCase(AnalyticsSetupMixin, BaseTestCase):
 
     async def set_up(self):
@@ -356,8 +759,9 @@ class AnalyticsViewsTestCase(AnalyticsSetupMixin, BaseTestCase):
             datetime(2014, 5, 5, 9)
         ]
         async with self.test_db_eng.acquire() as conn:
-            for date in date_range:
-                await conn.execute(insert(views).values(placement_id=self.p_id, registered_at=date))
+            await write_events(conn, EventTypes.VIEW, [
+                {'placement_id': self.p_id, 'registered_at': date} for date in date_range
+            ])
 
     @unittest_run_loop
     async def test_order_year_views_returns_default_year_data(self):
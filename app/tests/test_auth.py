@@ -1,9 +1,10 @@
 import json
 import jwt
 from aiohttp.test_utils import unittest_run_loop
-from sqlalchemy import select
+from sqlalchemy import select, update
 from extensions.testing import BaseTestCase
 from extensions.http import StatusCodes
+from extensions.principals import PrincipalCache
 from extensions.user_model import UserTypes
 from settings import settings
 from constants import ApiErrorCodes, UserTypes
@@ -316,3 +317,64 @@ class GetAccountDataTestCase(BaseTestCase):
         await response.release()
 
         self.check_error_response_body(body, ApiErrorCodes.AUTH_TOKEN_IS_INVALID, 'token')
+
+
+class CachedPrincipalTestCase(BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        self.clock = 0.0
+        return {'principal_cache': PrincipalCache(db=db, ttl=60, max_entries=100, timer=lambda: self.clock)}
+
+    async def get_account_data(self, token):
+        response = await self.client.get(self.app.get_url(EndpointsMapper.USER_DATA),
+                                         headers={settings.JWT_HEADER: token})
+        assert response.status == StatusCodes.OK
+        body = await response.json()
+        await response.release()
+        return body
+
+    @unittest_run_loop
+    async def test_user_is_loaded_once_until_invalidated(self):
+        signup_data = {
+            'email': 'valid@email.com',
+            'password': 'somepassword'
+        }
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps(signup_data))
+        token = (await response.json())['token']
+        await response.release()
+        payload = jwt.decode(token, key=settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+
+        assert (await self.get_account_data(token))['email'] == signup_data['email']
+
+        async with self.test_db_eng.acquire() as conn:
+            await conn.execute(update(users).where(users.c.email == signup_data['email'])
+                               .values(email='another@email.com'))
+
+        assert (await self.get_account_data(token))['email'] == signup_data['email']
+        assert self.app.principal_cache.stats()['hits'] == 1
+
+        self.app.principal_cache.invalidate(payload['type'], payload['user_id'])
+        assert (await self.get_account_data(token))['email'] == 'another@email.com'
+
+    @unittest_run_loop
+    async def test_locked_provider_is_picked_up_after_ttl(self):
+        signup_data = {
+            'email': 'valid@email.com',
+            'password': 'somepassword'
+        }
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps(signup_data))
+        token = (await response.json())['token']
+        await response.release()
+
+        assert not (await self.get_account_data(token))['is_locked']
+
+        async with self.test_db_eng.acquire() as conn:
+            await conn.execute(update(ad_providers).values(is_locked=True))
+
+        self.clock = 59.0
+        assert not (await self.get_account_data(token))['is_locked']
+
+        self.clock = 61.0
+        assert (await self.get_account_data(token))['is_locked']
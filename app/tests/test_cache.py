@@ -0,0 +1,63 @@
+from unittest import TestCase
+from extensions.cache import LRUCache
+
+
+class Timer:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(TestCase):
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert cache.evictions == 1
+
+    def test_expires_entries_with_ttl(self):
+        timer = Timer()
+        cache = LRUCache(max_entries=10, timer=timer)
+        cache.set('open', 1, ttl=5)
+        cache.set('closed', 2)
+
+        timer.now = 10.0
+
+        assert cache.get('open') is None
+        assert cache.get('closed') == 2
+        assert cache.expirations == 1
+        assert len(cache) == 1
+
+    def test_keeps_estimated_size_under_memory_cap(self):
+        cache = LRUCache(max_entries=10, max_bytes=100, get_size=lambda value: len(value))
+        cache.set('a', 'x' * 40)
+        cache.set('b', 'x' * 40)
+        cache.set('too large', 'x' * 200)
+
+        assert cache.size_bytes <= 100
+        assert 'too large' not in cache
+        assert 'b' in cache
+
+        cache.invalidate('b')
+        assert 'b' not in cache
+
+    def test_counts_hits_and_misses(self):
+        cache = LRUCache(max_entries=10)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
@@ -0,0 +1,26 @@
+from unittest import TestCase
+from extensions.codecs import get_available_codecs, get_codec, InvalidJSON, StdlibCodec
+
+
+class CodecsTestCase(TestCase):
+
+    def test_codecs_round_trip_to_bytes(self):
+        data = {'label': 1, 'value': [1.5, 'https://link.com/ü', None, True], 'nested': {'a': []}}
+        for codec in get_available_codecs():
+            encoded = codec.dumps(data)
+
+            assert isinstance(encoded, bytes)
+            assert codec.loads(encoded) == data
+            assert StdlibCodec().loads(encoded) == data
+
+    def test_codecs_raise_invalid_json(self):
+        for codec in get_available_codecs():
+            for data in (b'', b'{invalid', b'\xff'):
+                with self.assertRaises(InvalidJSON):
+                    codec.loads(data)
+
+    def test_falls_back_to_stdlib(self):
+        assert get_available_codecs()[-1].name == 'json'
+        assert get_codec('json').name == 'json'
+        with self.assertRaises(ValueError):
+            get_codec('unknown')
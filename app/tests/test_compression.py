@@ -0,0 +1,109 @@
+import json
+import jwt
+from unittest import TestCase
+from unittest.mock import patch
+from sqlalchemy import insert, select
+from aiohttp.web import Response
+from aiohttp.test_utils import unittest_run_loop
+from extensions.testing import BaseTestCase
+from extensions.http import StatusCodes
+from extensions.compression import choose_encoding, add_vary, GZIP
+from routes import EndpointsMapper
+from settings import settings
+from data_access.auth import ad_providers
+from data_access.advert_orders import advert_orders
+
+
+class AcceptEncodingTestCase(TestCase):
+
+    def test_chooses_gzip_when_accepted(self):
+        with patch('extensions.compression.brotli', None):
+            assert choose_encoding('deflate, gzip') == GZIP
+            assert choose_encoding('*') == GZIP
+            assert choose_encoding('deflate') is None
+            assert choose_encoding('') is None
+
+    def test_wildcard_does_not_override_refused_coding(self):
+        with patch('extensions.compression.brotli', None):
+            assert choose_encoding('gzip;q=0, *') is None
+            assert choose_encoding('*;q=0, gzip') == GZIP
+
+
+class VaryTestCase(TestCase):
+
+    def test_appends_to_existing_vary(self):
+        response = Response(headers={'Vary': 'Origin'})
+        add_vary(response, 'Accept-Encoding')
+        assert response.headers['Vary'] == 'Origin, Accept-Encoding'
+
+        add_vary(response, 'Accept-Encoding')
+        assert response.headers['Vary'] == 'Origin, Accept-Encoding'
+
+
+class CompressionMiddlewareTestCase(BaseTestCase):
+
+    async def set_up(self):
+        data = {
+            'email': 'popow.andrej2008@yandex.ru',
+            'password': 'homm1994'
+        }
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps(data))
+        self.headers = {settings.JWT_HEADER: (await response.json())['token']}
+        await response.release()
+
+        user_id = jwt.decode(self.headers[settings.JWT_HEADER], key=settings.JWT_SECRET,
+                             algorithms=[settings.JWT_ALGORITHM])['user_id']
+        async with self.test_db_eng.acquire() as conn:
+            owner_id = await conn.scalar(select([ad_providers.c.id]).where(ad_providers.c.user_id == user_id))
+            for i in range(20):
+                await conn.execute(insert(advert_orders).values(
+                    follow_url_link='https://link{}.com'.format(i),
+                    description='Long description of the advert order. ' * 20,
+                    owner_id=owner_id
+                ))
+
+    @unittest_run_loop
+    async def test_compresses_large_responses(self):
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        response = await self.client.get(url, headers=dict(self.headers, **{'Accept-Encoding': 'gzip'}))
+
+        assert response.status == StatusCodes.OK
+        assert response.headers.get('Content-Encoding') == GZIP
+        assert 'Accept-Encoding' in response.headers.get('Vary', '')
+        body = await response.json()
+        await response.release()
+        assert len(body) == 20
+
+    @unittest_run_loop
+    async def test_compresses_streamed_lists(self):
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        with patch.object(settings, 'STREAM_LIST_RESPONSES', True):
+            response = await self.client.get(url, headers=dict(self.headers, **{'Accept-Encoding': 'gzip'}))
+
+            assert response.status == StatusCodes.OK
+            assert response.headers.get('Transfer-Encoding') == 'chunked'
+            assert response.headers.get('Content-Encoding') == GZIP
+            assert 'Accept-Encoding' in response.headers.get('Vary', '')
+            body = await response.json()
+            await response.release()
+
+        assert len(body) == 20
+
+    @unittest_run_loop
+    async def test_sends_identity_when_compression_is_not_accepted(self):
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        response = await self.client.get(url, headers=dict(self.headers, **{'Accept-Encoding': 'identity'}))
+
+        assert 'Content-Encoding' not in response.headers
+        await response.release()
+
+    @unittest_run_loop
+    async def test_does_not_compress_ingest_responses(self):
+        url = self.app.get_url(EndpointsMapper.VIEWS)
+        with patch.object(settings, 'COMPRESSION_MIN_SIZE', 0):
+            response = await self.client.post(url, data=json.dumps({}), headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status == StatusCodes.BAD_REQUEST
+        assert 'Content-Encoding' not in response.headers
+        await response.release()
@@ -0,0 +1,73 @@
+import json
+from unittest.mock import patch
+from aiohttp.test_utils import unittest_run_loop
+from extensions.testing import BaseTestCase
+from extensions.http import StatusCodes
+from extensions.db import RequestConnection
+from routes import EndpointsMapper
+from settings import settings
+
+
+class RequestConnectionTestCase(BaseTestCase):
+
+    @unittest_run_loop
+    async def test_checks_out_one_connection(self):
+        free_size = self.test_db_eng.freesize
+        db = RequestConnection(self.test_db_eng)
+
+        async with db.acquire() as conn:
+            assert await conn.scalar('SELECT 1') == 1
+        same_conn = await db.acquire()
+        db.release(same_conn)
+
+        assert same_conn is conn
+        assert db.checkouts == 1
+        assert db.uses == 2
+
+        await db.close()
+        assert self.test_db_eng.freesize >= free_size
+
+    @unittest_run_loop
+    async def test_request_queries_share_one_checkout(self):
+        response = await self.client.post(self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP),
+                                          data=json.dumps({'email': 'a@b.com', 'password': 'homm1994'}))
+        headers = {settings.JWT_HEADER: (await response.json())['token']}
+        await response.release()
+
+        connections = []
+
+        class RecordingRequestConnection(RequestConnection):
+            def __init__(self, engine):
+                super().__init__(engine)
+                connections.append(self)
+
+        in_use = self.test_db_eng.size - self.test_db_eng.freesize
+        with patch.object(settings, 'REQUEST_SCOPED_CONNECTION', True), \
+                patch('middlewares.RequestConnection', RecordingRequestConnection):
+            # the user is loaded by the auth middleware and the orders by the handler
+            response = await self.client.get(self.app.get_url(EndpointsMapper.ADVERT_ORDERS), headers=headers)
+            assert response.status == StatusCodes.OK
+            await response.release()
+
+        assert len(connections) == 1
+        assert connections[0].checkouts == 1
+        assert connections[0].uses == 2
+        assert self.test_db_eng.size - self.test_db_eng.freesize == in_use
+
+    @unittest_run_loop
+    async def test_serves_requests_with_scoped_connection(self):
+        with patch.object(settings, 'REQUEST_SCOPED_CONNECTION', True):
+            data = {
+                'email': 'popow.andrej2009@yandex.ru',
+                'password': 'homm1994'
+            }
+            response = await self.client.post(self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP),
+                                              data=json.dumps(data))
+            assert response.status == StatusCodes.CREATED
+            headers = {settings.JWT_HEADER: (await response.json())['token']}
+            await response.release()
+
+            response = await self.client.get(self.app.get_url(EndpointsMapper.ADVERT_ORDERS), headers=headers)
+            assert response.status == StatusCodes.OK
+            assert await response.json() == []
+            await response.release()
@@ -0,0 +1,110 @@
+import unittest
+from datetime import date, datetime
+from psycopg2 import IntegrityError
+from aiohttp.test_utils import unittest_run_loop
+from sqlalchemy import insert, select
+from extensions.testing import BaseTestCase
+from extensions.engines import AsyncpgDialect, ASYNCPG, get_bind_args, create_engine, asyncpg
+from extensions.db import DatabaseErrors
+from settings import settings
+from constants import TimeBuckets
+from extensions.ingest import write_events
+from extensions.partitions import ensure_partitions
+from constants import EventTypes
+from data_access.auth import users, ad_providers, ad_placers
+from data_access.advert_orders import advert_orders
+from data_access.placements import placements, PlacementsQueryFactory as PlacementsQF
+from data_access.rollups import clicks_rollups
+from data_access.partitions import PartitionsQueryFactory as PartitionsQF, add_months, get_partition_name
+
+
+class AsyncpgDialectTestCase(unittest.TestCase):
+
+    def test_compiles_numbered_params(self):
+        query = PlacementsQF.get_owned_grouped_clicks('5', datetime(2016, 1, 1), datetime(2017, 1, 1),
+                                                      TimeBuckets.MONTH)
+        compiled = query.compile(dialect=AsyncpgDialect())
+        args = get_bind_args(compiled)
+
+        assert '${}'.format(len(args)) in compiled.string
+        assert '%(' not in compiled.string
+        assert args.count(5) == 2
+        assert TimeBuckets.MONTH in args
+
+
+@unittest.skipIf(asyncpg is None, 'asyncpg is not installed')
+class AsyncpgEngineTestCase(BaseTestCase):
+
+    async def create_asyncpg_engine(self):
+        return await create_engine(user=settings.TEST_DB_USER, database=settings.TEST_DB_NAME,
+                                   host=settings.TEST_DB_HOST, password=settings.TEST_DB_PASS,
+                                   loop=self.loop, backend=ASYNCPG, minsize=1, maxsize=2)
+
+    @unittest_run_loop
+    async def test_runs_core_statements(self):
+        db = await self.create_asyncpg_engine()
+        try:
+            async with db.acquire() as conn:
+                trans = await conn.begin()
+                user_id = await conn.scalar(insert(users).values(email='a@b.com', hashed_password='x'))
+                await trans.commit()
+
+                rp = await conn.execute(users.select().where(users.c.id == str(user_id)))
+                row = await rp.first()
+                assert row.email == 'a@b.com'
+                assert row['id'] == user_id
+
+                with self.assertRaises(IntegrityError) as cm:
+                    await conn.execute(insert(users).values(email='a@b.com', hashed_password='x'))
+                assert int(cm.exception.pgcode) == DatabaseErrors.UNIQUE_VIOLATION
+            assert db.freesize == db.maxsize
+        finally:
+            db.close()
+            await db.wait_closed()
+
+    async def create_placement(self) -> int:
+        async with self.test_db_eng.acquire() as conn:
+            user_id = await conn.scalar(insert(users).values(email='a@b.com', hashed_password='x'))
+            provider_id = await conn.scalar(insert(ad_providers).values(user_id=user_id))
+            placer_id = await conn.scalar(insert(ad_placers).values(user_id=user_id, website='http://a.com',
+                                                                    visitors_per_day_count=1))
+            order_id = await conn.scalar(insert(advert_orders).values(follow_url_link='http://a.com',
+                                                                      description='a', owner_id=provider_id))
+            return await conn.scalar(insert(placements).values(placer_id=placer_id, order_id=order_id))
+
+    @unittest_run_loop
+    async def test_writes_events(self):
+        placement_id = await self.create_placement()
+        events = [{'placement_id': placement_id, 'registered_at': datetime(2016, 5, 5, 10)},
+                  {'placement_id': placement_id, 'registered_at': datetime(2016, 5, 6, 11)},
+                  {'placement_id': placement_id + 1, 'registered_at': datetime(2016, 5, 6, 11)}]
+        db = await self.create_asyncpg_engine()
+        try:
+            async with db.acquire() as conn:
+                assert await write_events(conn, EventTypes.CLICK, events) == 2
+        finally:
+            db.close()
+            await db.wait_closed()
+
+        async with self.test_db_eng.acquire() as conn:
+            assert await conn.scalar(select([placements.c.clicks_count])) == 2
+            assert await conn.scalar(select([advert_orders.c.clicks_count])) == 2
+            rp = await conn.execute(select([clicks_rollups.c.count])
+                                    .where(clicks_rollups.c.grain == TimeBuckets.MONTH))
+            assert [row.count for row in await rp.fetchall()] == [2]
+
+    @unittest_run_loop
+    async def test_ensures_partitions(self):
+        db = await self.create_asyncpg_engine()
+        try:
+            await ensure_partitions(db, months_ahead=1)
+            async with db.acquire() as conn:
+                rp = await conn.execute(PartitionsQF.get_partitions('clicks'))
+                names = {row.name for row in await rp.fetchall()}
+        finally:
+            db.close()
+            await db.wait_closed()
+
+        this_month = date.today().replace(day=1)
+        assert get_partition_name('clicks', this_month) in names
+        assert get_partition_name('clicks', add_months(this_month, 1)) in names
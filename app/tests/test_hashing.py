@@ -0,0 +1,35 @@
+import time
+import asyncio
+from unittest import TestCase
+from extensions.hashing import HashingExecutor
+from exceptions.auth import PasswordHashingIsOverloaded
+
+
+class HashingExecutorTestCase(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.executor = HashingExecutor(loop=self.loop, workers=1, max_pending=2)
+
+    def tearDown(self):
+        self.executor.close()
+        self.loop.close()
+
+    def test_rejects_hashings_over_the_limit(self):
+        def slow_hash(value):
+            time.sleep(0.05)
+            return value
+
+        results = self.loop.run_until_complete(asyncio.gather(
+            *[self.executor.run(slow_hash, i) for i in range(3)], return_exceptions=True
+        ))
+
+        assert results[:2] == [0, 1]
+        assert isinstance(results[2], PasswordHashingIsOverloaded)
+
+        stats = self.executor.stats()
+        assert stats['hashed'] == 2
+        assert stats['rejected'] == 1
+        assert stats['pending'] == 0
+        assert stats['max_latency'] >= 0.05
@@ -0,0 +1,93 @@
+import unittest
+from aiohttp.test_utils import unittest_run_loop
+from settings import settings
+from extensions.http import StatusCodes
+from extensions.testing import BaseTestCase
+from extensions.metrics import Registry, Gauge, AppMetrics
+from routes import EndpointsMapper
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def test_renders_counters_and_gauges(self):
+        registry = Registry()
+        responses = registry.counter('responses_total', 'Responses.', ('route', 'status'))
+        in_flight = registry.gauge('in_flight', 'Requests in flight.')
+        responses.inc('login', '200')
+        responses.inc('login', '200')
+        responses.inc('say "hi"', '500')
+        in_flight.inc()
+
+        lines = registry.render().splitlines()
+        assert '# TYPE responses_total counter' in lines
+        assert 'responses_total{route="login",status="200"} 2' in lines
+        assert 'responses_total{route="say \\"hi\\"",status="500"} 1' in lines
+        assert 'in_flight 1' in lines
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        latency = registry.histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, 'login')
+
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{route="login",le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{route="login",le="1.0"} 3' in lines
+        assert 'latency_seconds_bucket{route="login",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{route="login"} 4' in lines
+        assert 'latency_seconds_sum{route="login"} 3.65' in lines
+
+    def test_collectors_are_called_on_render(self):
+        registry = Registry()
+        depth = []
+        registry.add_collector(lambda: depth)
+        assert registry.render() == '\n'
+
+        gauge = Gauge('depth', 'Depth.')
+        gauge.set(7)
+        depth.append(gauge)
+        assert 'depth 7' in registry.render().splitlines()
+
+
+class MetricsEndpointTestCase(BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        return {'metrics': AppMetrics()}
+
+    @unittest_run_loop
+    async def test_serves_request_metrics(self):
+        response = await self.client.get(self.app.get_url(EndpointsMapper.USER_DATA),
+                                         headers={settings.JWT_HEADER: 'invalid'})
+        await response.release()
+
+        response = await self.client.get(self.app.get_url(EndpointsMapper.METRICS))
+        assert response.status == StatusCodes.OK
+        assert response.headers['Content-Type'].startswith('text/plain')
+        lines = (await response.text()).splitlines()
+
+        assert 'http_responses_total{route="user-data",method="GET",status="400"} 1' in lines
+        assert 'http_request_duration_seconds_count{route="user-data",method="GET"} 1' in lines
+        assert 'http_requests_in_flight{route="metrics"} 1' in lines
+        assert 'db_pool_max_connections{pool="primary"} 10' in lines
+
+    @unittest_run_loop
+    async def test_labels_unknown_methods_as_other(self):
+        response = await self.client.request('PURGE', self.app.get_url(EndpointsMapper.USER_DATA))
+        await response.release()
+
+        response = await self.client.get(self.app.get_url(EndpointsMapper.METRICS))
+        lines = (await response.text()).splitlines()
+
+        assert 'http_request_duration_seconds_count{route="unmatched",method="other"} 1' in lines
+
+
+class RestrictedMetricsEndpointTestCase(BaseTestCase):
+
+    def get_app_kwargs(self, db, loop):
+        return {'metrics': AppMetrics(allowed_networks=('10.0.0.0/8',))}
+
+    @unittest_run_loop
+    async def test_returns_404_outside_allowed_networks(self):
+        response = await self.client.get(self.app.get_url(EndpointsMapper.METRICS))
+        assert response.status == StatusCodes.NOT_FOUND
+        await response.release()
@@ -0,0 +1,75 @@
+from datetime import date
+from unittest import TestCase
+from sqlalchemy import text
+from aiohttp.test_utils import unittest_run_loop
+from extensions.testing import BaseTestCase
+from extensions.partitions import ensure_partitions
+from data_access.partitions import PartitionsQueryFactory as PartitionsQF, add_months, get_partition_name, \
+    parse_partition_month
+
+
+class PartitionNamesTestCase(TestCase):
+
+    def test_add_months_crosses_year_boundary(self):
+        assert add_months(date(2016, 11, 1), 3) == date(2017, 2, 1)
+        assert add_months(date(2016, 1, 1), -1) == date(2015, 12, 1)
+
+    def test_partition_name_is_parsed_back(self):
+        name = get_partition_name('clicks', date(2016, 3, 1))
+
+        assert name == 'clicks_y2016m03'
+        assert parse_partition_month('clicks', name) == date(2016, 3, 1)
+        assert parse_partition_month('views', name) is None
+        assert parse_partition_month('clicks', 'clicks_default') is None
+
+
+class EnsurePartitionsTestCase(BaseTestCase):
+
+    @unittest_run_loop
+    async def test_creates_upcoming_partitions(self):
+        await ensure_partitions(self.test_db_eng, months_ahead=2)
+
+        async with self.test_db_eng.acquire() as conn:
+            rp = await conn.execute(PartitionsQF.get_partitions('views'))
+            names = {row.name for row in await rp.fetchall()}
+
+        this_month = date.today().replace(day=1)
+        for i in range(3):
+            assert get_partition_name('views', add_months(this_month, i)) in names
+        assert 'views_default' in names
+
+    @unittest_run_loop
+    async def test_is_idempotent(self):
+        await ensure_partitions(self.test_db_eng, months_ahead=1)
+        assert await ensure_partitions(self.test_db_eng, months_ahead=1) == []
+
+    @unittest_run_loop
+    async def test_skips_month_held_by_default_partition(self):
+        month = add_months(date.today().replace(day=1), 120)
+        async with self.test_db_eng.acquire() as conn:
+            await conn.execute(text("""
+                INSERT INTO users (email, hashed_password) VALUES ('placer@example.com', 'hash'),
+                    ('owner@example.com', 'hash');
+                INSERT INTO ad_placers (user_id, website, visitors_per_day_count)
+                SELECT id, 'http://site.com', 100 FROM users WHERE email = 'placer@example.com';
+                INSERT INTO ad_providers (user_id) SELECT id FROM users WHERE email = 'owner@example.com';
+                INSERT INTO advert_orders (follow_url_link, description, owner_id)
+                SELECT 'http://order.com', 'description', id FROM ad_providers;
+                INSERT INTO placements (placer_id, order_id)
+                SELECT ad_placers.id, advert_orders.id FROM ad_placers, advert_orders;
+            """))
+            await conn.execute(text("""
+                INSERT INTO views (placement_id, registered_at) SELECT id, :registered_at FROM placements
+            """).bindparams(registered_at=month))
+
+        await ensure_partitions(self.test_db_eng, months_ahead=1, today=month)
+
+        async with self.test_db_eng.acquire() as conn:
+            rp = await conn.execute(PartitionsQF.get_partitions('views'))
+            views_names = {row.name for row in await rp.fetchall()}
+            rp = await conn.execute(PartitionsQF.get_partitions('clicks'))
+            clicks_names = {row.name for row in await rp.fetchall()}
+
+        assert get_partition_name('views', month) not in views_names
+        assert get_partition_name('views', add_months(month, 1)) in views_names
+        assert get_partition_name('clicks', month) in clicks_names
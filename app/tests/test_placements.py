@@ -1,12 +1,18 @@
 import json
-from sqlalchemy import select, exists
+from datetime import datetime
+from sqlalchemy import select, exists, update, func
 from aiohttp.test_utils import unittest_run_loop
 from extensions.testing import BaseTestCase
 from extensions.http import StatusCodes
 from routes import EndpointsMapper
 from settings import settings
-from constants import ApiErrorCodes, INVALID_ID
-from data_access.placements import placements
+from constants import ApiErrorCodes, EventTypes, TimeBuckets, INVALID_ID
+from extensions.ingest import write_events
+from extensions.counters import CounterFolder
+from data_access.placements import placements, PlacementsQueryFactory as PlacementsQF
+from data_access.counters import CountersQueryFactory as CountersQF
+from data_access.rollups import clicks_rollups, RollupsQueryFactory as RollupsQF
+from data_access.advert_orders import AdvertOrdersQueryFactory as AdvertOrdersQF
 
 
 class GetPlacementsTestCase(BaseTestCase):
@@ -90,6 +96,68 @@ class GetPlacementsTestCase(BaseTestCase):
 
         assert len(body) == 0
 
+    @unittest_run_loop
+    async def test_counts_clicks_and_views_independently(self):
+        now = datetime.now()
+        async with self.test_db_eng.acquire() as conn:
+            await write_events(conn, EventTypes.CLICK, [{'placement_id': self.p_id, 'registered_at': now}] * 2)
+            await write_events(conn, EventTypes.VIEW, [{'placement_id': self.p_id, 'registered_at': now}] * 3)
+            order_data = await (await conn.execute(AdvertOrdersQF.get_advert_order_by_id(self.order_id))).first()
+
+        url = self.app.get_url(EndpointsMapper.PLACEMENTS)
+        response = await self.client.get(url, headers=self.headers)
+        body = await response.json()
+        await response.release()
+
+        assert body[0]['clicks'] == 2
+        assert body[0]['views'] == 3
+        assert order_data.clicks == 2
+        assert order_data.views == 3
+
+    @unittest_run_loop
+    async def test_reconciliation_repairs_drifted_counters(self):
+        async with self.test_db_eng.acquire() as conn:
+            await write_events(conn, EventTypes.CLICK, [{'placement_id': self.p_id, 'registered_at': datetime.now()}])
+            await conn.execute(update(placements).values(clicks_count=100).where(placements.c.id == self.p_id))
+
+            trans = await conn.begin()
+            for statement in CountersQF.reconcile(EventTypes.CLICK):
+                await conn.execute(statement)
+            await trans.commit()
+
+            p_data = await (await conn.execute(PlacementsQF.get_placement(self.p_id))).first()
+            order_data = await (await conn.execute(AdvertOrdersQF.get_advert_order_by_id(self.order_id))).first()
+
+        assert p_data.clicks == 1
+        assert order_data.clicks == 1
+
+    @unittest_run_loop
+    async def test_reconciliation_leaves_uncounted_events_to_folder(self):
+        async with self.test_db_eng.acquire() as conn:
+            await write_events(conn, EventTypes.CLICK, [{'placement_id': self.p_id, 'registered_at': datetime.now()}])
+            await write_events(conn, EventTypes.CLICK, [
+                {'placement_id': self.p_id, 'registered_at': datetime.now()}
+            ] * 2, defer_counts=True)
+
+            trans = await conn.begin()
+            for statement in CountersQF.reconcile(EventTypes.CLICK) + RollupsQF.rebuild(EventTypes.CLICK):
+                await conn.execute(statement)
+            await trans.commit()
+
+        folder = CounterFolder(db=self.test_db_eng, loop=self.loop, interval=60, batch_size=10)
+        await folder.fold_all()
+
+        async with self.test_db_eng.acquire() as conn:
+            p_data = await (await conn.execute(PlacementsQF.get_placement(self.p_id))).first()
+            order_data = await (await conn.execute(AdvertOrdersQF.get_advert_order_by_id(self.order_id))).first()
+            rolled_up = await conn.scalar(select([func.sum(clicks_rollups.c.count)])
+                                          .where(clicks_rollups.c.grain == TimeBuckets.MONTH))
+
+        assert folder.folded_events == 2
+        assert p_data.clicks == 3
+        assert order_data.clicks == 3
+        assert rolled_up == 3
+
     @unittest_run_loop
     async def test_returns_401_to_anon(self):
         response = await self.client.get(self.app.get_url(EndpointsMapper.PLACEMENTS))
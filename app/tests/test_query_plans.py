@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from aiohttp.test_utils import unittest_run_loop
+from extensions.testing import BaseTestCase
+from constants import EventTypes, TimeBuckets
+from data_access.advert_orders import AdvertOrdersQueryFactory as AdvertOrdersQF
+from data_access.placements import PlacementsQueryFactory as PlacementsQF
+from data_access.rollups import RollupsQueryFactory as RollupsQF, get_rollup_counts
+
+
+# a sequential scan is only reported for relations with more rows than this
+LARGE_RELATION_ROWS = 1000
+
+
+class QueryPlansTestCase(BaseTestCase):
+    """
+    Runs `EXPLAIN` on the hot queries over a seeded dataset and fails if any of them scans a large relation
+    sequentially, which means an index the query relies on is missing or can't be used.
+    """
+
+    async def set_up(self):
+        async with self.test_db_eng.acquire() as conn:
+            await conn.execute(text("""
+                INSERT INTO users (email, hashed_password)
+                SELECT 'plans-' || i || '@example.com', 'hash' FROM generate_series(1, 200) AS i;
+
+                INSERT INTO ad_providers (user_id)
+                SELECT id FROM users WHERE email LIKE 'plans-%' ORDER BY id LIMIT 100;
+
+                INSERT INTO ad_placers (user_id, website, visitors_per_day_count)
+                SELECT id, 'http://site' || id || '.com', 100
+                FROM users WHERE email LIKE 'plans-%' ORDER BY id OFFSET 100;
+
+                INSERT INTO advert_orders (follow_url_link, description, owner_id)
+                SELECT 'http://order' || ad_providers.id || '-' || i || '.com', 'description', ad_providers.id
+                FROM ad_providers, generate_series(1, 20) AS i;
+
+                INSERT INTO placements (placer_id, order_id)
+                SELECT ad_placers.id, advert_orders.id
+                FROM ad_placers JOIN advert_orders ON advert_orders.id % 100 = ad_placers.id % 100;
+
+                INSERT INTO clicks (placement_id, registered_at)
+                SELECT placements.id, now() - i * interval '29 hours'
+                FROM placements, generate_series(1, 50) AS i;
+
+                INSERT INTO views (placement_id, registered_at)
+                SELECT placements.id, now() - i * interval '23 hours'
+                FROM placements, generate_series(1, 50) AS i;
+            """))
+
+            trans = await conn.begin()
+            for event_type in EventTypes.as_choices():
+                for statement in RollupsQF.rebuild(event_type):
+                    await conn.execute(statement)
+            await trans.commit()
+
+            await conn.execute('ANALYZE')
+
+            row = await (await conn.execute(text("""
+                SELECT placements.id AS placement_id, placements.placer_id, advert_orders.id AS order_id,
+                       advert_orders.owner_id
+                FROM placements JOIN advert_orders ON advert_orders.id = placements.order_id
+                LIMIT 1
+            """))).first()
+        self.p_id = row.placement_id
+        self.placer_id = row.placer_id
+        self.order_id = row.order_id
+        self.owner_id = row.owner_id
+
+    async def get_plan(self, query) -> dict:
+        compiled = query.compile(dialect=self.test_db_eng.dialect)
+        async with self.test_db_eng.acquire() as conn:
+            rp = await conn.execute('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params)
+            return (await rp.first())[0][0]['Plan']
+
+    def get_seq_scanned_relations(self, plan: dict) -> set:
+        relations = set()
+        if plan['Node Type'] == 'Seq Scan':
+            relations.add(plan['Relation Name'])
+        for child in plan.get('Plans', []):
+            relations |= self.get_seq_scanned_relations(child)
+        return relations
+
+    async def get_large_relations(self, names: set) -> set:
+        if not names:
+            return set()
+        async with self.test_db_eng.acquire() as conn:
+            rp = await conn.execute(text("""
+                SELECT relname FROM pg_class WHERE relname = ANY(:names) AND reltuples > :rows
+            """).bindparams(names=list(names), rows=LARGE_RELATION_ROWS))
+            return {row.relname for row in await rp.fetchall()}
+
+    def get_hot_queries(self) -> dict:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=30)
+        events = [{'placement_id': self.p_id, 'registered_at': end_date}]
+        return {
+            'placements.get_placements': PlacementsQF.get_placements(self.placer_id),
+            'placements.get_placement': PlacementsQF.get_placement(self.p_id),
+            'placements.get_existing_ids': PlacementsQF.get_existing_ids([self.p_id]),
+            'placements.get_placer_id': PlacementsQF.get_placer_id(self.p_id),
+            'placements.get_owned_version': PlacementsQF.get_owned_version(self.p_id, self.placer_id),
+            'placements.get_owned_grouped_clicks': PlacementsQF.get_owned_grouped_clicks(
+                self.p_id, start_date, end_date, TimeBuckets.DAY),
+            'placements.get_owned_grouped_views': PlacementsQF.get_owned_grouped_views(
+                self.p_id, start_date, end_date, TimeBuckets.HOUR),
+            'advert_orders.get_advert_orders': AdvertOrdersQF.get_advert_orders(self.owner_id),
+            'advert_orders.get_advert_order_by_id': AdvertOrdersQF.get_advert_order_by_id(self.order_id),
+            'advert_orders.get_owner_id': AdvertOrdersQF.get_owner_id(self.order_id),
+            'advert_orders.get_owned_version': AdvertOrdersQF.get_owned_version(self.order_id, self.owner_id),
+            'advert_orders.get_owned_grouped_clicks': AdvertOrdersQF.get_owned_grouped_clicks(
+                self.order_id, start_date, end_date, TimeBuckets.DAY),
+            'advert_orders.get_owned_grouped_views': AdvertOrdersQF.get_owned_grouped_views(
+                self.order_id, start_date, end_date, TimeBuckets.MONTH),
+            'rollups.add_counts': RollupsQF.add_counts(EventTypes.CLICK, get_rollup_counts(events)),
+        }
+
+    @unittest_run_loop
+    async def test_hot_queries_do_not_scan_large_relations(self):
+        regressions = {}
+        for name, query in self.get_hot_queries().items():
+            plan = await self.get_plan(query)
+            large_relations = await self.get_large_relations(self.get_seq_scanned_relations(plan))
+            if large_relations:
+                regressions[name] = sorted(large_relations)
+
+        assert not regressions, 'Sequential scans of large relations: {}'.format(regressions)
@@ -0,0 +1,91 @@
+import json
+import jwt
+from sqlalchemy import insert, select, text
+from aiohttp.test_utils import unittest_run_loop
+from settings import settings
+from extensions.http import StatusCodes
+from extensions.testing import BaseTestCase
+from extensions.engines import create_engine
+from extensions.replicas import ReplicaSet
+from routes import EndpointsMapper
+from data_access.auth import users, ad_providers
+from data_access.advert_orders import advert_orders
+
+
+class ReplicaRoutingTestCase(BaseTestCase):
+    """
+    The test database is the primary and `TEST_REPLICA_DB_NAME`, a database with the same schema, stands in
+    for the replica. Rows are written to each of them directly to tell where a read went.
+    """
+
+    def get_app_kwargs(self, db, loop):
+        self.replica_db = loop.run_until_complete(create_engine(
+            user=settings.TEST_DB_USER, database=settings.TEST_REPLICA_DB_NAME,
+            host=settings.TEST_DB_HOST, password=settings.TEST_DB_PASS,
+            loop=loop, minsize=1, maxsize=2
+        ))
+        self.replicas = ReplicaSet([self.replica_db], loop=loop, max_lag=5.0, check_interval=1.0)
+        return {'replicas': self.replicas}
+
+    async def set_up(self):
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps({'email': 'a@b.com', 'password': 'homm1994'}))
+        self.token = (await response.json())['token']
+        owner_id = jwt.decode(self.token, key=settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])['user_id']
+
+        # the user is replicated, so the token is valid on both databases
+        async with self.test_db_eng.acquire() as conn:
+            user_row = await (await conn.execute(select([users]))).first()
+            provider_row = await (await conn.execute(select([ad_providers]))).first()
+        async with self.replica_db.acquire() as conn:
+            await conn.execute(insert(users).values(**dict(user_row)))
+            await conn.execute(insert(ad_providers).values(**dict(provider_row)))
+            await conn.execute(insert(advert_orders).values(
+                follow_url_link='https://replica.com', description='replica', owner_id=owner_id))
+
+    async def tear_down(self):
+        async with self.replica_db.acquire() as conn:
+            await conn.execute(text("""
+                DELETE FROM advert_orders;
+                DELETE FROM ad_providers;
+                DELETE FROM users;
+            """))
+        await self.replicas.close()
+
+    async def get_order_links(self) -> list:
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        response = await self.client.get(url, headers={settings.JWT_HEADER: self.token})
+        assert response.status == StatusCodes.OK
+        body = await response.json()
+        await response.release()
+        return [order['follow_url_link'] for order in body]
+
+    @unittest_run_loop
+    async def test_reads_from_replica_within_lag(self):
+        await self.replicas.check()
+        assert self.replicas.get_lag(self.replica_db) == 0
+
+        assert await self.get_order_links() == ['https://replica.com']
+        assert self.replicas.stats()['reads'] > 0
+
+    @unittest_run_loop
+    async def test_authenticates_user_not_replicated_yet(self):
+        url = self.app.get_url(EndpointsMapper.AD_PROVIDER_SIGNUP)
+        response = await self.client.post(url, data=json.dumps({'email': 'c@d.com', 'password': 'homm1994'}))
+        token = (await response.json())['token']
+        await self.replicas.check()
+
+        url = self.app.get_url(EndpointsMapper.ADVERT_ORDERS)
+        response = await self.client.get(url, headers={settings.JWT_HEADER: token})
+        assert response.status == StatusCodes.OK
+        assert await response.json() == []
+        await response.release()
+
+    @unittest_run_loop
+    async def test_falls_back_to_primary(self):
+        assert await self.get_order_links() == []
+
+        self.replicas.set_lag(self.replica_db, 60.0)
+        assert await self.get_order_links() == []
+        assert self.replicas.stats()['available'] == 0
+        assert self.replicas.stats()['fallbacks'] > 0
@@ -0,0 +1,35 @@
+from datetime import datetime
+from unittest import TestCase
+from extensions.serializers import SchemaPlan
+from benchmarks.serializers import LegacySerializer, nested_orders_schema, generate_nested_rows
+from serialization.advert_orders import list_advert_orders_schema
+
+
+class SchemaPlanTestCase(TestCase):
+
+    def test_flat_schema_matches_legacy_output(self):
+        rows = [
+            {'id': 1, 'heading_picture': 'a', 'follow_url_link': 'b', 'description': 'c', 'clicks': 1, 'views': 2},
+            {'id': 2, 'heading_picture': 'd', 'follow_url_link': 'e', 'description': 'f', 'clicks': 3, 'views': 4},
+            {'id': 1, 'heading_picture': 'a', 'follow_url_link': 'b', 'description': 'c', 'clicks': 1, 'views': 2}
+        ]
+        result = SchemaPlan(list_advert_orders_schema).serialize(rows)
+
+        assert result == LegacySerializer(list_advert_orders_schema).serialize(rows)
+        assert [item['id'] for item in result] == [1, 2]
+
+    def test_nested_schema_matches_legacy_output(self):
+        rows = generate_nested_rows(50, placements_per_order=7)
+        rows.reverse()
+        result = SchemaPlan(nested_orders_schema).serialize(rows)
+
+        assert result == LegacySerializer(nested_orders_schema).serialize(rows)
+        assert len(result) == 8
+        assert [p['id'] for p in result[0]['placements']] == [49]
+        assert result[0]['placements'][0]['placed_at'] == str(datetime(2016, 1, 1))
+
+    def test_level_without_fields_matches_legacy_output(self):
+        schema = {'items': {'id': ('id', int)}}
+        rows = [{'id': 1}, {'id': 2}]
+
+        assert SchemaPlan(schema).serialize(rows) == LegacySerializer(schema).serialize(rows)
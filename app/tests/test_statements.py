@@ -0,0 +1,45 @@
+import unittest
+from datetime import datetime
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from constants import TimeBuckets
+from extensions.engines import AsyncpgDialect, get_bind_args
+from data_access.rollups import clicks_rollups
+from data_access.placements import get_placement_statement, PlacementsQueryFactory as PlacementsQF
+from data_access.advert_orders import get_owned_grouped_for_order, AdvertOrdersQueryFactory as AdvertOrdersQF
+
+
+class StatementTestCase(unittest.TestCase):
+
+    def test_compiles_once_per_dialect(self):
+        dialect = PGDialect_psycopg2()
+        first = PlacementsQF.get_placement(1).compile(dialect=dialect)
+        second = PlacementsQF.get_placement(2).compile(dialect=dialect)
+
+        assert get_placement_statement().compile(dialect) is get_placement_statement().compile(dialect)
+        assert first.string is second.string
+        assert first.params['placement_id'] == 1
+        assert second.params['placement_id'] == 2
+        assert PlacementsQF.get_placement(3).compile(dialect=AsyncpgDialect()).string != first.string
+
+    def test_shape_arguments_are_compiled_separately(self):
+        start_date, end_date = datetime(2016, 1, 1), datetime(2017, 1, 1)
+        assert get_owned_grouped_for_order(clicks_rollups, TimeBuckets.MONTH) is \
+            get_owned_grouped_for_order(clicks_rollups, TimeBuckets.MONTH)
+        assert get_owned_grouped_for_order(clicks_rollups, TimeBuckets.MONTH) is not \
+            get_owned_grouped_for_order(clicks_rollups, TimeBuckets.DAY)
+
+        query = AdvertOrdersQF.get_owned_grouped_clicks(1, start_date, end_date, TimeBuckets.MONTH)
+        params = query.compile(dialect=PGDialect_psycopg2()).params
+        assert params['o_id'] == 1
+        assert params['start_bucket'] == start_date
+        assert params['end_date'] == end_date
+
+    def test_binds_values_to_positional_args(self):
+        compiled = PlacementsQF.get_existing_ids(['4', 5]).compile(dialect=AsyncpgDialect())
+        assert get_bind_args(compiled) == [['4', 5]]
+        assert get_bind_args(PlacementsQF.get_placer_id('4').compile(dialect=AsyncpgDialect())) == [4]
+
+    def test_compiles_without_dialect(self):
+        compiled = AdvertOrdersQF.get_advert_orders(7).compile()
+        assert compiled.params['user_id'] == 7
+        assert 'advert_orders.owner_id = :user_id' in str(compiled)
@@ -0,0 +1,30 @@
+import time
+import jwt
+from unittest import TestCase
+from settings import settings
+from extensions.tokens import TokenCache
+
+
+def make_token(**claims) -> str:
+    return jwt.encode(dict({'user_id': 1, 'type': 'ad-provider'}, **claims),
+                      key=settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM).decode('utf8')
+
+
+class TokenCacheTestCase(TestCase):
+
+    def test_verifies_token_once(self):
+        cache = TokenCache(ttl=60, max_entries=10)
+        token = make_token()
+
+        assert cache.decode(token) == cache.decode(token) == {'user_id': 1, 'type': 'ad-provider'}
+        assert cache.stats()['misses'] == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_does_not_cache_invalid_tokens(self):
+        cache = TokenCache(ttl=60, max_entries=10)
+        for token in (make_token(exp=int(time.time()) - 10), make_token() + 'x'):
+            for _ in range(2):
+                with self.assertRaises((jwt.DecodeError, jwt.ExpiredSignatureError)):
+                    cache.decode(token)
+
+        assert cache.stats()['entries'] == 0
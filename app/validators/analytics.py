@@ -1,14 +1,30 @@
 from calendar import monthrange
-from schematics.types import IntType
+from datetime import datetime, timedelta
+from schematics.types import IntType, StringType, DateTimeType
 from schematics.models import Model
 from schematics.exceptions import ValidationError
-from constants import OLDEST_DATE
+from settings import settings
+from constants import OLDEST_DATE, EventTypes
 
 
 class RegisterValidator(Model):
     placement_id = IntType(required=True, min_value=1)
 
 
+class EventValidator(RegisterValidator):
+    type = StringType(required=True, choices=EventTypes.as_choices())
+    ts = DateTimeType()
+
+    def validate_ts(self, data, value):
+        if value is None:
+            return
+        now = datetime.now()
+        if value > now + timedelta(seconds=settings.BATCH_EVENT_MAX_CLOCK_SKEW_SECONDS):
+            raise ValidationError('Event can\'t be registered in the future')
+        if value < now - timedelta(seconds=settings.BATCH_EVENT_MAX_AGE_SECONDS):
+            raise ValidationError('Event is too old to be registered')
+
+
 class YearValidator(Model):
     year = IntType(required=False, min_value=OLDEST_DATE.year)
 